@@ -0,0 +1,240 @@
+import logging
+import os
+import threading
+import time
+
+from bson import json_util
+from bson.objectid import ObjectId
+from pymongo.errors import OperationFailure, PyMongoError
+
+import connection
+from lru import LRUCache
+
+try:
+    import redis
+except ImportError:  # the shared tier is optional
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Read-through cache of account documents, keyed by `_id`; a `customerId` key
+# only holds a pointer to the `_id`, so every invalidation (including the
+# change stream's, which only knows `_id`) reaches the document in both
+# tiers. The in-process LRU is checked first. Next comes an optional
+# Redis-compatible tier (ACCOUNT_CACHE_REDIS_URL) that all workers on the host
+# share; values there are Extended JSON, so ObjectIds and dates round-trip.
+# Mongo is read last.
+#
+# Coherence:
+#   - writes made through db.py (and transfers) update or drop the entries in
+#     this process and in Redis right away;
+#   - a change stream on `accounts`, watched by one background thread per
+#     process, drops local entries for writes made by other workers or by
+#     other code paths ($inc balance updates, interest accrual);
+#   - every entry also carries a TTL. It bounds staleness when change streams
+#     are unavailable (a standalone mongod has none), and for the rare
+#     read-through that races a write.
+
+CHANGE_STREAM_UNSUPPORTED = {40573, 40324}  # "only supported on replica sets", "unrecognized stage"
+
+
+def _id_key(account_id):
+    return f"account:id:{account_id}"
+
+
+def _customer_key(customer_id):
+    return f"account:customer:{customer_id}"
+
+
+class AccountCache:
+    def __init__(self, collection_name="accounts", maxsize=10000, ttl=30.0, redis_url=None, redis_ttl=None,
+                 watch=True):
+        self.collection_name = collection_name
+        self.local = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.redis_ttl = int(redis_ttl or ttl)
+        self.redis = None
+        if redis_url:
+            if redis is None:
+                logger.warning("ACCOUNT_CACHE_REDIS_URL is set but the redis package is missing; "
+                               "using the in-process cache only")
+            else:
+                self.redis = redis.Redis.from_url(redis_url, socket_timeout=0.05, socket_connect_timeout=0.05)
+        self.redis_hits = 0
+        self.redis_misses = 0
+        self.redis_errors = 0
+        self.invalidations = 0
+        self.watch = watch
+        self.watcher_state = "stopped"
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._thread_pid = None
+
+    @property
+    def collection(self):
+        return connection.get_database()[self.collection_name]
+
+    # Reads
+
+    def get(self, account_id):
+        """The account with `_id` account_id (ObjectId or its hex string), or None."""
+        self._ensure_watching()
+        key = _id_key(account_id)
+        account = self.local.get(key)
+        if account is not None:
+            return account
+        account = self._redis_get(key)
+        if account is None:
+            account_id = str(account_id)
+            account = self.collection.find_one(
+                {"_id": ObjectId(account_id) if ObjectId.is_valid(account_id) else account_id})
+            if account is None:
+                return None
+            self._redis_set(account)
+        self._store_local(account)
+        return account
+
+    def get_by_customer(self, customer_id):
+        """The account of `customer_id`, or None."""
+        self._ensure_watching()
+        key = _customer_key(customer_id)
+        account_id = self.local.get(key)
+        if account_id is None:
+            account_id = self._redis_get(key, decode=False)
+        if account_id is not None:
+            account = self.get(account_id)
+            # The pointer outlives the document; it only counts while it still points back here.
+            if account is not None and account.get("customerId") == customer_id:
+                return account
+        account = self.collection.find_one({"customerId": customer_id})
+        if account is None:
+            return None
+        self.store(account)
+        return account
+
+    # Writes
+
+    def store(self, account):
+        """Cache a full account document just written or read (e.g. from find_one_and_update)."""
+        self._store_local(account)
+        self._redis_set(account)
+
+    def invalidate(self, account_id=None, customer_id=None):
+        """Drop an account by either key.
+
+        The document itself is only ever cached under its `_id`, so dropping
+        that one key is enough, and the change stream (which only sees
+        `_id`) can always do it. A customer key just points at an `_id`.
+        """
+        keys = []
+        if customer_id is not None:
+            keys.append(_customer_key(customer_id))
+            if account_id is None:
+                account_id = self.local.get(_customer_key(customer_id))
+                if account_id is None:
+                    account_id = self._redis_get(_customer_key(customer_id), decode=False)
+        if account_id is not None:
+            keys.append(_id_key(account_id))
+        for key in keys:
+            self.local.pop(key)
+        self.invalidations += 1
+        if self.redis is not None and keys:
+            try:
+                self.redis.delete(*keys)
+            except redis.RedisError:
+                self.redis_errors += 1
+
+    def clear(self):
+        self.local.clear()
+
+    def _store_local(self, account):
+        self.local.set(_id_key(account["_id"]), account)
+        if account.get("customerId") is not None:
+            self.local.set(_customer_key(account["customerId"]), str(account["_id"]))
+
+    # Redis tier
+
+    def _redis_get(self, key, decode=True):
+        if self.redis is None:
+            return None
+        try:
+            value = self.redis.get(key)
+        except redis.RedisError:
+            self.redis_errors += 1
+            return None
+        if value is None:
+            self.redis_misses += 1
+            return None
+        self.redis_hits += 1
+        return json_util.loads(value) if decode else value.decode()
+
+    def _redis_set(self, account):
+        if self.redis is None:
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.set(_id_key(account["_id"]), json_util.dumps(account), ex=self.redis_ttl)
+            if account.get("customerId") is not None:
+                pipe.set(_customer_key(account["customerId"]), str(account["_id"]), ex=self.redis_ttl)
+            pipe.execute()
+        except redis.RedisError:
+            self.redis_errors += 1
+
+    # Change stream
+
+    def _ensure_watching(self):
+        if not self.watch:
+            return
+        pid = os.getpid()
+        if self._thread is not None and self._thread_pid == pid:
+            return
+        with self._start_lock:
+            if self._thread is None or self._thread_pid != pid:
+                # Entries cached by the parent before fork are not covered by this process's stream.
+                self.local.clear()
+                self._thread = threading.Thread(target=self._watch, name="account-cache-watch", daemon=True)
+                self._thread_pid = pid
+                self._thread.start()
+
+    def _watch(self):
+        resume_token = None
+        pipeline = [{"$match": {"operationType": {"$in": ["update", "replace", "delete"]}}},
+                    {"$project": {"documentKey": 1, "operationType": 1}}]
+        while True:
+            try:
+                with self.collection.watch(pipeline, resume_after=resume_token) as stream:
+                    self.watcher_state = "watching"
+                    for change in stream:
+                        resume_token = stream.resume_token
+                        self.invalidate(account_id=change["documentKey"]["_id"])
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAM_UNSUPPORTED:
+                    logger.warning("Account cache: change streams unavailable (%s); entries expire after the TTL", e)
+                    self.watcher_state = "unsupported"
+                    return
+                logger.warning("Account cache change stream failed, restarting: %s", e)
+                if e.code == 286:  # ChangeStreamHistoryLost: cannot resume
+                    resume_token = None
+            except PyMongoError as e:
+                logger.warning("Account cache change stream interrupted, resuming: %s", e)
+            if resume_token is None:
+                # Changes made while not watching cannot be replayed
+                self.clear()
+            self.watcher_state = "reconnecting"
+            time.sleep(1)
+
+    def stats(self):
+        return {
+            "local": self.local.stats(),
+            "redis": None if self.redis is None else {
+                "hits": self.redis_hits, "misses": self.redis_misses, "errors": self.redis_errors},
+            "invalidations": self.invalidations,
+            "watcher": self.watcher_state,
+        }
+
+
+account_cache = AccountCache(
+    maxsize=int(os.getenv("ACCOUNT_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("ACCOUNT_CACHE_TTL", "30")),
+    redis_url=os.getenv("ACCOUNT_CACHE_REDIS_URL"),
+    watch=os.getenv("ACCOUNT_CACHE_WATCH", "1") != "0",
+)
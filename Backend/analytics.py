@@ -0,0 +1,230 @@
+from itertools import islice
+
+import numpy as np
+from bson.objectid import ObjectId
+
+from money import DEFAULT_CURRENCY, Money
+
+# Columnar analytics over the transactions collection. Transactions are read
+# once, in large cursor batches (or from a saved .npz snapshot), into NumPy
+# arrays sorted by (account, date). The amount column is signed integer minor
+# units. Because the rows are sorted, every per-account aggregate is a segmented
+# reduction (np.add.reduceat over group start offsets) rather than a Python loop
+# per document. Results come back as dicts of column arrays aligned on the
+# `accountId` column.
+
+CREDIT_TYPES = frozenset({"deposit", "transfer_in", "interest", "refund"})
+DEBIT_TYPES = frozenset({"withdrawal", "transfer_out", "fee"})
+PROJECTION = {"accountId": 1, "transactionType": 1, "amount": 1, "currency": 1, "date": 1}
+SECONDS_PER_YEAR = 365 * 86400
+
+
+def _signed_minor(document):
+    """Signed amount in minor units, or None for rows that do not move money."""
+    kind = str(document.get("transactionType", "")).lower()
+    sign = 1 if kind in CREDIT_TYPES else -1 if kind in DEBIT_TYPES else 0
+    if not sign or document.get("amount") is None or document.get("date") is None:
+        return None
+    if "currency" in document:
+        return sign * int(document["amount"])
+    # Legacy documents hold a major-unit float
+    return sign * Money.from_document(document, "amount").minor
+
+
+def _group_starts(*keys):
+    """Offsets where any of the (sorted) key columns changes value."""
+    changed = np.zeros(len(keys[0]), dtype=bool)
+    if len(changed):
+        changed[0] = True
+        for key in keys:
+            changed[1:] |= key[1:] != key[:-1]
+    return np.flatnonzero(changed)
+
+
+class TransactionFrame:
+    """Transactions as sorted column arrays: account code, signed amount (minor units) and date."""
+
+    def __init__(self, account_ids, currencies, account, amount, when):
+        order = np.lexsort((when, account))
+        self.account_ids = list(account_ids)
+        self.currencies = list(currencies)
+        self.account = np.asarray(account, dtype=np.int32)[order]
+        self.amount = np.asarray(amount, dtype=np.int64)[order]
+        self.when = np.asarray(when, dtype="datetime64[s]")[order]
+        self.starts = _group_starts(self.account)
+        self.groups = self.account[self.starts]
+
+    def __len__(self):
+        return len(self.amount)
+
+    @classmethod
+    def from_documents(cls, documents, chunk_size=50000):
+        """Build from an iterable of transaction documents, converting `chunk_size` rows at a time."""
+        codes, currencies = {}, []
+        accounts, amounts, dates = [], [], []
+        documents = iter(documents)
+        while True:
+            chunk = list(islice(documents, chunk_size))
+            if not chunk:
+                break
+            chunk_accounts, chunk_amounts, chunk_dates = [], [], []
+            for document in chunk:
+                minor = _signed_minor(document)
+                if minor is None:
+                    continue
+                account_id = str(document["accountId"])
+                code = codes.get(account_id)
+                if code is None:
+                    code = codes[account_id] = len(currencies)
+                    currencies.append(document.get("currency", DEFAULT_CURRENCY))
+                chunk_accounts.append(code)
+                chunk_amounts.append(minor)
+                chunk_dates.append(document["date"])
+            accounts.append(np.array(chunk_accounts, dtype=np.int32))
+            amounts.append(np.array(chunk_amounts, dtype=np.int64))
+            dates.append(np.array(chunk_dates, dtype="datetime64[s]"))
+        if not accounts:
+            return cls([], [], [], [], np.array([], dtype="datetime64[s]"))
+        return cls(list(codes), currencies, np.concatenate(accounts), np.concatenate(amounts),
+                   np.concatenate(dates))
+
+    def save(self, path):
+        """Export the frame as a compressed .npz snapshot."""
+        np.savez_compressed(path, account_ids=np.array(self.account_ids, dtype=str),
+                            currencies=np.array(self.currencies, dtype=str),
+                            account=self.account, amount=self.amount, when=self.when)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as snapshot:
+            return cls(snapshot["account_ids"].tolist(), snapshot["currencies"].tolist(),
+                       snapshot["account"], snapshot["amount"], snapshot["when"])
+
+    def account_column(self, codes=None):
+        ids = np.array(self.account_ids, dtype=object)
+        return ids[self.groups if codes is None else codes]
+
+    def per_account(self, values, default=0):
+        """Array indexed by account code from a {accountId: value} mapping."""
+        return np.array([values.get(account_id, default) for account_id in self.account_ids])
+
+
+def load_transactions(collection, query=None, batch_size=50000):
+    """Read matching transactions into a TransactionFrame using large cursor batches."""
+    cursor = collection.find(query or {}, PROJECTION).batch_size(batch_size)
+    try:
+        return TransactionFrame.from_documents(cursor, chunk_size=batch_size)
+    finally:
+        cursor.close()
+
+
+def load_interest_rates(collection, frame, default=0.0, chunk_size=10000):
+    """Annual `interestRate` per account code of `frame`, from the accounts collection."""
+    rates = {}
+    for offset in range(0, len(frame.account_ids), chunk_size):
+        ids = [ObjectId(account_id) if ObjectId.is_valid(account_id) else account_id
+               for account_id in frame.account_ids[offset:offset + chunk_size]]
+        for account in collection.find({"_id": {"$in": ids}, "interestRate": {"$exists": True}},
+                                       {"interestRate": 1}):
+            rates[str(account["_id"])] = float(account["interestRate"])
+    return frame.per_account(rates, default).astype(np.float64)
+
+
+def account_totals(frame):
+    """Credits, debits, net and transaction counts per account (minor units)."""
+    if not len(frame):
+        return {"accountId": np.array([], dtype=object)}
+    credits = np.where(frame.amount > 0, frame.amount, 0)
+    lengths = np.diff(np.append(frame.starts, len(frame)))
+    return {
+        "accountId": frame.account_column(),
+        "credits": np.add.reduceat(credits, frame.starts),
+        "debits": np.add.reduceat(credits - frame.amount, frame.starts),
+        "net": np.add.reduceat(frame.amount, frame.starts),
+        "count": lengths,
+        "creditCount": np.add.reduceat((frame.amount > 0).astype(np.int64), frame.starts),
+    }
+
+
+def running_balances(frame, opening=None):
+    """Balance after each row (in frame order), starting from `opening` (array by account code, default 0)."""
+    totals = np.cumsum(frame.amount)
+    before_group = totals[frame.starts] - frame.amount[frame.starts]
+    lengths = np.diff(np.append(frame.starts, len(frame)))
+    balances = totals - np.repeat(before_group, lengths)
+    if opening is not None:
+        balances += np.asarray(opening, dtype=np.int64)[frame.account]
+    return balances
+
+
+def monthly_totals(frame):
+    """Credits, debits and counts per (account, calendar month)."""
+    if not len(frame):
+        return {"accountId": np.array([], dtype=object)}
+    month = frame.when.astype("datetime64[M]")
+    starts = _group_starts(frame.account, month)
+    credits = np.where(frame.amount > 0, frame.amount, 0)
+    return {
+        "accountId": frame.account_column(frame.account[starts]),
+        "month": month[starts],
+        "credits": np.add.reduceat(credits, starts),
+        "debits": np.add.reduceat(credits - frame.amount, starts),
+        "count": np.diff(np.append(starts, len(frame))),
+    }
+
+
+def accrue_interest(frame, rates, start, end, opening=None):
+    """Simple interest per account over [start, end), on the time-weighted positive balance.
+
+    `rates` is the annual rate per account code (see load_interest_rates);
+    `opening` the balance before each account's first row. Returns minor
+    units, rounded half to even.
+    """
+    if not len(frame):
+        return {"accountId": np.array([], dtype=object), "interest": np.array([], dtype=np.int64)}
+    opening = np.zeros(len(frame.account_ids), dtype=np.int64) if opening is None else np.asarray(opening, np.int64)
+    start = np.datetime64(start, "s").astype(np.int64)
+    end = np.datetime64(end, "s").astype(np.int64)
+    seconds = frame.when.astype(np.int64)
+
+    # Each row's balance holds until the account's next row (or `end`)
+    following = np.empty_like(seconds)
+    following[:-1] = seconds[1:]
+    following[np.append(frame.starts[1:] - 1, len(frame) - 1)] = end
+    held = np.clip(np.minimum(following, end) - np.maximum(seconds, start), 0, None)
+    balances = np.maximum(running_balances(frame, opening), 0).astype(np.float64)
+    weighted = np.add.reduceat(balances * held, frame.starts)
+
+    # Plus the opening balance, held from `start` until the first row
+    first_held = np.clip(np.minimum(seconds[frame.starts], end) - start, 0, None)
+    weighted += np.maximum(opening[frame.groups], 0) * first_held
+
+    interest = np.rint(weighted * np.asarray(rates, dtype=np.float64)[frame.groups] / SECONDS_PER_YEAR)
+    return {"accountId": frame.account_column(), "interest": interest.astype(np.int64)}
+
+
+def spend_percentiles(frame, percentiles=(50, 90, 99)):
+    """Percentiles of debit amounts per account (linear interpolation, as np.percentile)."""
+    debit = frame.amount < 0
+    account = frame.account[debit]
+    spend = -frame.amount[debit]
+    order = np.lexsort((spend, account))
+    account, spend = account[order], spend[order]
+    starts = _group_starts(account)
+    result = {"accountId": frame.account_column(account[starts])}
+    if not len(starts):
+        return result
+    last = np.diff(np.append(starts, len(spend))) - 1
+    for q in percentiles:
+        # The offset within each group is computed on its own: added to a large
+        # `starts` first, its fraction would lose precision.
+        offset = last * q / 100
+        whole = np.floor(offset)
+        fraction = offset - whole
+        low = starts + whole.astype(np.int64)
+        high = np.minimum(low + 1, starts + last)
+        below, above = spend[low].astype(np.float64), spend[high].astype(np.float64)
+        step = above - below
+        # Interpolate from the nearer end, as np.percentile does.
+        result[f"p{q}"] = np.where(fraction >= 0.5, above - step * (1 - fraction), below + step * fraction)
+    return result
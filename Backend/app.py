@@ -1,36 +1,41 @@
-import bcrypt
-from flask import Flask, request, jsonify
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required
-from datetime import datetime
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from flask_jwt_extended import get_jwt_identity
-from datetime import datetime, timezone 
-from bson import ObjectId
-import openai
-from flask_cors import cross_origin
-import requests
-import sympy as sp 
-from transformers import pipeline
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
+from account_cache import account_cache
+from money import DEFAULT_CURRENCY, Money
 from db import (
     get_database,
-    insert_customer,
     insert_account,
-    insert_transaction,
     log_audit, 
     create_indexes,
+    get_account,
+    get_account_by_customer_id,
+    update_account as update_account_document,
+    delete_account as delete_account_document,
     get_account_schema,
-    get_transaction_schema,
 )
+from pymongo.errors import DuplicateKeyError
+
+from balances import AccountNotFound, BalanceError
+from idempotency import IdempotencyStore, idempotent
+from ingest import ingest_stream
+from transfers import TransferError, transfer
+from pagination import DEFAULT_PAGE_SIZE, fetch_page, stream_ndjson
+import auth_middleware
+import auth_service
+import rollups
+import tokens
+import validation
+from auth_middleware import current_claims, require_token
 
 
 class Config:
-    #JWT_SECRET_KEY = 'key'
-    #MONGO_URI = 'uri'  
+    JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY')
+    MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
 
 
 app = Flask(__name__)
@@ -41,57 +46,49 @@ CORS(app)
 #CORS(app, origins="http://localhost:3000", supports_credentials=True)
 
 
-jwt = JWTManager(app)
-
 
 db = get_database()
 
 
 create_indexes()
 
-#openai.api_key = "my-key"
+# Retried POSTs carrying the same Idempotency-Key are answered from here
+idempotency_store = IdempotencyStore(lambda: db.idempotency_keys)
+
+# AI assistant routes load their heavy dependencies on first use (see assistant.py);
+# ENABLE_ASSISTANT=0 boots a banking-only worker without them.
+if os.getenv('ENABLE_ASSISTANT', '1') != '0':
+    from assistant import assistant_bp
+    app.register_blueprint(assistant_bp)
 
-chatbot = pipeline('text-generation', model='microsoft/DialoGPT-medium')
+
+def busy(error):
+    response = jsonify(message=str(error))
+    response.headers['Retry-After'] = '1'
+    return response, 429
 
 
 @app.route('/register', methods=['POST'])
 def register_user():
     try:
-        data = request.get_json()
-        required_fields = ['email', 'password', 'name']
-        
-        # Check if required fields are provided
-        missing_fields = [field for field in required_fields if field not in data]
-        if missing_fields:
-            return jsonify(message=f"Missing fields: {', '.join(missing_fields)}"), 400
-        
-        # Check if email already exists in the database
-        existing_customer = db.customers.find_one({"email": data['email']})
-        if existing_customer:
-            return jsonify(message="Email already registered"), 400
-        
-        # Hash the password before storing using bcrypt
-        hashed_password = bcrypt.hashpw(data['password'].encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-        
-        # Create a unique customer ID
-        user_id = str(ObjectId())  
-        
-        # Create the customer document
-        customer_data = {
-            "_id": user_id,  
-            "name": data['name'],
-            "email": data['email'],
-            "password": hashed_password,
-            "createdAt": datetime.now(timezone.utc),  
-            "updatedAt": datetime.now(timezone.utc)
-        }
-        
-        # Insert customer into the database
+        email, password, name = validation.registration(request.get_json())
+
+        # Hash the password before storing using bcrypt (in the auth pool, see auth_service.py)
+        hashed_password = auth_service.hash_password(password)
+
+        # Insert customer into the database; the unique email index rejects duplicates
+        customer_data = validation.customer_document(email, name, hashed_password)
         db.customers.insert_one(customer_data)
-        
+
         # Return a successful response
-        return jsonify(message="Account created successfully", customer_id=user_id), 201
-    
+        return jsonify(message="Account created successfully", customer_id=customer_data["_id"]), 201
+
+    except validation.ValidationError as e:
+        return jsonify(message=str(e)), e.status
+    except DuplicateKeyError:
+        return jsonify(message="Email already registered"), 400
+    except auth_service.AuthBusy as e:
+        return busy(e)
     except Exception as e:
         app.logger.error(f"Error during registration: {e}")
         return jsonify(message="An error occurred during registration"), 500
@@ -107,44 +104,65 @@ def login():
         response.headers.add('Access-Control-Allow-Headers', 'Content-Type')
         return response
 
-   
-    data = request.get_json()
-    if 'email' not in data or 'password' not in data:
-        return jsonify(message="Missing email or password"), 400
+    try:
+        email, password = validation.credentials(request.get_json())
+    except validation.ValidationError as e:
+        return jsonify(message=str(e)), e.status
 
-    customer = db.customers.find_one({"email": data['email']})
-    if customer and bcrypt.checkpw(data['password'].encode('utf-8'), customer['password'].encode('utf-8')):
-        token = create_access_token(identity={"email": customer['email'], "name": customer['name']})
-        return jsonify(access_token=token), 200
+    try:
+        customer = auth_service.find_credentials(db.customers, email)
+        if customer and auth_service.check_password(password, customer['password']):
+            # Compact claims: hot routes authorize from the token without looking the customer up
+            account = get_account_by_customer_id(customer['_id'])
+            account_ids = [account['_id']] if account else []
+            token = tokens.create_access_token(
+                str(customer['_id']), auth_middleware.get_verifier().keys,
+                claims=tokens.compact_claims(account_ids, email=customer['email']))
+            return jsonify(access_token=token), 200
+    except auth_service.AuthBusy as e:
+        return busy(e)
     return jsonify(message="Invalid credentials"), 401
 
+
+@app.route('/auth/change-password', methods=['POST'])
+@require_token()
+def change_password():
+    email = current_claims().get('email')
+    if not email:
+        return jsonify(message="Token has no email"), 422
+    try:
+        current_password, new_password = validation.password_change(request.get_json())
+        customer = auth_service.find_credentials(db.customers, email)
+        if not customer or not auth_service.check_password(current_password, customer['password']):
+            return jsonify(message="Invalid credentials"), 401
+        auth_service.set_password(db.customers, email, new_password)
+    except validation.ValidationError as e:
+        return jsonify(message=str(e)), e.status
+    except auth_service.AuthBusy as e:
+        return busy(e)
+    log_audit("update", "customers", customer['_id'], email, "password changed")
+    return jsonify(message="Password updated successfully"), 200
+
 # Account Management
 @app.route('/accounts/create', methods=['POST'])
+@idempotent(idempotency_store)
 def create_account():
     try:
-        print("Request received at /accounts/create")
-        data = request.json
-        print(f"Request data: {data}")
-
-        customer_id = data.get('customerId')
-        account_type = data.get('accountType', 'Savings')
-        balance = data.get('balance', 0.0)
-        user_id = data.get('userId')  
+        try:
+            customer_id, account_type, balance, user_id = validation.new_account(request.json)
+        except validation.ValidationError as e:
+            return jsonify({"error": str(e)}), e.status
+        currency = balance.currency
 
-        if not customer_id or not user_id:  
-            print("Customer ID or User ID is missing")
-            return jsonify({"error": "Customer ID and User ID are required"}), 400
-
-        print(f"Creating account schema with: customerId={customer_id}, accountType={account_type}, balance={balance}, userId={user_id}")
-        account_data = get_account_schema(customer_id, account_type, balance, user_id)  # Pass userId to the schema function
-
-        print(f"Generated account schema: {account_data}")
+        account_data = get_account_schema(customer_id, account_type, balance, user_id, currency)  # Pass userId to the schema function
         account_id = insert_account(account_data, user_id)  # Pass userId to insert function
-
-        print(f"Account successfully created with ID: {account_id}")
-        return jsonify({"message": "Account created successfully", "accountId": str(account_id)}), 201
+        return jsonify({"message": "Account created successfully", "accountId": str(account_id),
+                        "balance": balance.to_json(), "currency": currency}), 201
+    except DuplicateKeyError:
+        # accounts.customerId is unique (see indexes.py)
+        return jsonify({"error": "Customer already has an account"}), 400
     except Exception as e:
-        print(f"Error in /accounts/create: {e}")
+        app.logger.error(f"Error in /accounts/create: {e}")
         return jsonify({"error": str(e)}), 500
 
 
@@ -152,207 +170,183 @@ def create_account():
 @app.route('/accounts/update', methods=['POST'])
 def update_account():
     data = request.get_json()
-    account_id = data.get('customerId')
+    try:
+        account_id = validation.customer_id(data)
+    except validation.ValidationError as e:
+        return jsonify(message=str(e)), e.status
     account_type = data.get('accountType')
-    balance = data.get('balance')
-
-    if not account_id:
-        return jsonify(message="Missing customer ID"), 400
 
-    # Find the account in the database
-    account = db.accounts.find_one({"customerId": account_id})
+    # The balance is parsed in the account's currency; the cached copy usually saves the read
+    account = get_account_by_customer_id(account_id)
     if not account:
         return jsonify(message="Account not found"), 404
 
-    # Update account fields
-    db.accounts.update_one({"customerId": account_id}, {"$set": {
+    currency = account.get('currency', DEFAULT_CURRENCY)
+    try:
+        balance = validation.money(data.get('balance'), currency, "balance")
+    except validation.ValidationError as e:
+        return jsonify(message=str(e)), e.status
+
+    # Update account fields (db.update_account also drops the cached copy)
+    result = update_account_document(account_id, {
         "accountType": account_type,
-        "balance": balance
-    }})
+        "balance": balance.minor,
+        "currency": currency
+    }, data.get('userId'))
+    if not result.matched_count:
+        return jsonify(message="Account not found"), 404
 
     return jsonify(message="Account updated successfully"), 200
 
 @app.route('/accounts/delete', methods=['POST'])
 def delete_account():
-    data = request.get_json()
-    account_id = data.get('customerId')
-
-    if not account_id:
-        return jsonify(message="Missing customer ID"), 400
+    try:
+        data = request.get_json()
+        account_id = validation.customer_id(data)
+    except validation.ValidationError as e:
+        return jsonify(message=str(e)), e.status
 
-    # Find and delete the account
-    account = db.accounts.find_one({"customerId": account_id})
-    if not account:
+    # Delete the account; a miss shows up as deleted_count == 0
+    result = delete_account_document(account_id, data.get('userId'))
+    if not result.deleted_count:
         return jsonify(message="Account not found"), 404
 
-    db.accounts.delete_one({"customerId": account_id})
-
     return jsonify(message="Account deleted successfully"), 200
 
 # Route for handling transactions (Transfer)
 @app.route('/api/transactions/transfer', methods=['POST'])
+@require_token(tokens.SCOPE_WRITE)
+@idempotent(idempotency_store)
 def transfer_funds():
-    data = request.json
     try:
-        from_account = data.get('fromAccount')
-        to_account = data.get('toAccount')
-        amount = float(data.get('amount'))
-        description = data.get('description', '')
+        # Clients send the same key when retrying, so a retry never posts twice
+        args = validation.transfer_request(request.json, current_claims(), request.headers.get('Idempotency-Key'))
+        result = transfer(**args)
+        log_audit("transfer", "transfers", result["transferId"], args["user_id"],
+                  f"{args['amount']} from {args['from_account']} to {args['to_account']}")
+        return jsonify({"message": "Transaction completed successfully", **result}), 200
+    except validation.ValidationError as e:
+        return jsonify({"message": str(e)}), e.status
+    except AccountNotFound as e:
+        return jsonify({"message": str(e)}), 404
+    except (BalanceError, TransferError) as e:
+        # Insufficient funds, currency mismatch, non-positive amount
+        return jsonify({"message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"message": str(e)}), 500
+
+@app.route('/api/transactions/bulk', methods=['POST'])
+@require_token(tokens.SCOPE_INGEST)
+def bulk_ingest_transactions():
+    """Stream an NDJSON (default) or CSV body of transaction rows into the database.
 
-        # Simulate the transaction logic
-        if not from_account or not to_account or amount <= 0:
-            return jsonify({"message": "Invalid transaction details"}), 400
+    Rows may name any account, so this is an operator route: it needs the
+    transactions:ingest scope, which customer tokens never carry.
+    """
+    try:
+        ordered = request.args.get('ordered', 'false').lower() in ('1', 'true', 'yes')
+        chunk_size = min(max(int(request.args.get('chunkSize', 1000)), 1), 10000)
+    except ValueError:
+        return jsonify(message="chunkSize must be an integer"), 400
 
-        # Success response (replace with actual DB insert/update logic)
-        return jsonify({"message": "Transaction completed successfully"}), 200
+    claims = current_claims()
+    user_id = claims.get('email') or claims['sub']
+    try:
+        report = ingest_stream(request.stream, request.content_type, user_id, ordered=ordered, chunk_size=chunk_size)
     except Exception as e:
-        return jsonify({"message": str(e)}), 500
+        app.logger.error(f"Error during bulk ingestion: {e}")
+        return jsonify(message="Error during bulk ingestion"), 500
+
+    status = 200 if report['failed'] == 0 else 207
+    return jsonify(report), status
 
 @app.route('/api/transactions/history', methods=['GET'])
-@jwt_required()
+@require_token(tokens.SCOPE_READ)
 def get_transaction_history():
     try:
-        # Get current user identity from JWT
-        current_user = get_jwt_identity()
-        app.logger.info(f"JWT Identity: {current_user}")
-
-        if not current_user:
-            app.logger.error("JWT Identity is missing or invalid.")
-            return jsonify({'message': 'Invalid token or identity not found'}), 401
-
-        # Extract account_id from the JWT payload
-        user_account = current_user.get('account_id') if isinstance(current_user, dict) else current_user
-        if not user_account:
-            app.logger.error(f"Account ID missing in JWT payload: {current_user}")
-            return jsonify({'message': 'Account ID not found in token', 'jwt_payload': current_user}), 422
-
-        # Fetch transaction history for the user's account
-        transactions = list(db.transactions.find({
-            '$or': [
-                {'fromAccount': user_account},
-                {'toAccount': user_account}
-            ]
-        }, {'_id': 0}))  # Exclude '_id' if not needed
-
-        if not transactions:
+        claims = current_claims()
+
+        try:
+            # The token lists the customer's accounts, so no lookup is needed to authorize
+            user_account = validation.claims_account(claims, request.args.get('account'))
+            fields = validation.history_fields(request.args)
+        except validation.ValidationError as e:
+            app.logger.error(f"Rejected history request for {claims['sub']}: {e}")
+            return jsonify({'message': str(e)}), e.status
+
+        history_filter = validation.history_filter(user_account)
+        cursor = request.args.get('cursor')
+
+        # Full history as NDJSON, streamed straight from the Mongo cursor
+        if request.args.get('format') == 'ndjson' or request.accept_mimetypes.best == 'application/x-ndjson':
+            try:
+                lines = stream_ndjson(db.transactions, history_filter, cursor=cursor, fields=fields)
+            except ValueError as e:
+                return jsonify({'message': str(e)}), 400
+            return Response(stream_with_context(lines), mimetype='application/x-ndjson')
+
+        # One keyset-paginated page of the history, newest first
+        try:
+            limit = validation.page_limit(request.args, DEFAULT_PAGE_SIZE)
+            transactions, next_cursor = fetch_page(db.transactions, history_filter, cursor=cursor,
+                                                   limit=limit, fields=fields)
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+
+        if not transactions and not cursor:
             return jsonify({'message': 'No transactions found'}), 404
 
-        return jsonify({'history': transactions}), 200
+        return jsonify({'history': transactions, 'nextCursor': next_cursor}), 200
 
     except Exception as e:
         app.logger.error(f"Error fetching transaction history: {e}")
         return jsonify({'message': 'Error fetching transaction history'}), 500
 
-
-# AI Chat Endpoint
-@app.route('/api/ai-assistant/chat', methods=['POST'])
-def ai_chat():
-    data = request.json
-    user_query = data.get('query', '')
-
-    if not user_query:
-        return jsonify({'error': 'Query cannot be empty.'}), 400
+@app.route('/api/accounts/statement', methods=['GET'])
+@require_token(tokens.SCOPE_READ)
+def get_statement():
+    """Opening/closing balance and totals for ?from=...&to=... (ISO dates, `to` exclusive), from the daily rollups."""
+    try:
+        user_account = validation.claims_account(current_claims(), request.args.get('account'))
+        start, end = validation.statement_range(request.args)
+    except validation.ValidationError as e:
+        return jsonify({'message': str(e)}), e.status
 
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful AI Assistant."},
-                {"role": "user", "content": user_query}
-            ],
-            max_tokens=150
-        )
-        assistant_reply = response['choices'][0]['message']['content'].strip()
-        return jsonify({'reply': assistant_reply}), 200
+        return jsonify(rollups.statement(db, user_account, start, end)), 200
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        app.logger.error(f"Error building statement: {e}")
+        return jsonify({'message': 'Error building statement'}), 500
 
-# Translation Endpoint
-@app.route('/api/ai-assistant/translate', methods=['POST'])
-def translate():
-    data = request.json
-    text = data.get('text', '')
 
-    if not text:
-        return jsonify({'error': 'Text cannot be empty.'}), 400
 
+@app.route('/api/accounts/balance', methods=['GET'])
+@require_token(tokens.SCOPE_READ)
+def get_balance():
+    """Balance of the token's account (or ?account=), served from the account cache."""
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a translator. Translate the following text into French."},
-                {"role": "user", "content": text}
-            ],
-            max_tokens=100
-        )
-        translation = response['choices'][0]['message']['content'].strip()
-        return jsonify({'translation': translation}), 200
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-# Math Solver Endpoint
-@app.route('/api/ai-assistant/solve-math', methods=['POST'])
-def solve_math():
-    data = request.json
-    problem = data.get('problem', '')
+        account_id = validation.claims_account(current_claims(), request.args.get('account'))
+    except validation.ValidationError as e:
+        return jsonify({'message': str(e)}), e.status
+    account = get_account(account_id)
+    if not account:
+        return jsonify({'message': 'Account not found'}), 404
+    balance = Money.from_document(account)
+    return jsonify({'accountId': str(account['_id']), 'accountType': account.get('accountType'),
+                    'balance': balance.to_json(), 'currency': balance.currency}), 200
 
-    if not problem:
-        return jsonify({'error': 'Problem cannot be empty.'}), 400
+@app.route('/api/accounts/cache', methods=['GET'])
+@require_token(tokens.SCOPE_ADMIN)
+def account_cache_stats():
+    return jsonify(account_cache.stats()), 200
 
-    try:
-        solution = sp.sympify(problem)
-        result = sp.simplify(solution)
-        return jsonify({'solution': str(result)}), 200
-    except Exception as e:
-        return jsonify({'error': 'Invalid math problem: ' + str(e)}), 400
 
-# Weather Information Endpoint
-@app.route('/api/ai-assistant/weather', methods=['POST'])
-def weather():
-    data = request.json
-    location = data.get('location', '')
+@app.route('/auth/stats', methods=['GET'])
+@require_token(tokens.SCOPE_ADMIN)
+def auth_stats():
+    return jsonify({'tokens': auth_middleware.token_stats(), 'passwords': auth_service.stats()}), 200
 
-    if not location:
-        return jsonify({'error': 'Location cannot be empty.'}), 400
 
-    try:
-        # Example using OpenWeatherMap API
-        #api_key = "key"
-        #url = f"uri"
-        response = requests.get(url)
-        weather_data = response.json()
-
-        if response.status_code == 200:
-            # Format the weather information as per the specified JSON structure
-            weather_info = {
-                "city": weather_data['name'],
-                "description": weather_data['weather'][0]['description'].capitalize(),
-                "temperature": weather_data['main']['temp']
-            }
-            return jsonify(weather_info), 200
-        else:
-            return jsonify({'error': weather_data.get('message', 'Unable to fetch weather data.')}), response.status_code
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-    
-    
-@app.route('/api/galaxy/chat', methods=['POST'])
-def chat():
-    # Get user input from the request body (JSON)
-    user_input = request.json.get('user_input', '')
-    
-    if not user_input:
-        return jsonify({'error': 'No user input provided'}), 400
-    
-    # Generate the chatbot response
-    response = chatbot(user_input, max_length=1000, num_return_sequences=1)
-    
-    # Extract the generated text from the response
-    generated_response = response[0]['generated_text']
-    
-    return jsonify({'response': generated_response})
-
-    
 # User Information Route
 @app.route('/auth/me', methods=['GET'])
 def get_user_info():
@@ -0,0 +1,328 @@
+import asyncio
+import json
+from functools import wraps
+
+from dotenv import load_dotenv
+from pymongo import AsyncMongoClient, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from pymongo.read_concern import ReadConcern
+from pymongo.write_concern import WriteConcern
+from quart import Quart, Response, g, jsonify, request
+
+load_dotenv()
+
+import auth_service
+import balances
+import connection
+import pagination
+import rollups
+import transfers
+import validation
+from balances import AccountNotFound, BalanceError, InsufficientFunds
+from db import get_account_schema, log_audit
+from money import DEFAULT_CURRENCY
+import tokens
+
+# Async entry point for the banking API: the same register, login, account,
+# transfer and history routes as app.py, served on an event loop by Quart with
+# the PyMongo async driver. Request validation, document construction and
+# query building are shared with the sync app (validation.py, balances.py,
+# transfers.py, pagination.py), so the two only differ in how they wait for
+# I/O. bcrypt runs in the auth_service process pool (awaited from a thread), so
+# hashing never stalls the loop;
+# audit entries go through the same background writer as the sync app.
+# Index migrations stay with the sync app (db.create_indexes / indexes.py).
+#
+#   hypercorn asgi:app --bind 0.0.0.0:5000
+
+app = Quart(__name__)
+
+mongo_client = None
+mongo = None
+verifier = None
+
+# Per-account lock stripes, as in transfers.py: transfers touching the same
+# account queue here instead of retrying write conflicts.
+_stripes = [asyncio.Lock() for _ in range(transfers.LOCK_STRIPES)]
+
+
+@app.before_serving
+async def connect_mongo():
+    global mongo_client, mongo, verifier
+    verifier = tokens.TokenVerifier(tokens.KeyRing.from_env())
+    settings = connection.load_settings()
+    mongo_client = AsyncMongoClient(settings["uri"], **connection.client_options(settings))
+    mongo = mongo_client.get_database(
+        settings["database"],
+        write_concern=settings["write_concern"],
+        read_concern=settings["read_concern"],
+        read_preference=settings["read_preference"],
+    )
+
+
+@app.after_serving
+async def close_mongo():
+    await mongo_client.close()
+
+
+def require_token(scope=None):
+    """auth_middleware.require_token() for Quart views; the verified claims go to g.claims."""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            token = tokens.bearer_token(request.headers.get('Authorization'))
+            if token is None:
+                return jsonify(msg="Missing Authorization Header"), 401
+            try:
+                claims = verifier.verify(token)
+            except tokens.TokenError as e:
+                return jsonify(msg=str(e)), 401
+            if scope is not None and scope not in claims.get('scp', ()):
+                return jsonify(msg=f"Token lacks the {scope} scope"), 403
+            g.claims = claims
+            return await view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def busy(error):
+    response = jsonify(message=str(error))
+    response.headers['Retry-After'] = '1'
+    return response, 429
+
+
+@app.post('/register')
+async def register_user():
+    try:
+        email, password, name = validation.registration(await request.get_json())
+
+        hashed_password = await asyncio.to_thread(auth_service.hash_password, password)
+        customer_data = validation.customer_document(email, name, hashed_password)
+        await mongo.customers.insert_one(customer_data)
+        return jsonify(message="Account created successfully", customer_id=customer_data["_id"]), 201
+
+    except validation.ValidationError as e:
+        return jsonify(message=str(e)), e.status
+    except DuplicateKeyError:
+        return jsonify(message="Email already registered"), 400
+    except auth_service.AuthBusy as e:
+        return busy(e)
+    except Exception as e:
+        app.logger.error(f"Error during registration: {e}")
+        return jsonify(message="An error occurred during registration"), 500
+
+
+@app.post('/auth/login')
+async def login():
+    try:
+        email, password = validation.credentials(await request.get_json())
+    except validation.ValidationError as e:
+        return jsonify(message=str(e)), e.status
+
+    customer = auth_service.cached_credentials(email)
+    if customer is None:
+        customer = await mongo.customers.find_one({"email": email}, auth_service.CREDENTIAL_FIELDS)
+        if customer is not None:
+            auth_service.cache_credentials(email, customer)
+    try:
+        if customer and await asyncio.to_thread(auth_service.check_password, password, customer['password']):
+            accounts = mongo.accounts.find({"customerId": customer['_id']}, {"_id": 1})
+            account_ids = [a['_id'] async for a in accounts]
+            token = tokens.create_access_token(str(customer['_id']), verifier.keys,
+                                               claims=tokens.compact_claims(account_ids, email=customer['email']))
+            return jsonify(access_token=token), 200
+    except auth_service.AuthBusy as e:
+        return busy(e)
+    return jsonify(message="Invalid credentials"), 401
+
+
+# Account Management
+@app.post('/accounts/create')
+async def create_account():
+    try:
+        customer_id, account_type, balance, user_id = validation.new_account(await request.get_json())
+    except validation.ValidationError as e:
+        return jsonify({"error": str(e)}), e.status
+    try:
+        account_data = get_account_schema(customer_id, account_type, balance, user_id, balance.currency)
+        account_id = (await mongo.accounts.insert_one(account_data)).inserted_id
+        log_audit("insert", "accounts", account_id, user_id)
+        return jsonify({"message": "Account created successfully", "accountId": str(account_id),
+                        "balance": balance.to_json(), "currency": balance.currency}), 201
+    except DuplicateKeyError:
+        return jsonify({"error": "Customer already has an account"}), 400
+    except Exception as e:
+        app.logger.error(f"Error in /accounts/create: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.post('/accounts/update')
+async def update_account():
+    data = await request.get_json()
+    try:
+        customer_id = validation.customer_id(data)
+    except validation.ValidationError as e:
+        return jsonify(message=str(e)), e.status
+
+    account = await mongo.accounts.find_one({"customerId": customer_id}, {"currency": 1})
+    if not account:
+        return jsonify(message="Account not found"), 404
+    currency = account.get('currency', DEFAULT_CURRENCY)
+    try:
+        balance = validation.money(data.get('balance'), currency, "balance")
+    except validation.ValidationError as e:
+        return jsonify(message=str(e)), e.status
+
+    # Same fields and audit entry as db.update_account
+    result = await mongo.accounts.update_one({"customerId": customer_id}, {"$set": {
+        "accountType": data.get('accountType'),
+        "balance": balance.minor,
+        "currency": currency,
+        "updatedAt": rollups.utc_now(),
+    }})
+    if not result.matched_count:
+        return jsonify(message="Account not found"), 404
+    if result.modified_count:
+        log_audit("update", "accounts", customer_id, data.get('userId'))
+    return jsonify(message="Account updated successfully"), 200
+
+
+@app.post('/accounts/delete')
+async def delete_account():
+    try:
+        data = await request.get_json()
+        customer_id = validation.customer_id(data)
+    except validation.ValidationError as e:
+        return jsonify(message=str(e)), e.status
+
+    result = await mongo.accounts.delete_one({"customerId": customer_id})
+    if not result.deleted_count:
+        return jsonify(message="Account not found"), 404
+    # Deletes are audited synchronously (db.SYNC_AUDIT_ACTIONS), so the write runs off the loop
+    await asyncio.to_thread(log_audit, "delete", "accounts", customer_id, data.get('userId'))
+    return jsonify(message="Account deleted successfully"), 200
+
+
+# Transfers
+async def apply_delta(account_id, delta, session=None):
+    """balances.apply_delta() on the async driver."""
+    query, update = balances.delta_query(account_id, delta), balances.delta_update(delta)
+    account = await mongo.accounts.find_one_and_update(query, update, return_document=ReturnDocument.AFTER,
+                                                       session=session)
+    if account is not None:
+        return account
+
+    projection = {"balance": 1, "currency": 1}
+    current = await mongo.accounts.find_one(balances.account_filter(account_id), projection, session=session)
+    migration = current and balances.legacy_migration(current)
+    if migration:
+        await mongo.accounts.update_one(*migration, session=session)
+        current = await mongo.accounts.find_one(balances.account_filter(account_id), projection, session=session)
+    balances.check_failure(account_id, delta, current)
+    account = await mongo.accounts.find_one_and_update(query, update, return_document=ReturnDocument.AFTER,
+                                                       session=session)
+    if account is None:
+        raise InsufficientFunds(account_id)
+    return account
+
+
+async def transfer(from_account, to_account, amount, user_id=None, idempotency_key=None, description=""):
+    """transfers.transfer() on the async driver: one multi-document transaction, exactly once per key."""
+    from_account, to_account, transfer_id = transfers.validate(from_account, to_account, amount, idempotency_key,
+                                                               user_id)
+
+    existing = await mongo.transfers.find_one({"_id": transfer_id})
+    if existing is not None:
+        return transfers.check_replay(existing, from_account, to_account, amount)
+
+    async def post(session):
+        now = rollups.utc_now()
+        posted = {}
+        # Fixed order across all transfers: lowest account id first
+        for account_id, delta in sorted([(from_account, -amount), (to_account, amount)]):
+            posted[account_id] = await apply_delta(account_id, delta, session=session)
+        record, transactions = transfers.transfer_documents(transfer_id, from_account, to_account, amount,
+                                                            posted, description, user_id, now)
+        await mongo.transfers.insert_one(record, session=session)
+        await mongo.transactions.insert_many(transactions, session=session)
+        for query, update in transfers.rollup_postings(record):
+            await mongo.account_daily.update_one(query, update, upsert=True, session=session)
+        return record
+
+    locks = [_stripes[index] for index in
+             sorted({hash(key) % transfers.LOCK_STRIPES for key in (from_account, to_account)})]
+    for lock in locks:
+        await lock.acquire()
+    try:
+        async with mongo_client.start_session() as session:
+            record = await session.with_transaction(
+                post,
+                read_concern=ReadConcern("snapshot"),
+                write_concern=WriteConcern("majority"),
+            )
+    except DuplicateKeyError:
+        # Another request with the same key committed first.
+        existing = await mongo.transfers.find_one({"_id": transfer_id})
+        return transfers.check_replay(existing, from_account, to_account, amount)
+    finally:
+        for lock in reversed(locks):
+            lock.release()
+    return transfers.transfer_result(record, duplicate=False)
+
+
+@app.post('/api/transactions/transfer')
+@require_token(tokens.SCOPE_WRITE)
+async def transfer_funds():
+    try:
+        args = validation.transfer_request(await request.get_json(), g.claims,
+                                           request.headers.get('Idempotency-Key'))
+        result = await transfer(**args)
+        log_audit("transfer", "transfers", result["transferId"], args["user_id"],
+                  f"{args['amount']} from {args['from_account']} to {args['to_account']}")
+        return jsonify({"message": "Transaction completed successfully", **result}), 200
+    except validation.ValidationError as e:
+        return jsonify({"message": str(e)}), e.status
+    except AccountNotFound as e:
+        return jsonify({"message": str(e)}), 404
+    except (BalanceError, transfers.TransferError) as e:
+        # Insufficient funds, currency mismatch, non-positive amount
+        return jsonify({"message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"message": str(e)}), 500
+
+
+# History
+@app.get('/api/transactions/history')
+@require_token(tokens.SCOPE_READ)
+async def get_transaction_history():
+    try:
+        user_account = validation.claims_account(g.claims, request.args.get('account'))
+        fields = validation.history_fields(request.args)
+        query = pagination.keyset_filter(validation.history_filter(user_account), request.args.get('cursor'))
+        limit = pagination.clamp_limit(validation.page_limit(request.args, pagination.DEFAULT_PAGE_SIZE))
+    except validation.ValidationError as e:
+        return jsonify({'message': str(e)}), e.status
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    documents = mongo.transactions.find(query, pagination.projection_for(fields)).sort(pagination.SORT)
+
+    # Full history as NDJSON, streamed from the cursor
+    if request.args.get('format') == 'ndjson' or request.accept_mimetypes.best == 'application/x-ndjson':
+        async def lines():
+            async for document in documents.batch_size(500):
+                yield (json.dumps(pagination.to_json_document(document, fields), default=str) + "\n").encode()
+        return Response(lines(), mimetype='application/x-ndjson')
+
+    try:
+        page, next_cursor = pagination.split_page(await documents.limit(limit + 1).to_list(limit + 1), limit, fields)
+    except Exception as e:
+        app.logger.error(f"Error fetching transaction history: {e}")
+        return jsonify({'message': 'Error fetching transaction history'}), 500
+    if not page and not request.args.get('cursor'):
+        return jsonify({'message': 'No transactions found'}), 404
+    return jsonify({'history': page, 'nextCursor': next_cursor}), 200
+
+
+if __name__ == '__main__':
+    app.run(debug=True)
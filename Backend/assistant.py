@@ -0,0 +1,189 @@
+import importlib
+import math
+import os
+import threading
+
+from flask import Blueprint, jsonify, request, url_for
+
+import inference
+import math_solver
+import outbound
+import tokens
+from auth_middleware import require_token
+
+# The AI assistant routes, kept out of the banking app's import path. sympy
+# and transformers (with torch behind it) cost seconds and gigabytes to
+# import, and the DialoGPT model more still. They are imported on first use
+# instead. Workers that never serve an assistant route never pay for them.
+# Math problems are solved in a sandboxed process pool (see math_solver.py);
+# OpenAI and weather calls go through the bounded clients in outbound.py.
+# Set ASSISTANT_PRELOAD=1 to warm everything in a background thread at boot.
+# Set ENABLE_ASSISTANT=0 (see app.py) to leave the blueprint out entirely.
+
+CHATBOT_MODEL = os.getenv('CHATBOT_MODEL', 'microsoft/DialoGPT-medium')
+# /api/galaxy/chat runs on the batching worker pool in inference.py; 0 generates inline instead
+INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', '1'))
+# Default and upper bound for ?wait= on /api/galaxy/chat; each waiting request holds a web worker thread
+CHAT_WAIT_SECONDS = float(os.getenv('CHAT_WAIT_SECONDS', '25'))
+
+assistant_bp = Blueprint('assistant', __name__)
+
+_load_lock = threading.Lock()
+_chatbot = None
+
+
+def lazy_module(name):
+    """Import `name` on first call; later calls are a dict lookup in sys.modules."""
+    return importlib.import_module(name)
+
+
+def get_chatbot():
+    """The text-generation pipeline, built once per process on first use."""
+    global _chatbot
+    if _chatbot is None:
+        with _load_lock:
+            if _chatbot is None:
+                _chatbot = lazy_module('transformers').pipeline('text-generation', model=CHATBOT_MODEL)
+    return _chatbot
+
+
+def preload():
+    """Import the heavy modules and build the model ahead of the first request."""
+    if INFERENCE_WORKERS:
+        inference.get_service()
+    else:
+        get_chatbot()
+
+
+if os.getenv('ASSISTANT_PRELOAD') == '1':
+    threading.Thread(target=preload, name='assistant-preload', daemon=True).start()
+
+
+# AI Chat Endpoint
+@assistant_bp.route('/api/ai-assistant/chat', methods=['POST'])
+def ai_chat():
+    data = request.json
+    user_query = data.get('query', '')
+
+    if not user_query:
+        return jsonify({'error': 'Query cannot be empty.'}), 400
+
+    try:
+        assistant_reply = outbound.chat_completion(
+            [
+                {"role": "system", "content": "You are a helpful AI Assistant."},
+                {"role": "user", "content": user_query}
+            ],
+            max_tokens=150
+        )
+        return jsonify({'reply': assistant_reply}), 200
+    except outbound.UpstreamError as e:
+        return jsonify({'error': str(e)}), e.status
+
+# Translation Endpoint
+@assistant_bp.route('/api/ai-assistant/translate', methods=['POST'])
+def translate():
+    data = request.json
+    text = data.get('text', '')
+
+    if not text:
+        return jsonify({'error': 'Text cannot be empty.'}), 400
+
+    try:
+        return jsonify({'translation': outbound.translate(text)}), 200
+    except outbound.UpstreamError as e:
+        return jsonify({'error': str(e)}), e.status
+
+# Math Solver Endpoint
+@assistant_bp.route('/api/ai-assistant/solve-math', methods=['POST'])
+def solve_math():
+    """Either {"problem": "<expression>"} (sandboxed sympy) or {"formula": "annuity", ...params}."""
+    data = request.json or {}
+    problem = data.get('problem', '')
+    formula = data.get('formula')
+
+    if not problem and not formula:
+        return jsonify({'error': 'Problem cannot be empty.'}), 400
+
+    try:
+        if formula:
+            return jsonify({'formula': formula, 'solution': math_solver.solve_formula(formula, data)}), 200
+        return jsonify({'solution': math_solver.simplify(problem)}), 200
+    except math_solver.SolverTimeout as e:
+        return jsonify({'error': str(e)}), 422
+    except math_solver.SolverBusy as e:
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = '1'
+        return response, 429
+    except math_solver.SolverError as e:
+        return jsonify({'error': str(e)}), 400
+
+# Weather Information Endpoint
+@assistant_bp.route('/api/ai-assistant/weather', methods=['POST'])
+def weather():
+    data = request.json
+    location = data.get('location', '')
+
+    if not location:
+        return jsonify({'error': 'Location cannot be empty.'}), 400
+
+    try:
+        # OpenWeatherMap current weather, cached per city (see outbound.py)
+        return jsonify(outbound.current_weather(location)), 200
+    except outbound.UpstreamError as e:
+        return jsonify({'error': str(e)}), e.status
+
+
+@assistant_bp.route('/api/ai-assistant/upstreams', methods=['GET'])
+@require_token(tokens.SCOPE_ADMIN)
+def upstream_stats():
+    return jsonify({'openai': outbound.openai_api.stats(), 'weather': outbound.weather_api.stats()}), 200
+
+
+def _job_response(job):
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    if job['status'] == inference.QUEUED:
+        response = jsonify(job)
+        response.headers['Location'] = url_for('assistant.chat_result', job_id=job['id'])
+        return response, 202
+    if job['status'] == inference.DONE:
+        return jsonify(job), 200
+    return jsonify(job), 504 if job['status'] == inference.TIMED_OUT else 500
+
+
+@assistant_bp.route('/api/galaxy/chat', methods=['POST'])
+def chat():
+    """Queue a generation. Waits up to ?wait= seconds for it (at most CHAT_WAIT_SECONDS); otherwise 202 + poll URL."""
+    data = request.json or {}
+    user_input = data.get('user_input', '')
+
+    if not user_input:
+        return jsonify({'error': 'No user input provided'}), 400
+    try:
+        max_new_tokens = int(data['max_new_tokens']) if 'max_new_tokens' in data else None
+        wait = float(request.args.get('wait', CHAT_WAIT_SECONDS))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'max_new_tokens and wait must be numbers'}), 400
+    if not math.isfinite(wait) or wait < 0:
+        return jsonify({'error': 'wait must be a non-negative number of seconds'}), 400
+    wait = min(wait, CHAT_WAIT_SECONDS)
+
+    if not INFERENCE_WORKERS:
+        # Inline generation in the request thread (INFERENCE_WORKERS=0)
+        response = get_chatbot()(user_input, max_new_tokens=max_new_tokens or 128, num_return_sequences=1)
+        return jsonify({'response': response[0]['generated_text']})
+
+    service = inference.get_service()
+    try:
+        job_id = service.submit(user_input, max_new_tokens=max_new_tokens)
+    except inference.Overloaded as e:
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    return _job_response(service.wait(job_id, wait) if wait > 0 else service.poll(job_id))
+
+
+@assistant_bp.route('/api/galaxy/chat/<job_id>', methods=['GET'])
+def chat_result(job_id):
+    return _job_response(inference.get_service().poll(job_id))
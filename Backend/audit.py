@@ -0,0 +1,236 @@
+import atexit
+import contextlib
+import logging
+import os
+import queue
+import threading
+import time
+
+from bson import json_util
+from bson.objectid import ObjectId
+from pymongo.errors import BulkWriteError, PyMongoError
+
+import connection
+
+try:
+    import fcntl
+except ImportError:  # Windows: no forking servers, so a single writer per spill file
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Audit events are appended to a bounded in-process queue and written by a
+# background thread with insert_many, whenever `batch_size` events are waiting
+# or `flush_interval` seconds have passed. If the queue is full, or Mongo
+# rejects a batch, events go to an append-only NDJSON spill file (fsynced)
+# and are replayed once Mongo accepts writes again. Events with sync=True
+# skip the queue entirely and are written before log() returns.
+#
+# Worker processes share the spill file, so appends and the hand-over to
+# replay take an exclusive flock on `<spill>.lock`, and only one process at a
+# time replays (a non-blocking flock on `<spill>.replay.lock`). The writer
+# thread survives any error in a batch, and log() restarts it if it has died.
+
+DUPLICATE_KEY = 11000
+
+
+def _env_float(name, default):
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+class AuditWriter:
+    def __init__(self, collection_name="audit_logs", batch_size=500, flush_interval=1.0,
+                 max_queue=10000, put_timeout=0.05, spill_path=None):
+        self.collection_name = collection_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.spill_path = spill_path or os.path.join(os.getcwd(), "audit_spill.ndjson")
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._spill_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._thread_pid = None
+        self._stopping = threading.Event()
+
+    @property
+    def collection(self):
+        return connection.get_database()[self.collection_name]
+
+    # Producer side
+
+    def log(self, event, sync=False):
+        """Record an audit event. With sync=True it is durable (in Mongo or the spill file) on return."""
+        event.setdefault("_id", ObjectId())
+        if sync:
+            self._write_now(event)
+            return
+        self._ensure_started()
+        try:
+            self._queue.put(event, timeout=self.put_timeout)
+        except queue.Full:
+            # Backpressure: the request never waits on Mongo for longer than put_timeout.
+            self._spill([event])
+
+    def _write_now(self, event):
+        try:
+            self.collection.insert_one(event)
+        except PyMongoError as e:
+            if getattr(e, "code", None) == DUPLICATE_KEY:
+                return
+            logger.warning("Synchronous audit write failed, spilling to disk: %s", e)
+            self._spill([event])
+
+    # Consumer side
+
+    def _ensure_started(self):
+        pid = os.getpid()
+        if self._thread is not None and self._thread_pid == pid and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or self._thread_pid != pid or not self._thread.is_alive():
+                if self._thread_pid not in (None, pid):
+                    # Events queued by the parent before fork belong to the parent.
+                    self._queue = queue.Queue(maxsize=self._queue.maxsize)
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread_pid = pid
+                self._thread.start()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = []
+            try:
+                batch = self._drain(self.flush_interval)
+                if batch:
+                    self._write_batch(batch)
+                    batch = []
+                if os.path.exists(self.spill_path) or os.path.exists(self.spill_path + ".replaying"):
+                    self._replay_spill()
+            except Exception:
+                # e.g. an event bson cannot encode; keep the batch on disk and keep the thread alive.
+                logger.exception("Audit writer error")
+                if batch:
+                    self._spill_unencodable(batch)
+                time.sleep(self.flush_interval)
+
+    def _drain(self, wait):
+        batch = []
+        deadline = time.monotonic() + wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_batch(self, batch):
+        try:
+            self.collection.insert_many(batch, ordered=False)
+            return True
+        except BulkWriteError as e:
+            # Events replayed after a partial failure may already be stored.
+            failed = [batch[error["index"]] for error in e.details.get("writeErrors", [])
+                      if error.get("code") != DUPLICATE_KEY]
+            if failed:
+                self._spill(failed)
+            return not failed
+        except PyMongoError as e:
+            logger.warning("Audit batch of %d failed, spilling to disk: %s", len(batch), e)
+            self._spill(batch)
+            return False
+
+    def flush(self, timeout=5.0):
+        """Write everything queued so far; used at shutdown and by tests."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            batch = self._drain(0)
+            if not batch:
+                return
+            self._write_batch(batch)
+
+    def close(self, timeout=5.0):
+        self._stopping.set()
+        if self._thread is not None and self._thread_pid == os.getpid():
+            self._thread.join(timeout)
+        self.flush(timeout)
+
+    # Spill file
+
+    @contextlib.contextmanager
+    def _file_lock(self, suffix, blocking=True):
+        """An exclusive flock on `<spill>.<suffix>`; yields False if non-blocking and already held."""
+        if fcntl is None:
+            yield True
+            return
+        with open(self.spill_path + suffix, "a") as handle:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _spill(self, events):
+        self._spill_lines(json_util.dumps(event) + "\n" for event in events)
+
+    def _spill_unencodable(self, events):
+        lines = []
+        for event in events:
+            try:
+                lines.append(json_util.dumps(event) + "\n")
+            except Exception:
+                lines.append(json_util.dumps({key: repr(value) for key, value in event.items()}) + "\n")
+        self._spill_lines(lines)
+
+    def _spill_lines(self, lines):
+        with self._spill_lock, self._file_lock(".lock"):
+            with open(self.spill_path, "a", encoding="utf-8") as spill:
+                spill.writelines(lines)
+                spill.flush()
+                os.fsync(spill.fileno())
+
+    def _replay_spill(self):
+        with self._file_lock(".replay.lock", blocking=False) as owner:
+            if owner:
+                self._replay_owned()
+
+    def _replay_owned(self):
+        replaying = self.spill_path + ".replaying"
+        with self._spill_lock, self._file_lock(".lock"):
+            if not os.path.exists(replaying):
+                if not os.path.exists(self.spill_path):
+                    return
+                os.replace(self.spill_path, replaying)
+        with open(replaying, encoding="utf-8") as spill:
+            batch = []
+            for line in spill:
+                batch.append(json_util.loads(line))
+                if len(batch) >= self.batch_size:
+                    if not self._write_batch(batch):
+                        # Mongo is still unhealthy; what is left stays on disk.
+                        self._spill_lines(spill)
+                        break
+                    batch = []
+            else:
+                if batch:
+                    self._write_batch(batch)
+        os.remove(replaying)
+
+
+audit_writer = AuditWriter(
+    batch_size=int(_env_float("AUDIT_BATCH_SIZE", 500)),
+    flush_interval=_env_float("AUDIT_FLUSH_INTERVAL", 1.0),
+    max_queue=int(_env_float("AUDIT_MAX_QUEUE", 10000)),
+    put_timeout=_env_float("AUDIT_PUT_TIMEOUT", 0.05),
+    spill_path=os.getenv("AUDIT_SPILL_PATH"),
+)
+atexit.register(audit_writer.close)
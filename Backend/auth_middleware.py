@@ -0,0 +1,52 @@
+import threading
+from functools import wraps
+
+from flask import g, jsonify, request
+
+import tokens
+
+# Bearer-token auth for the Flask apps. It replaces flask_jwt_extended's
+# @jwt_required on the routes it guards. Tokens are checked by one
+# process-wide tokens.TokenVerifier, which caches verified claims until the
+# token expires. Keys come from JWT_SECRET_KEY / JWT_SIGNING_KEYS (see
+# tokens.KeyRing.from_env). The claims are stored on flask.g for the view.
+
+_verifier = None
+_lock = threading.Lock()
+
+
+def get_verifier():
+    global _verifier
+    if _verifier is None:
+        with _lock:
+            if _verifier is None:
+                _verifier = tokens.TokenVerifier(tokens.KeyRing.from_env())
+    return _verifier
+
+
+def require_token(scope=None):
+    """Reject the request with 401 unless it carries a valid access token, or 403 if it lacks `scope`."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            token = tokens.bearer_token(request.headers.get('Authorization'))
+            if token is None:
+                return jsonify(msg="Missing Authorization Header"), 401
+            try:
+                claims = get_verifier().verify(token)
+            except tokens.TokenError as e:
+                return jsonify(msg=str(e)), 401
+            if scope is not None and scope not in claims.get('scp', ()):
+                return jsonify(msg=f"Token lacks the {scope} scope"), 403
+            g.claims = claims
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_claims():
+    return g.claims
+
+
+def token_stats():
+    return get_verifier().stats()
@@ -0,0 +1,209 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import bcrypt
+from pymongo.errors import OperationFailure, PyMongoError
+
+import connection
+import worker_context
+from account_cache import CHANGE_STREAM_UNSUPPORTED
+from lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Password hashing and credential lookups for /register and /auth/login.
+# bcrypt is deliberately slow (~0.25 s of CPU at the default cost). Run on the
+# request threads, a login spike ties up every thread of the web worker and
+# starves all other routes. Here it runs in a small pool of subprocesses, so it
+# uses every core and leaves the web worker's threads and GIL to other requests. At most MAX_PENDING hashes
+# may be queued or running per web worker; callers beyond that get AuthBusy
+# (429) right away instead of piling up behind the pool.
+#
+# Customer credential records (email, name, password hash) are cached by email.
+# set_password() drops the entry in this process. Each process also watches a
+# change stream on `customers` and clears its whole cache whenever a password
+# or email changes or a customer is removed anywhere. Such writes are rare, and
+# a cleared entry costs one find_one next to a 0.25 s bcrypt check. Entries
+# live for CREDENTIAL_TTL seconds while that stream is running. Without it (a
+# standalone mongod has no change streams; a broken stream is being
+# reconnected) they live CREDENTIAL_UNWATCHED_TTL seconds, which bounds how
+# long another worker may accept an old password.
+#
+# With several gunicorn workers, each gets its own pool: set BCRYPT_WORKERS
+# so that workers x BCRYPT_WORKERS is about the number of cores. Pool
+# processes come from the fork server in worker_context.py, so they never
+# re-import the app.
+#
+# A slot is held until its hash actually finishes (released by the pool's
+# callback), not merely until the caller stops waiting. A timed-out hash still
+# occupies the pool, so it still counts against MAX_PENDING.
+
+WORKERS = int(os.getenv("BCRYPT_WORKERS", str(os.cpu_count() or 1)))
+MAX_PENDING = int(os.getenv("BCRYPT_MAX_PENDING", str(WORKERS * 4)))
+QUEUE_WAIT = float(os.getenv("BCRYPT_QUEUE_WAIT", "0.05"))
+TIMEOUT = float(os.getenv("BCRYPT_TIMEOUT", "10"))
+
+CREDENTIAL_FIELDS = {"email": 1, "name": 1, "password": 1}
+CREDENTIAL_TTL = float(os.getenv("CREDENTIAL_TTL", "300"))
+CREDENTIAL_UNWATCHED_TTL = float(os.getenv("CREDENTIAL_UNWATCHED_TTL", "5"))
+CREDENTIAL_WATCH = os.getenv("CREDENTIAL_WATCH", "1") != "0"
+credential_cache = LRUCache(maxsize=int(os.getenv("CREDENTIAL_CACHE_SIZE", "10000")), ttl=CREDENTIAL_TTL)
+
+
+class AuthBusy(RuntimeError):
+    """Too many password hashes in flight; the caller should answer 429."""
+
+
+# Worker side
+
+def _hashpw(password):
+    return bcrypt.hashpw(password, bcrypt.gensalt()).decode("utf-8")
+
+
+def _checkpw(password, hashed):
+    try:
+        return bcrypt.checkpw(password, hashed)
+    except ValueError:  # not a bcrypt hash
+        return False
+
+
+# Parent side
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(MAX_PENDING)
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = worker_context.get_context().Pool(WORKERS)
+        return _pool
+
+
+def _release_slot(_result):
+    _slots.release()
+
+
+def _run(func, *args):
+    if not _slots.acquire(timeout=QUEUE_WAIT):
+        raise AuthBusy("Too many sign-in attempts in progress, please retry")
+    try:
+        pending = _get_pool().apply_async(func, args, callback=_release_slot, error_callback=_release_slot)
+    except BaseException:
+        _slots.release()
+        raise
+    try:
+        return pending.get(TIMEOUT)
+    except multiprocessing.TimeoutError:
+        raise AuthBusy("Password check timed out, please retry")
+
+
+def hash_password(password):
+    """bcrypt hash of `password` as a str, computed in the pool. Raises AuthBusy."""
+    return _run(_hashpw, password.encode("utf-8"))
+
+
+def check_password(password, hashed):
+    """Whether `password` matches the bcrypt hash `hashed`, checked in the pool. Raises AuthBusy."""
+    return _run(_checkpw, password.encode("utf-8"), hashed.encode("utf-8"))
+
+
+def cached_credentials(email):
+    """The cached credential record for `email`, or None on a miss."""
+    _ensure_watching()
+    return credential_cache.get(email)
+
+
+def cache_credentials(email, record):
+    ttl = CREDENTIAL_TTL if watcher_state == "watching" else CREDENTIAL_UNWATCHED_TTL
+    credential_cache.set(email, record, ttl=ttl)
+
+
+def find_credentials(customers, email):
+    """The customer's {_id, email, name, password} record, or None; cached by email."""
+    record = cached_credentials(email)
+    if record is None:
+        record = customers.find_one({"email": email}, CREDENTIAL_FIELDS)
+        if record is not None:
+            cache_credentials(email, record)
+    return record
+
+
+def set_password(customers, email, password):
+    """Store a new hash for `email` and drop its cached credentials. Returns whether a customer matched."""
+    result = customers.update_one({"email": email}, {"$set": {
+        "password": hash_password(password),
+        "updatedAt": datetime.now(timezone.utc),
+    }})
+    credential_cache.pop(email)
+    return result.matched_count == 1
+
+
+# Credential invalidation across workers
+
+watcher_state = "stopped"
+_watch_lock = threading.Lock()
+_watch_thread = None
+_watch_pid = None
+
+
+def _ensure_watching():
+    global _watch_thread, _watch_pid
+    if not CREDENTIAL_WATCH:
+        return
+    pid = os.getpid()
+    if _watch_thread is not None and _watch_pid == pid:
+        return
+    with _watch_lock:
+        if _watch_thread is None or _watch_pid != pid:
+            # Entries cached by the parent before fork are not covered by this process's stream.
+            credential_cache.clear()
+            _watch_thread = threading.Thread(target=_watch, name="credential-cache-watch", daemon=True)
+            _watch_pid = pid
+            _watch_thread.start()
+
+
+def _watch():
+    global watcher_state
+    resume_token = None
+    pipeline = [{"$match": {"$or": [
+                    {"operationType": {"$in": ["replace", "delete"]}},
+                    {"operationType": "update", "updateDescription.updatedFields.password": {"$exists": True}},
+                    {"operationType": "update", "updateDescription.updatedFields.email": {"$exists": True}},
+                ]}},
+                {"$project": {"operationType": 1}}]
+    while True:
+        try:
+            with connection.get_database().customers.watch(pipeline, resume_after=resume_token) as stream:
+                watcher_state = "watching"
+                for _change in stream:
+                    resume_token = stream.resume_token
+                    credential_cache.clear()
+        except OperationFailure as e:
+            if e.code in CHANGE_STREAM_UNSUPPORTED:
+                logger.warning("Credential cache: change streams unavailable (%s); entries expire after %ss",
+                               e, CREDENTIAL_UNWATCHED_TTL)
+                watcher_state = "unsupported"
+                credential_cache.clear()
+                return
+            logger.warning("Credential cache change stream failed, restarting: %s", e)
+            if e.code == 286:  # ChangeStreamHistoryLost: cannot resume
+                resume_token = None
+        except PyMongoError as e:
+            logger.warning("Credential cache change stream interrupted, resuming: %s", e)
+        watcher_state = "reconnecting"
+        if resume_token is None:
+            # Changes made while not watching cannot be replayed
+            credential_cache.clear()
+        time.sleep(1)
+
+
+def stats():
+    return {"workers": WORKERS, "maxPending": MAX_PENDING, "credentials": credential_cache.stats(),
+            "credentialWatcher": watcher_state}
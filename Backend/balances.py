@@ -0,0 +1,115 @@
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+
+import connection
+import rollups
+from money import Money
+
+db = connection.database
+
+# Balance mutations as one atomic round trip each: find_one_and_update with
+# $inc, guarded by `balance >= amount` for debits, returning the post-image.
+# There is no read-modify-write window, so concurrent deposits and
+# withdrawals can never overwrite each other. A session is only needed when
+# several documents have to change together (see transfers).
+
+
+class BalanceError(ValueError):
+    pass
+
+
+class AccountNotFound(BalanceError):
+    def __init__(self, account_id):
+        super().__init__("Account not found")
+        self.account_id = account_id
+
+
+class CurrencyMismatch(BalanceError):
+    pass
+
+
+class InsufficientFunds(BalanceError):
+    def __init__(self, account_id):
+        super().__init__("Insufficient balance")
+        self.account_id = account_id
+
+
+def account_filter(account_id):
+    return {"_id": ObjectId(account_id) if ObjectId.is_valid(account_id) else account_id}
+
+
+# The query builders below are shared with the async app (asgi.py), which runs
+# the same operations on an async driver.
+
+def delta_query(account_id, delta, extra_filter=None):
+    """Match the account only if it holds `delta`'s currency and, for debits, covers the amount."""
+    query = {**account_filter(account_id), "currency": delta.currency, **(extra_filter or {})}
+    if delta.minor < 0:
+        query["balance"] = {"$gte": -delta.minor}
+    return query
+
+
+def delta_update(delta):
+    return {"$inc": {"balance": delta.minor}, "$set": {"updatedAt": rollups.utc_now()}}
+
+
+def legacy_migration(account):
+    """(filter, update) rewriting a legacy float balance as minor units, or None if already migrated."""
+    if "currency" in account:
+        return None
+    balance = Money.from_document(account)
+    return (
+        {"_id": account["_id"], "currency": {"$exists": False}, "balance": account.get("balance")},
+        {"$set": {"balance": balance.minor, "currency": balance.currency}},
+    )
+
+
+def check_failure(account_id, delta, current):
+    """Raise the error explaining why a guarded update on `current` (the re-read account) did not match."""
+    if current is None:
+        raise AccountNotFound(account_id)
+    if current.get("currency") != delta.currency:
+        raise CurrencyMismatch(f"Currency mismatch: account is {current.get('currency')}, amount is {delta.currency}")
+    if delta.minor < 0 and current["balance"] < -delta.minor:
+        raise InsufficientFunds(account_id)
+
+
+def _migrate_legacy_balance(account_id, session=None):
+    """Rewrite a legacy float balance (no `currency` field) as minor units. Returns the account."""
+    account = db.accounts.find_one(account_filter(account_id), {"balance": 1, "currency": 1}, session=session)
+    migration = account and legacy_migration(account)
+    if not migration:
+        return account
+    db.accounts.update_one(*migration, session=session)
+    return db.accounts.find_one(account_filter(account_id), {"balance": 1, "currency": 1}, session=session)
+
+
+def apply_delta(account_id, delta, session=None, extra_filter=None):
+    """Add `delta` (Money, negative for debits) to an account's balance and return the updated account.
+
+    Debits only apply while the balance covers them. Raises AccountNotFound or
+    InsufficientFunds; the extra read to tell them apart only happens on failure.
+    """
+    query, update = delta_query(account_id, delta, extra_filter), delta_update(delta)
+    account = db.accounts.find_one_and_update(query, update, return_document=ReturnDocument.AFTER, session=session)
+    if account is not None:
+        return account
+
+    check_failure(account_id, delta, _migrate_legacy_balance(account_id, session=session))
+    # The balance was legacy and has just been migrated, or it moved between the two reads.
+    account = db.accounts.find_one_and_update(query, update, return_document=ReturnDocument.AFTER, session=session)
+    if account is None:
+        raise InsufficientFunds(account_id)
+    return account
+
+
+def credit(account_id, amount, session=None):
+    if amount.minor <= 0:
+        raise BalanceError("Amount must be positive")
+    return apply_delta(account_id, amount, session=session)
+
+
+def debit(account_id, amount, session=None):
+    if amount.minor <= 0:
+        raise BalanceError("Amount must be positive")
+    return apply_delta(account_id, -amount, session=session)
@@ -0,0 +1,142 @@
+import os
+import threading
+
+from pymongo import MongoClient, ReadPreference
+from pymongo.read_concern import ReadConcern
+from pymongo.write_concern import WriteConcern
+
+# Single MongoClient per process. Every data-access module gets its handles
+# from here instead of building its own client (and socket pool) at import.
+# The client is created lazily on first use and re-created in a forked child,
+# so pre-fork servers such as gunicorn never share sockets across workers.
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def load_settings():
+    """Connection settings from the environment, with defaults suited to one web worker."""
+    w = os.getenv("MONGO_WRITE_CONCERN", "majority")
+    return {
+        "uri": os.getenv("MONGO_URI", "mongodb://localhost:27017/"),
+        "database": os.getenv("MONGO_DB_NAME", "banking_system"),
+        "maxPoolSize": _env_int("MONGO_MAX_POOL_SIZE", 20),
+        "minPoolSize": _env_int("MONGO_MIN_POOL_SIZE", 0),
+        "maxIdleTimeMS": _env_int("MONGO_MAX_IDLE_TIME_MS", 60000),
+        "connectTimeoutMS": _env_int("MONGO_CONNECT_TIMEOUT_MS", 5000),
+        "serverSelectionTimeoutMS": _env_int("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000),
+        "socketTimeoutMS": _env_int("MONGO_SOCKET_TIMEOUT_MS", 30000),
+        "waitQueueTimeoutMS": _env_int("MONGO_WAIT_QUEUE_TIMEOUT_MS", 5000),
+        "write_concern": WriteConcern(w=int(w) if w.isdigit() else w,
+                                      wtimeout=_env_int("MONGO_WRITE_TIMEOUT_MS", 10000)),
+        "read_concern": ReadConcern(os.getenv("MONGO_READ_CONCERN", "local")),
+        "read_preference": ReadPreference.PRIMARY,
+    }
+
+
+_lock = threading.Lock()
+_client = None
+_client_pid = None
+_settings = None
+_databases = {}
+
+
+def configure(**overrides):
+    """Override settings before first use (tests, scripts). Closes any existing client."""
+    global _settings
+    with _lock:
+        _settings = {**load_settings(), **overrides}
+        _close_locked()
+
+
+def client_options(settings):
+    """Keyword arguments for a client constructor; the async app (asgi.py) builds its client from these too."""
+    return {key: value for key, value in settings.items()
+            if key not in ("uri", "database", "write_concern", "read_concern", "read_preference")}
+
+
+def get_client():
+    """Return this process's MongoClient, creating it on first call."""
+    global _client, _client_pid, _settings
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+    with _lock:
+        if _client is None or _client_pid != pid:
+            # A client inherited across fork must not be used (or closed) by the child.
+            if _settings is None:
+                _settings = load_settings()
+            _client = MongoClient(_settings["uri"], connect=False, **client_options(_settings))
+            _client_pid = pid
+            _databases.clear()
+        return _client
+
+
+def get_database(name=None):
+    """Database handle carrying the configured read/write concerns."""
+    client = get_client()
+    name = name or _settings["database"]
+    handle = _databases.get(name)
+    if handle is None:
+        handle = _databases[name] = client.get_database(
+            name,
+            write_concern=_settings["write_concern"],
+            read_concern=_settings["read_concern"],
+            read_preference=_settings["read_preference"],
+        )
+    return handle
+
+
+def _close_locked():
+    global _client, _client_pid
+    if _client is not None and _client_pid == os.getpid():
+        _client.close()
+    _client = None
+    _client_pid = None
+    _databases.clear()
+
+
+def close():
+    with _lock:
+        _close_locked()
+
+
+def _reset_after_fork():
+    # Drop the parent's client without closing it; its sockets belong to the parent.
+    global _client, _client_pid, _lock
+    _client = None
+    _client_pid = None
+    _databases.clear()
+    _lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class LazyDatabase:
+    """Stand-in for a pymongo Database that resolves to `get_database()` on first attribute access.
+
+    Lets modules keep a module-level `db` (`db.accounts.find_one(...)`) without
+    opening a connection at import time.
+    """
+
+    def __init__(self, name=None):
+        self._name = name
+
+    def _resolve(self):
+        return get_database(self._name)
+
+    def __getattr__(self, attribute):
+        return getattr(self._resolve(), attribute)
+
+    def __getitem__(self, collection):
+        return self._resolve()[collection]
+
+    def __repr__(self):
+        return f"LazyDatabase({self._name or (_settings or load_settings())['database']!r})"
+
+
+database = LazyDatabase()
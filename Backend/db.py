@@ -1,48 +1,57 @@
-from pymongo import MongoClient
-from bson.objectid import ObjectId
-from datetime import datetime
-from pymongo.errors import OperationFailure
-
-# MongoDB Connection
+from pymongo.read_concern import ReadConcern
+from pymongo.write_concern import WriteConcern
+
+import balances
+import connection
+import rollups
+from account_cache import account_cache
+from audit import audit_writer
+from indexes import ensure_indexes
+from money import DEFAULT_CURRENCY, Money
+
+# MongoDB Connection (shared, lazily created client; see connection.py)
 def get_database():
-    client = MongoClient("mongodb://localhost:27017/")
-    return client['banking_system']
+    return connection.get_database()
 
-db = get_database()
+db = connection.database
 
 # Audit Logging
-def log_audit(action, collection_name, document_id, user_id, details=""):
-    """Extended audit logging."""
-    db.audit_logs.insert_one({
+# Actions that must be durable before the request returns; everything else is batched.
+SYNC_AUDIT_ACTIONS = {"delete", "transaction_error"}
+
+def log_audit(action, collection_name, document_id, user_id, details="", sync=None):
+    """Extended audit logging. Queued for a batched background write unless `sync`."""
+    audit_writer.log({
         "action": action,
         "collection": collection_name,
         "documentId": str(document_id) if document_id else None,
         "userId": user_id,
-        "timestamp": datetime.now(),
+        "timestamp": rollups.utc_now(),
         "details": details or "No additional details provided"
-    })
+    }, sync=action in SYNC_AUDIT_ACTIONS if sync is None else sync)
 
 
 # Insert Functions
 def insert_customer(customer_data, user_id):
     """Insert customer with dynamic data."""
-    customer_data["createdAt"] = datetime.now()
-    customer_data["updatedAt"] = datetime.now()
+    customer_data["createdAt"] = rollups.utc_now()
+    customer_data["updatedAt"] = rollups.utc_now()
     inserted_id = db.customers.insert_one(customer_data).inserted_id
     log_audit("insert", "customers", inserted_id, user_id)
     return inserted_id
 
 def insert_account(account_data, user_id):
     """Insert account with dynamic data."""
-    account_data["createdAt"] = datetime.now()
-    account_data["updatedAt"] = datetime.now()
+    account_data["createdAt"] = rollups.utc_now()
+    account_data["updatedAt"] = rollups.utc_now()
     inserted_id = db.accounts.insert_one(account_data).inserted_id
+    account_cache.store(account_data)
     log_audit("insert", "accounts", inserted_id, user_id) 
     return inserted_id
 
 def insert_transaction(transaction_data, user_id):
     """Insert transaction with dynamic data."""
-    transaction_data["date"] = datetime.now()
+    transaction_data["date"] = rollups.utc_now()
     inserted_id = db.transactions.insert_one(transaction_data).inserted_id
     log_audit("insert", "transactions", inserted_id, user_id)
     return inserted_id
@@ -50,11 +59,12 @@ def insert_transaction(transaction_data, user_id):
 # Update Functions
 def update_account(customer_id, account_updates, user_id):
     """Update account with dynamic data."""
-    account_updates["updatedAt"] = datetime.now()
+    account_updates["updatedAt"] = rollups.utc_now()
     result = db.accounts.update_one(
         {"customerId": customer_id},
         {"$set": account_updates}
     )
+    account_cache.invalidate(customer_id=customer_id)
     if result.modified_count > 0:
         log_audit("update", "accounts", customer_id, user_id)
     return result
@@ -62,119 +72,118 @@ def update_account(customer_id, account_updates, user_id):
 def delete_account(customer_id, user_id):
     """Delete account by customerId."""
     result = db.accounts.delete_one({"customerId": customer_id})
+    account_cache.invalidate(customer_id=customer_id)
     if result.deleted_count > 0:
         log_audit("delete", "accounts", customer_id, user_id)
     return result
 
 # Schema Generation
-def get_account_schema(customer_id, account_type, balance, user_id):
-    """Generate account schema for insertion."""
+def get_account_schema(customer_id, account_type, balance, user_id, currency=DEFAULT_CURRENCY):
+    """Generate account schema for insertion. `balance` is stored as integer minor units."""
     return {
         "customerId": customer_id,
         "accountType": account_type,
-        "balance": balance,
+        "balance": Money.coerce(balance, currency).minor,
+        "currency": currency,
         "userId": user_id, 
-        "createdAt": datetime.now(),
-        "updatedAt": datetime.now()
+        "createdAt": rollups.utc_now(),
+        "updatedAt": rollups.utc_now()
     }
 
 def get_transaction_schema(account_id, customer_id, transaction_type, amount, balance_after):
-    """Generate a validated transaction schema."""
+    """Generate a validated transaction schema. `amount` and `balance_after` are Money."""
     if not isinstance(account_id, str):
         account_id = str(account_id)
+    if amount.currency != balance_after.currency:
+        raise ValueError("Amount and balance must share a currency")
     return {
         "accountId": account_id,
         "customerId": customer_id,
         "transactionType": transaction_type,
-        "amount": amount,
-        "balanceAfterTransaction": balance_after,
-        "date": datetime.now()
+        "amount": amount.minor,
+        "balanceAfterTransaction": balance_after.minor,
+        "currency": amount.currency,
+        "date": rollups.utc_now()
     }
 
 
 # Query Functions
 def get_account_by_customer_id(customer_id):
-    """Fetch an account by customerId."""
-    return db.accounts.find_one({"customerId": customer_id})
+    """Fetch an account by customerId (cached; see account_cache.py)."""
+    return account_cache.get_by_customer(customer_id)
+
+def get_account(account_id):
+    """Fetch an account by _id (cached; see account_cache.py)."""
+    return account_cache.get(account_id)
+
+def iter_all_accounts(batch_size=500):
+    """Stream all accounts from the cursor without materializing the collection."""
+    yield from db.accounts.find().batch_size(batch_size)
 
 def get_all_accounts():
-    """Fetch all accounts."""
-    return list(db.accounts.find())
+    """Fetch all accounts. Prefer iter_all_accounts() for large collections."""
+    return list(iter_all_accounts())
+
+def iter_all_transactions(batch_size=500):
+    """Stream all transactions with validation."""
+    for transaction in db.transactions.find().batch_size(batch_size):
+        if "accountId" in transaction and "date" in transaction:
+            # Convert ObjectId to string if required
+            transaction["_id"] = str(transaction["_id"])
+        yield transaction
 
 def get_all_transactions():
-    """Fetch all transactions with validation."""
-    transactions = list(db.transactions.find())
-    for transaction in transactions:
-        if "accountId" not in transaction or "date" not in transaction:
-            continue  # Skip invalid transactions
-        # Convert ObjectId to string if required
-        transaction["_id"] = str(transaction["_id"])
-    return transactions
+    """Fetch all transactions. Prefer iter_all_transactions() for large collections."""
+    return list(iter_all_transactions())
 
 
 # Transaction Process
-def process_transaction(account_id, transaction_type, amount, user_id):
-    """Process deposit, withdrawal or transfer with error handling and transaction integrity."""
-    # Start a session for transaction processing
-    session = db.client.start_session()
+def process_transaction(account_id, transaction_type, amount, user_id, currency=DEFAULT_CURRENCY):
+    """Process a deposit or withdrawal: balance update, transaction record and daily rollup in one transaction.
+
+    As in transfers.py, the three writes commit together in one
+    multi-document transaction, so a failed record insert can never leave a
+    balance change behind. with_transaction() retries transient errors.
+    """
     try:
-        with session.start_transaction():
-            account = db.accounts.find_one({"_id": ObjectId(account_id)}, session=session)
-            if not account:
-                raise ValueError("Account not found")
-
-            if transaction_type == "deposit":
-                new_balance = account['balance'] + amount
-            elif transaction_type == "withdrawal":
-                if account['balance'] < amount:
-                    raise ValueError("Insufficient balance")
-                new_balance = account['balance'] - amount
-            else:
-                raise ValueError("Invalid transaction type")
-
-            # Update the account balance
-            update_result = db.accounts.update_one(
-                {"_id": ObjectId(account_id)},
-                {"$set": {"balance": new_balance, "updatedAt": datetime.now()}},
-                session=session
+        amount = Money.coerce(amount, currency)
+        if transaction_type == "deposit":
+            post_balance, delta = balances.credit, amount
+        elif transaction_type == "withdrawal":
+            post_balance, delta = balances.debit, -amount
+        else:
+            raise ValueError("Invalid transaction type")
+
+        def post(session):
+            account = post_balance(account_id, amount, session=session)
+            new_balance = Money.from_document(account)
+            transaction_data = get_transaction_schema(account_id, account.get('customerId'), transaction_type,
+                                                      amount, new_balance)
+            inserted_id = db.transactions.insert_one(transaction_data, session=session).inserted_id
+            rollups.record_posting(db, account_id, delta, new_balance, transaction_data["date"], session=session)
+            return account, new_balance, inserted_id
+
+        with connection.get_client().start_session() as session:
+            account, new_balance, inserted_id = session.with_transaction(
+                post,
+                read_concern=ReadConcern("snapshot"),
+                write_concern=WriteConcern("majority"),
             )
-            if update_result.modified_count == 0:
-                raise OperationFailure("Failed to update account balance")
-
-            # Insert the transaction record
-            transaction_data = get_transaction_schema(account_id, account['customerId'], transaction_type, amount, new_balance)
-            insert_transaction(transaction_data, user_id)
-
-            # Log audit for transaction
-            log_audit("transaction", "transactions", account_id, user_id, f"{transaction_type} of {amount} successful")
+        account_cache.store(account)
 
-        session.commit_transaction()
-        return {"status": "success", "new_balance": new_balance}
+        # Log audit for transaction
+        log_audit("insert", "transactions", inserted_id, user_id)
+        log_audit("transaction", "transactions", account_id, user_id, f"{transaction_type} of {amount} successful")
+        return {"status": "success", "new_balance": new_balance.to_json(), "currency": new_balance.currency}
 
     except Exception as e:
-        session.abort_transaction()
         log_audit("transaction_error", "transactions", account_id, user_id, str(e))
         return {"status": "failure", "message": str(e)}
-    finally:
-        session.end_session()
 
 # Index Creation
 def create_indexes():
-    """Create necessary indexes for the collections."""
-    # Ensure unique index on `customerId` in `accounts`
-    existing_indexes = db.accounts.index_information()
-    if "customerId_1" in existing_indexes:
-        if not existing_indexes["customerId_1"].get("unique", False):
-            db.accounts.drop_index("customerId_1")
-            print("Dropped non-unique index on `customerId` in `accounts`.")
-
-    db.accounts.create_index("customerId", unique=True)
-    print("Created unique index on `customerId` in `accounts`.")
-
-    # Index on `accountId` in `transactions`
-    if "accountId_1" not in db.transactions.index_information():
-        db.transactions.create_index("accountId")
-        print("Created index on `accountId` in `transactions`.")
+    """Create necessary indexes for the collections (see the registry in indexes.py)."""
+    ensure_indexes(db)
 
 # Encryption Functions (Placeholder)
 def encrypt_data(data, key):
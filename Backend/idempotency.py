@@ -0,0 +1,139 @@
+import functools
+import hashlib
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from flask import g, jsonify, make_response, request
+from pymongo.errors import DuplicateKeyError
+
+from lru import LRUCache
+
+# Idempotency keys for mutating endpoints. A client sends `Idempotency-Key`;
+# the first request with a key claims it in Mongo, runs, and stores its JSON
+# response. Retries with the same key get that response back without running
+# the view again, which means no account writes and no extra audit entries.
+# Completed responses are also kept in an in-process LRU, so a retry storm
+# costs one dictionary lookup. Stored keys expire through a TTL index on
+# `createdAt` (see indexes.py).
+#
+# Keys are scoped to the caller: the token subject on authenticated routes,
+# else the client address, so two clients that pick the same key never see
+# each other's responses. A claim is a lease. If its worker dies before
+# completing, a retry with the same request takes the claim over once
+# LEASE has passed, instead of getting 409 until the TTL index removes it.
+
+HEADER = "Idempotency-Key"
+PENDING, COMPLETE = "pending", "complete"
+LEASE = timedelta(seconds=60)
+
+
+class IdempotencyStore:
+    def __init__(self, collection, cache_size=10000, cache_ttl=3600):
+        """`collection` is a zero-argument callable returning the Mongo collection to use."""
+        self._collection = collection
+        self.cache = LRUCache(maxsize=cache_size, ttl=cache_ttl)
+
+    @property
+    def collection(self):
+        return self._collection()
+
+    def lookup(self, key):
+        """Return the stored record for `key`, from the LRU if possible, else from Mongo."""
+        record = self.cache.get(key)
+        if record is not None:
+            return record
+        record = self.collection.find_one({"_id": key})
+        if record is not None and record["state"] == COMPLETE:
+            self.cache.set(key, record)
+        return record
+
+    def claim(self, key, fingerprint, owner, lease=LEASE):
+        """Reserve `key` for `owner`. Returns None on success, else the existing record.
+
+        A pending claim older than `lease` is taken over by the same request.
+        """
+        now = datetime.now(timezone.utc)
+        try:
+            self.collection.insert_one({
+                "_id": key,
+                "state": PENDING,
+                "fingerprint": fingerprint,
+                "owner": owner,
+                "createdAt": now,
+                "claimedAt": now,
+            })
+            return None
+        except DuplicateKeyError:
+            pass
+        taken = self.collection.find_one_and_update(
+            {"_id": key, "state": PENDING, "fingerprint": fingerprint, "claimedAt": {"$lt": now - lease}},
+            {"$set": {"owner": owner, "claimedAt": now}},
+        )
+        if taken is not None:
+            return None
+        return self.lookup(key) or {"state": PENDING, "fingerprint": fingerprint}
+
+    def complete(self, key, fingerprint, status, body, owner=None):
+        record = {"_id": key, "state": COMPLETE, "fingerprint": fingerprint, "status": status, "body": body}
+        query = {"_id": key} if owner is None else {"_id": key, "owner": owner}
+        result = self.collection.update_one(query, {"$set": {"state": COMPLETE, "status": status, "body": body}})
+        if result.matched_count:  # else another request took the claim over
+            self.cache.set(key, record)
+
+    def release(self, key, owner=None):
+        """Forget a claim whose request failed, so the client can retry it for real."""
+        query = {"_id": key, "state": PENDING}
+        if owner is not None:
+            query["owner"] = owner
+        self.collection.delete_one(query)
+        self.cache.pop(key)
+
+
+def caller_scope():
+    """Who the key belongs to: the token subject if the view is authenticated, else the client address."""
+    claims = g.get("claims")
+    if claims and claims.get("sub") is not None:
+        return f"sub:{claims['sub']}"
+    return f"addr:{request.remote_addr}"
+
+
+def _replay(record, fingerprint):
+    if record.get("fingerprint") != fingerprint:
+        return jsonify(message="Idempotency-Key was already used with a different request"), 422
+    if record["state"] != COMPLETE:
+        return jsonify(message="A request with this Idempotency-Key is still in progress"), 409
+    response = make_response(jsonify(record["body"]), record["status"])
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(store):
+    """Decorate a Flask view so requests carrying an Idempotency-Key run at most once."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            client_key = request.headers.get(HEADER)
+            if not client_key:
+                return view(*args, **kwargs)
+            key = f"{request.endpoint}:{caller_scope()}:{client_key}"
+            fingerprint = hashlib.sha256(request.get_data(cache=True)).hexdigest()
+
+            owner = uuid.uuid4().hex
+            record = store.lookup(key)
+            if record is None or record["state"] == PENDING:
+                record = store.claim(key, fingerprint, owner)
+            if record is not None:
+                return _replay(record, fingerprint)
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except Exception:
+                store.release(key, owner)
+                raise
+            if response.status_code >= 500 or not response.is_json:
+                store.release(key, owner)
+            else:
+                store.complete(key, fingerprint, response.status_code, response.get_json(), owner)
+            return response
+        return wrapper
+    return decorator
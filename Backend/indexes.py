@@ -0,0 +1,148 @@
+import sys
+from collections import namedtuple
+
+from pymongo.errors import OperationFailure
+
+# Declarative index registry. Every query shape the app issues on a hot path
+# has an index here that serves both its filter and its sort. ensure_indexes()
+# is an idempotent migration run at startup. check_query_plans() explains the
+# hot queries and reports any that fall back to a collection scan.
+
+IndexSpec = namedtuple("IndexSpec", ["collection", "keys", "options"])
+HotQuery = namedtuple("HotQuery", ["name", "collection", "filter", "sort"])
+
+
+def index(collection, *keys, **options):
+    return IndexSpec(collection, list(keys), options)
+
+
+def index_name(keys):
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+
+INDEXES = [
+    index("accounts", ("customerId", 1), unique=True),
+    index("customers", ("email", 1), unique=True),
+    index("transactions", ("accountId", 1), ("date", -1), ("_id", -1)),
+    index("transactions", ("customerId", 1), ("date", -1)),
+    index("account_daily", ("accountId", 1), ("day", -1)),
+    index("accrual_checkpoints", ("job", 1)),
+    index("idempotency_keys", ("createdAt", 1), expireAfterSeconds=24 * 3600),
+]
+
+# Indexes superseded by a compound index above (same prefix), dropped on migration
+OBSOLETE_INDEXES = {
+    "transactions": ["accountId_1",
+                     # history reads each account's own legs by accountId now
+                     "fromAccount_1_date_-1__id_-1", "toAccount_1_date_-1__id_-1"],
+}
+
+# Representative values stand in for request parameters; only the shape matters.
+HOT_QUERIES = [
+    HotQuery("history", "transactions", {"accountId": "probe"}, [("date", -1), ("_id", -1)]),
+    HotQuery("transactions by customer", "transactions", {"customerId": "probe"}, [("date", -1)]),
+    HotQuery("daily rollups", "account_daily", {"accountId": "probe"}, [("day", -1)]),
+    HotQuery("account by customer", "accounts", {"customerId": "probe"}, None),
+    HotQuery("login", "customers", {"email": "probe@example.com"}, None),
+]
+
+
+INDEX_NOT_FOUND = 27
+
+
+def _drop_index(collection, name):
+    """Drop an index; False if it is already gone (another worker ran the migration first)."""
+    try:
+        collection.drop_index(name)
+    except OperationFailure as e:
+        if e.code != INDEX_NOT_FOUND:
+            raise
+        return False
+    return True
+
+
+def ensure_indexes(db, specs=None, log=print):
+    """Create missing indexes and rebuild ones whose definition changed. Safe to run repeatedly.
+
+    Every worker runs this at startup, possibly at the same moment, so an index
+    another worker dropped in the meantime counts as dropped; create_index is
+    already a no-op for an identical index.
+    """
+    specs = INDEXES if specs is None else specs
+    existing_by_collection = {}
+    for spec in specs:
+        existing = existing_by_collection.get(spec.collection)
+        if existing is None:
+            existing = existing_by_collection[spec.collection] = db[spec.collection].index_information()
+        name = spec.options.get("name") or index_name(spec.keys)
+        current = existing.get(name)
+        if current is not None:
+            same_keys = [(field, int(direction)) for field, direction in current["key"]] == spec.keys
+            same_options = all(current.get(option) == value for option, value in spec.options.items()
+                               if option != "name")
+            if same_keys and same_options:
+                continue
+            if _drop_index(db[spec.collection], name):
+                log(f"Dropped outdated index `{name}` on `{spec.collection}`.")
+        db[spec.collection].create_index(spec.keys, name=name, **{k: v for k, v in spec.options.items()
+                                                                    if k != "name"})
+        existing[name] = {"key": spec.keys, **spec.options}
+        log(f"Created index `{name}` on `{spec.collection}`.")
+
+    for collection, names in OBSOLETE_INDEXES.items():
+        existing = existing_by_collection.get(collection) or db[collection].index_information()
+        for name in names:
+            if name in existing and _drop_index(db[collection], name):
+                log(f"Dropped superseded index `{name}` on `{collection}`.")
+
+
+def _stages(plan):
+    """Every `stage` name in an explain plan tree."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _stages(value)
+
+
+def winning_plan_stages(db, query):
+    cursor = db[query.collection].find(query.filter)
+    if query.sort:
+        cursor = cursor.sort(query.sort)
+    return list(_stages(cursor.explain()["queryPlanner"]["winningPlan"]))
+
+
+def check_query_plans(db, queries=None):
+    """Return {query name: stages} for every hot query whose winning plan has a COLLSCAN."""
+    queries = HOT_QUERIES if queries is None else queries
+    failures = {}
+    for query in queries:
+        stages = winning_plan_stages(db, query)
+        if "COLLSCAN" in stages:
+            failures[query.name] = stages
+    return failures
+
+
+def assert_no_collscans(db, queries=None):
+    failures = check_query_plans(db, queries)
+    if failures:
+        raise AssertionError("Hot queries fall back to COLLSCAN: " +
+                             "; ".join(f"{name} -> {stages}" for name, stages in failures.items()))
+
+
+if __name__ == "__main__":
+    # python indexes.py: migrate, then exit non-zero if any hot query scans its collection
+    import connection
+
+    database = connection.get_database()
+    try:
+        ensure_indexes(database)
+    except OperationFailure as e:
+        sys.exit(f"Index migration failed: {e}")
+    failures = check_query_plans(database)
+    for name, stages in failures.items():
+        print(f"COLLSCAN: {name} -> {' > '.join(stages)}")
+    sys.exit(1 if failures else 0)
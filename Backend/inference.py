@@ -0,0 +1,226 @@
+import importlib
+import itertools
+import os
+import queue
+import threading
+import time
+import uuid
+
+import worker_context
+from lru import LRUCache
+
+# Text generation off the request thread. Prompts go onto a queue that is
+# read by one or more worker processes, each holding its own copy of the model.
+# A worker takes whatever arrives within a short window (up to max_batch) and
+# runs it as one batched generate call. Every job carries a token budget and
+# a deadline. Jobs whose deadline passes in the queue are dropped, and
+# generation itself is cut off with max_time. Callers either wait for the
+# result or poll for it by job id.
+#
+# Workers are not forked from the web worker, so the parent never imports
+# the model stack. They come from the fork server in worker_context.py, which
+# does not re-import the app either. The model is built by a factory named as "module:function"; the
+# default builds the DialoGPT pipeline.
+
+DEFAULT_FACTORY = "inference:load_pipeline"
+QUEUED, DONE, FAILED, TIMED_OUT = "queued", "done", "failed", "timeout"
+
+
+class Overloaded(RuntimeError):
+    pass
+
+
+def _env_float(name, default):
+    return float(os.getenv(name, default))
+
+
+def load_pipeline():
+    """The DialoGPT text-generation pipeline, set up for left-padded batches."""
+    from transformers import pipeline
+
+    chatbot = pipeline("text-generation", model=os.getenv("CHATBOT_MODEL", "microsoft/DialoGPT-medium"))
+    if chatbot.tokenizer.pad_token_id is None:
+        chatbot.tokenizer.pad_token_id = chatbot.tokenizer.eos_token_id
+    chatbot.tokenizer.padding_side = "left"
+    return chatbot
+
+
+def _resolve(factory):
+    module, _, name = factory.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def _collect_batch(requests, max_batch, window):
+    """Block for one job, then take more until the window closes. Returns (batch, stop)."""
+    first = requests.get()
+    if first is None:
+        return [], True
+    batch, closes = [first], time.monotonic() + window
+    while len(batch) < max_batch:
+        remaining = closes - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            job = requests.get(timeout=remaining)
+        except queue.Empty:
+            break
+        if job is None:
+            return batch, True
+        batch.append(job)
+    return batch, False
+
+
+def _run_batch(model, batch, results):
+    now = time.time()
+    live = []
+    for job in batch:
+        if job["expires"] <= now:
+            results.put((job["id"], TIMED_OUT, "Timed out waiting for a worker"))
+        else:
+            live.append(job)
+    # One generate call per token budget; most traffic shares the default budget.
+    live.sort(key=lambda job: job["max_new_tokens"])
+    for max_new_tokens, group in itertools.groupby(live, key=lambda job: job["max_new_tokens"]):
+        group = list(group)
+        max_time = max(0.05, min(job["expires"] for job in group) - time.time())
+        try:
+            outputs = model([job["prompt"] for job in group], batch_size=len(group),
+                            max_new_tokens=max_new_tokens, max_time=max_time, num_return_sequences=1)
+        except Exception as e:
+            for job in group:
+                results.put((job["id"], FAILED, str(e)))
+            continue
+        for job, output in zip(group, outputs):
+            results.put((job["id"], DONE, output[0]["generated_text"]))
+
+
+def _worker_main(factory, requests, results, max_batch, window):
+    model = _resolve(factory)()
+    stop = False
+    while not stop:
+        batch, stop = _collect_batch(requests, max_batch, window)
+        if batch:
+            _run_batch(model, batch, results)
+
+
+class InferenceService:
+    def __init__(self, factory=DEFAULT_FACTORY, workers=1, max_batch=8, batch_window=0.02,
+                 max_new_tokens=128, max_seconds=30.0, max_pending=256, result_ttl=300):
+        self.factory = factory
+        self.workers = workers
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.max_new_tokens = max_new_tokens
+        self.max_seconds = max_seconds
+        self.max_pending = max_pending
+        self._jobs = {}
+        self._finished = LRUCache(maxsize=10000, ttl=result_ttl)
+        self._lock = threading.Lock()
+        self._processes = []
+        self._closed = threading.Event()
+
+    def start(self):
+        context = worker_context.get_context()
+        self._context = context
+        self._requests = context.Queue()
+        self._results = context.Queue()
+        self._processes = [self._spawn() for _ in range(self.workers)]
+        threading.Thread(target=self._collect, name="inference-results", daemon=True).start()
+        return self
+
+    def _spawn(self):
+        process = self._context.Process(
+            target=_worker_main, name="inference-worker", daemon=True,
+            args=(self.factory, self._requests, self._results, self.max_batch, self.batch_window),
+        )
+        process.start()
+        return process
+
+    def _collect(self):
+        """Route results to their jobs; replace workers that died."""
+        next_check = time.monotonic() + 1.0
+        while not self._closed.is_set():
+            if time.monotonic() >= next_check:
+                self._processes = [p if p.is_alive() else self._spawn() for p in self._processes]
+                next_check = time.monotonic() + 1.0
+            try:
+                job_id, status, payload = self._results.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            key = "response" if status == DONE else "error"
+            with self._lock:
+                job = self._jobs.pop(job_id, None)
+                if job is None:
+                    continue
+                # Published before the job leaves _jobs, so a poll never sees neither.
+                self._finished.set(job_id, {"id": job_id, "status": status, key: payload})
+            job["event"].set()
+
+    def submit(self, prompt, max_new_tokens=None, timeout=None):
+        """Queue a prompt and return its job id. Budgets are capped at the service limits."""
+        max_new_tokens = min(max_new_tokens or self.max_new_tokens, self.max_new_tokens)
+        timeout = min(timeout or self.max_seconds, self.max_seconds)
+        job_id, expires = uuid.uuid4().hex, time.time() + timeout
+        with self._lock:
+            if len(self._jobs) >= self.max_pending:
+                raise Overloaded("Too many generation requests in flight")
+            self._jobs[job_id] = {"event": threading.Event(), "expires": expires}
+        self._requests.put({"id": job_id, "prompt": prompt, "max_new_tokens": max_new_tokens, "expires": expires})
+        return job_id
+
+    def poll(self, job_id):
+        """{"status": ...} for a job, or None if it is unknown or its result has expired."""
+        finished = self._finished.get(job_id)
+        if finished is not None:
+            return finished
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return self._finished.get(job_id)
+            if time.time() > job["expires"] + 5:
+                # Its worker died mid-batch; the result is never coming.
+                del self._jobs[job_id]
+                return {"id": job_id, "status": TIMED_OUT, "error": "Generation timed out"}
+        return {"id": job_id, "status": QUEUED}
+
+    def wait(self, job_id, timeout):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            job["event"].wait(timeout)
+        return self.poll(job_id)
+
+    def generate(self, prompt, max_new_tokens=None, timeout=None):
+        """Blocking convenience: submit and wait for the result."""
+        job_id = self.submit(prompt, max_new_tokens, timeout)
+        return self.wait(job_id, min(timeout or self.max_seconds, self.max_seconds) + 1)
+
+    def close(self):
+        self._closed.set()
+        for _ in self._processes:
+            self._requests.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service():
+    """The process-wide service, started on first use from INFERENCE_* env vars."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = InferenceService(
+                    factory=os.getenv("INFERENCE_MODEL_FACTORY", DEFAULT_FACTORY),
+                    workers=int(os.getenv("INFERENCE_WORKERS", "1")),
+                    max_batch=int(os.getenv("INFERENCE_MAX_BATCH", "8")),
+                    batch_window=_env_float("INFERENCE_BATCH_WINDOW_MS", 20) / 1000,
+                    max_new_tokens=int(os.getenv("INFERENCE_MAX_NEW_TOKENS", "128")),
+                    max_seconds=_env_float("INFERENCE_MAX_SECONDS", 30),
+                ).start()
+    return _service
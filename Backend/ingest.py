@@ -0,0 +1,204 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from itertools import islice
+
+from pymongo.errors import BulkWriteError
+
+import rollups
+from db import db, log_audit
+from money import DEFAULT_CURRENCY, Money
+
+# Streaming bulk ingestion of transaction rows (settlement files and the like).
+# Rows are read one at a time from NDJSON or CSV, validated, and written in
+# insert_many chunks, so memory use depends on the chunk size, not on the
+# size of the file. Errors are reported per row, by 1-based row number.
+# Each inserted row that carries a balanceAfterTransaction is also folded into
+# the daily rollups (rollups.py), so statements see ingested history.
+
+TRANSACTION_TYPES = {"deposit", "withdrawal", "transfer_in", "transfer_out", "fee", "interest", "refund"}
+REQUIRED_FIELDS = ("accountId", "transactionType", "amount")
+MAX_REPORTED_ERRORS = 1000
+
+
+class RowError(ValueError):
+    pass
+
+
+def iter_ndjson(stream):
+    """Yield (row_number, dict-or-RowError) from a text stream of JSON lines."""
+    for row_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield row_number, RowError(f"Invalid JSON: {e}")
+            continue
+        yield row_number, row if isinstance(row, dict) else RowError("Row is not a JSON object")
+
+
+def iter_csv(stream):
+    """Yield (row_number, dict-or-RowError) from a text stream of CSV with a header line."""
+    reader = csv.DictReader(stream)
+    for row_number, row in enumerate(reader, 1):
+        if None in row:
+            yield row_number, RowError("Row has more columns than the header")
+        else:
+            yield row_number, row
+
+
+def _parse_date(value):
+    """A row's date as naive UTC, like every stored date, so rollup days match rebuild() and statements."""
+    if value in (None, ""):
+        parsed = datetime.now(timezone.utc)
+    elif isinstance(value, (int, float)):
+        parsed = datetime.fromtimestamp(value, timezone.utc)
+    else:
+        try:
+            parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            raise RowError(f"Invalid date: {value!r}")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def validate_row(row):
+    """Turn one input row into a transaction document, or raise RowError."""
+    missing = [field for field in REQUIRED_FIELDS if row.get(field) in (None, "")]
+    if missing:
+        raise RowError(f"Missing fields: {', '.join(missing)}")
+    transaction_type = str(row["transactionType"]).lower()
+    if transaction_type not in TRANSACTION_TYPES:
+        raise RowError(f"Invalid transactionType: {row['transactionType']!r}")
+    currency = row.get("currency") or DEFAULT_CURRENCY
+    try:
+        amount = Money.of(row["amount"], currency)
+    except (TypeError, ValueError) as e:
+        raise RowError(f"Invalid amount: {e}")
+    if amount.minor <= 0:
+        raise RowError("Amount must be positive")
+    document = {
+        "accountId": str(row["accountId"]),
+        "customerId": row.get("customerId") or None,
+        "transactionType": transaction_type,
+        "amount": amount.minor,
+        "currency": currency,
+        "date": _parse_date(row.get("date")),
+    }
+    for field in ("reference", "description", "fromAccount", "toAccount"):
+        if row.get(field) not in (None, ""):
+            document[field] = str(row[field])
+    if row.get("balanceAfterTransaction") not in (None, ""):
+        try:
+            document["balanceAfterTransaction"] = Money.of(row["balanceAfterTransaction"], currency).minor
+        except (TypeError, ValueError) as e:
+            raise RowError(f"Invalid balanceAfterTransaction: {e}")
+    return document
+
+
+class IngestReport:
+    def __init__(self, ordered):
+        self.ordered = ordered
+        self.received = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+        self.stopped_at = None
+
+    def error(self, row_number, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "error": message})
+
+    def to_dict(self):
+        report = {
+            "ordered": self.ordered,
+            "received": self.received,
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errorsTruncated": self.failed > len(self.errors),
+        }
+        if self.stopped_at is not None:
+            report["stoppedAtRow"] = self.stopped_at
+        return report
+
+
+def _update_rollups(documents, user_id):
+    postings = list(filter(None, map(rollups.transaction_update, documents)))
+    if not postings:
+        return
+    try:
+        db.account_daily.bulk_write(postings, ordered=False)
+    except Exception as e:
+        # The rows are stored; rollups.rebuild() repairs the days they fall on.
+        log_audit("rollup_error", "account_daily", None, user_id, str(e))
+
+
+def _write_chunk(documents, row_numbers, report, ordered, user_id):
+    failed = []
+    try:
+        result = db.transactions.insert_many(documents, ordered=ordered)
+        report.inserted += len(result.inserted_ids)
+    except BulkWriteError as e:
+        details = e.details
+        report.inserted += details.get("nInserted", 0)
+        for write_error in details.get("writeErrors", []):
+            failed.append(write_error["index"])
+            report.error(row_numbers[write_error["index"]], write_error.get("errmsg", "Write failed"))
+    if ordered and failed:
+        # Ordered inserts stop at the first error; later rows in the chunk were never tried.
+        _update_rollups(documents[:failed[0]], user_id)
+        report.stopped_at = row_numbers[failed[0]]
+        return False
+    failed = set(failed)
+    _update_rollups([document for index, document in enumerate(documents) if index not in failed], user_id)
+    log_audit("bulk_insert", "transactions", None, user_id,
+              f"Rows {row_numbers[0]}-{row_numbers[-1]} ingested")
+    return True
+
+
+def ingest_transactions(rows, user_id, ordered=False, chunk_size=1000):
+    """Validate and insert (row_number, row) pairs in chunks of `chunk_size`.
+
+    Unordered ingestion skips bad rows and keeps going. Ordered ingestion
+    stops at the first invalid or rejected row, keeping everything before it.
+    """
+    report = IngestReport(ordered)
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        documents, row_numbers = [], []
+        for row_number, row in chunk:
+            report.received += 1
+            try:
+                if isinstance(row, RowError):
+                    raise row
+                documents.append(validate_row(row))
+                row_numbers.append(row_number)
+            except RowError as e:
+                report.error(row_number, str(e))
+                if ordered:
+                    report.stopped_at = row_number
+                    break
+        if documents and not _write_chunk(documents, row_numbers, report, ordered, user_id):
+            break
+        if report.stopped_at is not None:
+            break
+    return report.to_dict()
+
+
+def ingest_stream(binary_stream, content_type, user_id, ordered=False, chunk_size=1000):
+    """Ingest NDJSON (default) or CSV straight from a binary request stream."""
+    text = io.TextIOWrapper(binary_stream, encoding="utf-8", newline="")
+    if content_type and "csv" in content_type:
+        rows = iter_csv(text)
+    else:
+        rows = iter_ndjson(text)
+    return ingest_transactions(rows, user_id, ordered=ordered, chunk_size=chunk_size)
@@ -0,0 +1,204 @@
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+from decimal import ROUND_HALF_EVEN, Decimal
+from functools import partial
+from multiprocessing import Pool
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+import connection
+import rollups
+from money import Money
+
+# End-of-day interest accrual. The account space is split into _id ranges
+# ($bucketAuto), and the ranges are processed in a process pool. Each worker has
+# its own client (see connection.py) and works in batches: one insert_many
+# of interest transactions, one bulk_write of balance updates and one
+# bulk_write of rollup postings per batch.
+#
+# A run is safe to repeat or resume after a crash. Every range keeps a
+# checkpoint (last _id done) in `accrual_checkpoints`. Interest transactions
+# have a deterministic _id per account and day, so re-inserting them is a
+# no-op. The balance $inc only matches while `lastAccrual` is not yet the
+# accrual day. Transactions are written before balances, so a crash between
+# the two leaves a record whose credit is applied on resume. It can never
+# leave a credit without a record.
+
+CHECKPOINTS = "accrual_checkpoints"
+DAYS_PER_YEAR = 365
+DUPLICATE_KEY = 11000
+
+
+def daily_interest(balance, rate):
+    """One day of simple interest on `balance` (minor units) at annual `rate`, rounded half to even."""
+    interest = Decimal(balance) * Decimal(str(rate)) / DAYS_PER_YEAR
+    return int(interest.quantize(Decimal(1), rounding=ROUND_HALF_EVEN))
+
+
+def _id_filter(lower=None, upper=None, after=None):
+    bounds = {}
+    if after is not None:
+        bounds["$gt"] = after
+    elif lower is not None:
+        bounds["$gte"] = lower
+    if upper is not None:
+        bounds["$lt"] = upper
+    return {"_id": bounds} if bounds else {}
+
+
+def plan_ranges(db, job_id, ranges):
+    """Checkpoint ids for `job_id`, splitting the accounts into `ranges` _id ranges on the first call."""
+    existing = [checkpoint["_id"] for checkpoint in db[CHECKPOINTS].find({"job": job_id}, {"_id": 1}).sort("_id", 1)]
+    if existing:
+        return existing
+    buckets = list(db.accounts.aggregate([
+        {"$match": {"interestRate": {"$gt": 0}}},
+        {"$bucketAuto": {"groupBy": "$_id", "buckets": ranges}},
+    ]))
+    # Bucket minimums are the boundaries; the outer ranges stay open-ended so accounts created meanwhile are covered.
+    boundaries = [None] + [bucket["_id"]["min"] for bucket in buckets[1:]] + [None]
+    checkpoints = [
+        {"_id": f"{job_id}:{index:05d}", "job": job_id, "lower": lower, "upper": upper,
+         "lastId": None, "done": False, "credited": 0}
+        for index, (lower, upper) in enumerate(zip(boundaries, boundaries[1:]))
+    ]
+    try:
+        db[CHECKPOINTS].insert_many(checkpoints, ordered=False)
+    except BulkWriteError as e:
+        # Another launcher planned the same job concurrently; its checkpoints win.
+        if any(error["code"] != DUPLICATE_KEY for error in e.details["writeErrors"]):
+            raise
+        return plan_ranges(db, job_id, ranges)
+    return [checkpoint["_id"] for checkpoint in checkpoints]
+
+
+def _migrate_legacy_balances(db, id_range):
+    """Rewrite legacy float balances in the range as minor units, like balances.py does on first use."""
+    legacy = db.accounts.find({**id_range, "interestRate": {"$gt": 0}, "currency": {"$exists": False}},
+                              {"balance": 1})
+    updates = []
+    for account in legacy:
+        balance = Money.from_document(account)
+        updates.append(UpdateOne(
+            {"_id": account["_id"], "currency": {"$exists": False}, "balance": account.get("balance")},
+            {"$set": {"balance": balance.minor, "currency": balance.currency}},
+        ))
+    if updates:
+        db.accounts.bulk_write(updates, ordered=False)
+
+
+def _inserted_indexes(db, records):
+    """Insert `records`, ignoring ones that already exist; return the indexes that were new."""
+    try:
+        db.transactions.insert_many(records, ordered=False)
+        return range(len(records))
+    except BulkWriteError as e:
+        errors = e.details["writeErrors"]
+        if any(error["code"] != DUPLICATE_KEY for error in errors):
+            raise
+        duplicates = {error["index"] for error in errors}
+        return [index for index in range(len(records)) if index not in duplicates]
+
+
+def _post_batch(db, accounts, day, posted_at):
+    """Accrue one batch of accounts; returns how many were credited by this call."""
+    records, updates, postings = [], [], []
+    for account in accounts:
+        interest = daily_interest(account["balance"], account["interestRate"])
+        if interest <= 0:
+            continue
+        amount = Money(interest, account["currency"])
+        balance_after = Money(account["balance"], account["currency"]) + amount
+        records.append({
+            "_id": f"interest:{account['_id']}:{day:%Y-%m-%d}",
+            "accountId": str(account["_id"]),
+            "customerId": account.get("customerId"),
+            "transactionType": "interest",
+            "amount": amount.minor,
+            "balanceAfterTransaction": balance_after.minor,
+            "currency": amount.currency,
+            "date": posted_at,
+        })
+        updates.append(UpdateOne(
+            {"_id": account["_id"], "lastAccrual": {"$ne": day}},
+            {"$inc": {"balance": amount.minor}, "$set": {"lastAccrual": day, "updatedAt": posted_at}},
+        ))
+        postings.append(rollups.posting_update(account["_id"], amount, balance_after, posted_at))
+    if not records:
+        return 0
+
+    new = _inserted_indexes(db, records)
+    credited = db.accounts.bulk_write(updates, ordered=False).modified_count
+    # Rollups only for records this call created, so a retried batch never counts twice.
+    # Postings lost to a crash mid-batch are restored by rollups.rebuild().
+    if new:
+        db.account_daily.bulk_write([postings[index] for index in new], ordered=False)
+    return credited
+
+
+def accrue_range(checkpoint_id, day, batch_size=1000):
+    """Accrue interest for one checkpointed _id range, resuming after its last completed batch."""
+    db = connection.get_database()
+    checkpoint = db[CHECKPOINTS].find_one({"_id": checkpoint_id})
+    if checkpoint["done"]:
+        return 0
+    _migrate_legacy_balances(db, _id_filter(checkpoint["lower"], checkpoint["upper"]))
+
+    posted_at = day + timedelta(days=1) - timedelta(milliseconds=1)
+    query = {
+        **_id_filter(checkpoint["lower"], checkpoint["upper"], after=checkpoint["lastId"]),
+        "interestRate": {"$gt": 0},
+        "currency": {"$exists": True},
+        "balance": {"$gt": 0},
+        "lastAccrual": {"$ne": day},
+    }
+    accounts = (db.accounts.find(query, {"balance": 1, "interestRate": 1, "currency": 1, "customerId": 1})
+                .sort("_id", 1).batch_size(batch_size))
+    credited, batch = 0, []
+
+    def flush():
+        nonlocal credited
+        done = _post_batch(db, batch, day, posted_at)
+        credited += done
+        db[CHECKPOINTS].update_one({"_id": checkpoint_id},
+                                   {"$set": {"lastId": batch[-1]["_id"]}, "$inc": {"credited": done}})
+        batch.clear()
+
+    for account in accounts:
+        batch.append(account)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    db[CHECKPOINTS].update_one({"_id": checkpoint_id}, {"$set": {"done": True, "finishedAt": rollups.utc_now()}})
+    return credited
+
+
+def run_accrual(day, workers=None, ranges=None, batch_size=1000):
+    """Accrue one day of interest across all accounts. Re-running the same day resumes or no-ops."""
+    day = rollups.day_start(day)
+    workers = workers or os.cpu_count() or 1
+    job_id = f"interest:{day:%Y-%m-%d}"
+    started = time.perf_counter()
+    checkpoint_ids = plan_ranges(connection.get_database(), job_id, ranges or workers * 4)
+    # Children open their own clients; don't carry this one across the fork.
+    connection.close()
+    with Pool(workers) as pool:
+        credited = sum(pool.imap_unordered(partial(accrue_range, day=day, batch_size=batch_size), checkpoint_ids))
+    return {"job": job_id, "ranges": len(checkpoint_ids), "credited": credited,
+            "seconds": round(time.perf_counter() - started, 3)}
+
+
+if __name__ == "__main__":
+    # python interest.py [YYYY-MM-DD] [--workers N]: accrue one day (default: yesterday)
+    parser = argparse.ArgumentParser(description="End-of-day interest accrual")
+    parser.add_argument("day", nargs="?", type=datetime.fromisoformat,
+                        default=rollups.utc_now() - timedelta(days=1))
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--ranges", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    print(run_accrual(args.day, workers=args.workers, ranges=args.ranges, batch_size=args.batch_size))
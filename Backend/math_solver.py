@@ -0,0 +1,283 @@
+import importlib
+import os
+import queue
+import re
+import signal
+import threading
+from decimal import Decimal, InvalidOperation, localcontext
+
+import worker_context
+from lru import LRUCache
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, the wall-clock timeout still applies
+    resource = None
+
+# Math solving for the assistant. Symbolic simplification runs in up to
+# WORKERS solver processes (from the fork server in worker_context.py), each
+# working on one problem at a time. Each has an address-space limit
+# (RLIMIT_AS) and a per-task CPU budget: the soft RLIMIT_CPU is raised past the
+# CPU time already used, and SIGXCPU aborts the task, not the worker. The
+# caller also waits with a wall-clock budget. It starts when a free worker
+# takes the problem, so time spent waiting for a worker never counts against
+# it. If it expires (a worker stuck in C code, e.g. a huge integer power),
+# only that worker, which is running nothing else, is killed and replaced.
+# Callers that find every worker busy for QUEUE_WAIT seconds get SolverBusy.
+#
+# Results and rejections are cached by normalized expression. Timeouts are
+# cached only for TIMEOUT_CACHE_SECONDS, so a retry gets a fresh attempt soon.
+#
+# The common financial formulas (annuity payment, compound interest) have a
+# Decimal fast path that never touches sympy.
+
+CPU_SECONDS = int(os.getenv("MATH_CPU_SECONDS", "2"))
+MEMORY_MB = int(os.getenv("MATH_MEMORY_MB", "512"))
+WORKERS = int(os.getenv("MATH_WORKERS", "2"))
+QUEUE_WAIT = float(os.getenv("MATH_QUEUE_WAIT", "5"))
+STARTUP_SECONDS = 60
+TIMEOUT_CACHE_SECONDS = float(os.getenv("MATH_TIMEOUT_CACHE_SECONDS", "30"))
+MAX_LENGTH = 500
+
+# sympify() evaluates its input, so only plain arithmetic notation gets through.
+ALLOWED = re.compile(r"^[0-9A-Za-z_+\-*/^()., =<>]*$")
+FORBIDDEN = re.compile(r"__|\b(?:import|lambda|exec|eval|open|globals|locals|getattr)\b")
+
+cache = LRUCache(maxsize=int(os.getenv("MATH_CACHE_SIZE", "4096")))
+
+
+class SolverError(ValueError):
+    pass
+
+
+class SolverTimeout(SolverError):
+    pass
+
+
+class SolverBusy(SolverError):
+    """Every solver process stayed busy for QUEUE_WAIT seconds; nothing was run."""
+
+
+class _CpuExceeded(Exception):
+    pass
+
+
+def normalize(problem):
+    """Cache key for an expression: whitespace-insensitive, `^` and `**` treated alike."""
+    return "".join(problem.split()).replace("^", "**")
+
+
+def _check(problem):
+    if not problem or len(problem) > MAX_LENGTH:
+        raise SolverError(f"Problem must be 1 to {MAX_LENGTH} characters")
+    if not ALLOWED.match(problem) or FORBIDDEN.search(problem):
+        raise SolverError("Problem may only contain numbers, names and arithmetic operators")
+
+
+# Worker side
+
+def _on_sigxcpu(signum, frame):
+    raise _CpuExceeded()
+
+
+def _init_worker(memory_mb):
+    if resource is not None:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        signal.signal(signal.SIGXCPU, _on_sigxcpu)
+    # Loaded once per worker, so the import never counts against a task's budget.
+    importlib.import_module("sympy")
+
+
+def _cpu_used():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _simplify(problem, cpu_seconds):
+    import sympy
+
+    if resource is not None:
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        resource.setrlimit(resource.RLIMIT_CPU, (int(_cpu_used()) + cpu_seconds + 1, hard))
+    try:
+        return "ok", str(sympy.simplify(sympy.sympify(problem)))
+    except _CpuExceeded:
+        return "timeout", f"Problem took more than {cpu_seconds}s of CPU"
+    except MemoryError:
+        return "timeout", f"Problem needed more than {MEMORY_MB} MB"
+    except Exception as e:
+        return "error", f"Invalid math problem: {e}"
+    finally:
+        if resource is not None:
+            resource.setrlimit(resource.RLIMIT_CPU, (resource.RLIM_INFINITY, hard))
+
+
+def _worker_main(conn, memory_mb):
+    _init_worker(memory_mb)
+    conn.send("ready")
+    while True:
+        try:
+            problem, cpu_seconds = conn.recv()
+        except EOFError:  # the parent is gone
+            return
+        conn.send(_simplify(problem, cpu_seconds))
+
+
+# Parent side
+
+class _Worker:
+    """One solver process and its pipe. It runs one problem at a time."""
+
+    def __init__(self, context):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child, MEMORY_MB), name="math-solver",
+                                       daemon=True)
+        self.process.start()
+        child.close()
+        self.ready = False
+
+    def run(self, problem, budget):
+        """The worker's (status, result), or None if it did not answer within `budget` seconds."""
+        if not self.ready:
+            # Start-up (fork, rlimits, importing sympy) is not part of the task's budget.
+            if not self.conn.poll(STARTUP_SECONDS) or self.conn.recv() != "ready":
+                raise OSError("math solver worker did not start")
+            self.ready = True
+        self.conn.send((problem, CPU_SECONDS))
+        if not self.conn.poll(budget):
+            return None
+        return self.conn.recv()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(1)
+        self.conn.close()
+
+
+_pool_lock = threading.Lock()
+_idle = queue.LifoQueue()
+_started = 0
+_pool_pid = None
+
+
+def _checkout(wait):
+    """A free worker, started on demand up to WORKERS. Raises SolverBusy."""
+    global _idle, _started, _pool_pid
+    with _pool_lock:
+        if _pool_pid != os.getpid():
+            # Workers started by the parent before fork belong to the parent.
+            _idle, _started, _pool_pid = queue.LifoQueue(), 0, os.getpid()
+        idle = _idle
+        try:
+            return idle.get_nowait()
+        except queue.Empty:
+            pass
+        if _started < WORKERS:
+            worker = _Worker(worker_context.get_context())
+            _started += 1
+            return worker
+    try:
+        return idle.get(timeout=wait)
+    except queue.Empty:
+        raise SolverBusy("The math solver is busy, please retry")
+
+
+def _checkin(worker):
+    _idle.put(worker)
+
+
+def _discard(worker):
+    """Kill a worker that overran its budget or broke, and hand a replacement to the next waiter."""
+    global _started
+    worker.kill()
+    with _pool_lock:
+        if _pool_pid != os.getpid():
+            return
+        try:
+            _idle.put(_Worker(worker_context.get_context()))
+        except Exception:
+            _started -= 1
+            raise
+
+
+def simplify(problem, timeout=None):
+    """sympy.simplify(sympify(problem)) as a string, sandboxed and cached. Raises SolverError."""
+    _check(problem)
+    key = normalize(problem)
+    cached = cache.get(key)
+    if cached is None:
+        worker = _checkout(QUEUE_WAIT)
+        try:
+            cached = worker.run(key, timeout or CPU_SECONDS * 2 + 1)
+        except (EOFError, OSError):  # the worker died, e.g. killed for memory
+            cached = None
+        except BaseException:
+            _discard(worker)
+            raise
+        if cached is None:
+            _discard(worker)
+            cached = ("timeout", "Problem took too long to solve")
+        else:
+            _checkin(worker)
+        cache.set(key, cached, ttl=TIMEOUT_CACHE_SECONDS if cached[0] == "timeout" else None)
+    status, result = cached
+    if status == "ok":
+        return result
+    raise SolverTimeout(result) if status == "timeout" else SolverError(result)
+
+
+# Financial fast path
+
+def _decimal(params, name, default=None):
+    value = params.get(name, default)
+    if value is None:
+        raise SolverError(f"Missing parameter: {name}")
+    try:
+        value = Decimal(str(value))
+    except InvalidOperation:
+        raise SolverError(f"Invalid number for {name}: {value!r}")
+    if not value.is_finite() or value < 0:
+        raise SolverError(f"{name} must be a non-negative number")
+    return value
+
+
+def annuity_payment(params):
+    """Level payment for a loan: principal, annual rate, periods (payments), periods_per_year (12)."""
+    principal = _decimal(params, "principal")
+    periods = _decimal(params, "periods")
+    if periods == 0:
+        raise SolverError("periods must be positive")
+    rate = _decimal(params, "rate") / _decimal(params, "periods_per_year", 12)
+    if rate == 0:
+        return principal / periods
+    return principal * rate / (1 - (1 + rate) ** -periods)
+
+
+def compound_interest(params):
+    """Future value: principal, annual rate, years, compounding periods per year (12)."""
+    principal = _decimal(params, "principal")
+    compounding = _decimal(params, "compounding", 12)
+    if compounding == 0:
+        raise SolverError("compounding must be positive")
+    rate = _decimal(params, "rate")
+    return principal * (1 + rate / compounding) ** (compounding * _decimal(params, "years"))
+
+
+FORMULAS = {
+    "annuity": annuity_payment,
+    "compound_interest": compound_interest,
+}
+
+
+def solve_formula(name, params):
+    """Evaluate a known financial formula with Decimal arithmetic; returns the result rounded to cents."""
+    formula = FORMULAS.get(name)
+    if formula is None:
+        raise SolverError(f"Unknown formula: {name}. Known: {', '.join(sorted(FORMULAS))}")
+    with localcontext() as context:
+        context.prec = 34
+        try:
+            return str(formula(params).quantize(Decimal("0.01")))
+        except (ArithmeticError, InvalidOperation) as e:
+            raise SolverError(f"Cannot evaluate {name}: {e}")
@@ -0,0 +1,221 @@
+from decimal import ROUND_HALF_EVEN, Decimal, InvalidOperation
+
+# Fixed-point money: amounts are held as integer minor units (cents, pence, ...)
+# together with an ISO 4217 currency code, so sums are exact and columns of
+# `.minor` values can be aggregated as plain int64 arrays.
+
+DEFAULT_CURRENCY = "USD"
+
+# Minor-unit exponent per currency; anything not listed uses 2.
+CURRENCY_EXPONENTS = {
+    "BHD": 3,
+    "JPY": 0,
+    "KRW": 0,
+    "KWD": 3,
+    "OMR": 3,
+}
+
+
+# Document fields that hold integer minor units when the document has a `currency`
+MONEY_FIELDS = ("balance", "amount", "balanceAfterTransaction")
+
+
+def currency_exponent(currency):
+    return CURRENCY_EXPONENTS.get(currency, 2)
+
+
+def parse_minor(text, exponent=2):
+    """Parse a decimal string such as "-12.3" into minor units without going through Decimal."""
+    text = text.strip()
+    sign = 1
+    if text[:1] in ("-", "+"):
+        sign = -1 if text[0] == "-" else 1
+        text = text[1:]
+    whole, _, fraction = text.partition(".")
+    if not (whole or fraction) or (whole and not whole.isdigit()) or (fraction and not fraction.isdigit()):
+        # Scientific notation and other exotic forms take the slow path. The sign
+        # is already consumed, so Decimal must not see a second one ("+-1").
+        if text[:1] in ("-", "+") or text != text.strip():
+            raise ValueError(f"Invalid amount: {text!r}")
+        try:
+            value = Decimal(text) * sign
+        except InvalidOperation:
+            raise ValueError(f"Invalid amount: {text!r}")
+        return decimal_to_minor(value, exponent)
+    if len(fraction) > exponent:
+        if fraction[exponent:].strip("0"):
+            raise ValueError(f"Amount {text!r} has more than {exponent} decimal places")
+        fraction = fraction[:exponent]
+    return sign * (int(whole or "0") * 10 ** exponent + int(fraction.ljust(exponent, "0") or "0"))
+
+
+def format_minor(minor, exponent=2):
+    """Render minor units as a plain decimal string, e.g. 123456 -> "1234.56"."""
+    if exponent == 0:
+        return str(minor)
+    sign = "-" if minor < 0 else ""
+    whole, fraction = divmod(abs(minor), 10 ** exponent)
+    return f"{sign}{whole}.{fraction:0{exponent}d}"
+
+
+def money_fields_to_json(document, fields=MONEY_FIELDS):
+    """Render the money fields of a stored document as exact decimal strings, in place."""
+    if "currency" in document:
+        exponent = currency_exponent(document["currency"])
+        for field in fields:
+            if isinstance(document.get(field), int):
+                document[field] = format_minor(document[field], exponent)
+    return document
+
+
+def decimal_to_minor(value, exponent=2):
+    if not value.is_finite():
+        raise ValueError(f"Invalid amount: {value}")
+    scaled = value.scaleb(exponent)
+    if scaled != scaled.to_integral_value():
+        raise ValueError(f"Amount {value} has more than {exponent} decimal places")
+    return int(scaled)
+
+
+def round_float_minor(value, exponent=2):
+    """Minor units nearest to a float amount, ties to even (legacy documents only)."""
+    if value != value or value in (float("inf"), float("-inf")):
+        raise ValueError(f"Invalid amount: {value}")
+    return int(Decimal(repr(value)).scaleb(exponent).quantize(Decimal(1), rounding=ROUND_HALF_EVEN))
+
+
+class Money:
+    """An exact amount of one currency, stored as integer minor units."""
+
+    __slots__ = ("minor", "currency")
+
+    def __init__(self, minor=0, currency=DEFAULT_CURRENCY):
+        if not isinstance(minor, int) or isinstance(minor, bool):
+            raise TypeError("Money takes integer minor units; use Money.of() for major units")
+        self.minor = minor
+        self.currency = currency
+
+    @classmethod
+    def of(cls, value, currency=DEFAULT_CURRENCY):
+        """Build from major units given as int, str, Decimal or float (e.g. 12.5 -> 1250 cents)."""
+        exponent = currency_exponent(currency)
+        if isinstance(value, bool):
+            raise TypeError("Invalid amount: bool")
+        if isinstance(value, int):
+            return cls(value * 10 ** exponent, currency)
+        if isinstance(value, str):
+            return cls(parse_minor(value, exponent), currency)
+        if isinstance(value, float):
+            # repr() gives the shortest string that round-trips, e.g. 0.1 -> "0.1".
+            return cls(parse_minor(repr(value), exponent), currency)
+        if isinstance(value, Decimal):
+            return cls(decimal_to_minor(value, exponent), currency)
+        raise TypeError(f"Invalid amount type: {type(value).__name__}")
+
+    @classmethod
+    def coerce(cls, value, currency=DEFAULT_CURRENCY):
+        """Return `value` as Money in `currency`, accepting Money or anything `of` accepts."""
+        if isinstance(value, Money):
+            if value.currency != currency:
+                raise ValueError(f"Currency mismatch: {value.currency} != {currency}")
+            return value
+        return cls.of(value, currency)
+
+    @classmethod
+    def from_document(cls, document, field="balance"):
+        """Read a money field from a Mongo document.
+
+        Documents written with a `currency` field hold integer minor units;
+        older documents without one hold a float in major units. Those floats
+        carry binary noise from years of float arithmetic (0.30000000000000004),
+        so they are rounded half-even to whole cents rather than rejected.
+        """
+        value = document.get(field, 0)
+        if "currency" in document:
+            return cls(int(value), document["currency"])
+        if isinstance(value, float):
+            return cls(round_float_minor(value), DEFAULT_CURRENCY)
+        return cls.of(value or 0)
+
+    @staticmethod
+    def sum(values, currency=DEFAULT_CURRENCY):
+        total = 0
+        for value in values:
+            if value.currency != currency:
+                raise ValueError(f"Currency mismatch: {value.currency} != {currency}")
+            total += value.minor
+        return Money(total, currency)
+
+    @property
+    def exponent(self):
+        return currency_exponent(self.currency)
+
+    def to_decimal(self):
+        return Decimal(self.minor).scaleb(-self.exponent)
+
+    def to_json(self):
+        """Exact decimal string for API responses, e.g. "1234.50"."""
+        return format_minor(self.minor, self.exponent)
+
+    def _check(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        if other.currency != self.currency:
+            raise ValueError(f"Currency mismatch: {self.currency} != {other.currency}")
+        return other.minor
+
+    def __add__(self, other):
+        minor = self._check(other)
+        return NotImplemented if minor is NotImplemented else Money(self.minor + minor, self.currency)
+
+    def __radd__(self, other):
+        # Lets the built-in sum() start from 0.
+        if other == 0 and not isinstance(other, Money):
+            return self
+        return self.__add__(other)
+
+    def __sub__(self, other):
+        minor = self._check(other)
+        return NotImplemented if minor is NotImplemented else Money(self.minor - minor, self.currency)
+
+    def __neg__(self):
+        return Money(-self.minor, self.currency)
+
+    def __abs__(self):
+        return Money(abs(self.minor), self.currency)
+
+    def __eq__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        return self.minor == other.minor and self.currency == other.currency
+
+    def __lt__(self, other):
+        minor = self._check(other)
+        return NotImplemented if minor is NotImplemented else self.minor < minor
+
+    def __le__(self, other):
+        minor = self._check(other)
+        return NotImplemented if minor is NotImplemented else self.minor <= minor
+
+    def __gt__(self, other):
+        minor = self._check(other)
+        return NotImplemented if minor is NotImplemented else self.minor > minor
+
+    def __ge__(self, other):
+        minor = self._check(other)
+        return NotImplemented if minor is NotImplemented else self.minor >= minor
+
+    def __hash__(self):
+        return hash((self.minor, self.currency))
+
+    def __bool__(self):
+        return self.minor != 0
+
+    def __float__(self):
+        return self.minor / 10 ** self.exponent
+
+    def __str__(self):
+        return f"{self.to_json()} {self.currency}"
+
+    def __repr__(self):
+        return f"Money('{self.to_json()}', '{self.currency}')"
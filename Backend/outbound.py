@@ -0,0 +1,194 @@
+import hashlib
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from lru import LRUCache
+
+# Outbound HTTP for the assistant (OpenAI, weather). Each upstream gets:
+#   - one pooled keep-alive requests.Session, sized to its concurrency cap;
+#   - connect/read timeouts on every call;
+#   - a semaphore capping concurrent calls, so a slow upstream ties up at most
+#     that many request threads, and callers beyond it fail fast;
+#   - a circuit breaker that opens after consecutive failures and lets a single
+#     probe through once the cool-down has passed (a probe that ends without
+#     a result, e.g. on an unexpected exception, reopens it);
+#   - an optional TTL cache of parsed JSON responses.
+# Base URLs come from the environment, so tests can point them at a local stub.
+
+
+class UpstreamError(RuntimeError):
+    def __init__(self, message, status=502):
+        super().__init__(message)
+        self.status = status
+
+
+class UpstreamUnavailable(UpstreamError):
+    """The circuit is open or the concurrency cap is reached; nothing was sent."""
+
+    def __init__(self, message):
+        super().__init__(message, status=503)
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, reset_after=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go out now. While half-open, only one probe at a time is allowed."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_after:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state, self.failures = self.CLOSED, 0
+
+    def abandon(self):
+        """End a call that recorded neither success nor failure. An unfinished probe reopens the circuit."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state, self.opened_at = self.OPEN, time.monotonic()
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state, self.opened_at = self.OPEN, time.monotonic()
+
+
+class Upstream:
+    def __init__(self, name, base_url, headers=None, connect_timeout=3.05, read_timeout=15.0,
+                 max_concurrency=8, acquire_timeout=0.5, failure_threshold=5, reset_after=30.0,
+                 cache_size=1024, cache_ttl=300):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.acquire_timeout = acquire_timeout
+        self.breaker = CircuitBreaker(failure_threshold, reset_after)
+        self.cache = LRUCache(maxsize=cache_size, ttl=cache_ttl)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._headers = headers or (lambda: {})
+
+    def request(self, method, path, cache_key=None, cache_ttl=None, **kwargs):
+        """Send one call and return its JSON body. Raises UpstreamError or UpstreamUnavailable."""
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        # Take the slot first: allow() may turn this call into the half-open
+        # probe, and a probe must not be lost to a busy slot.
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise UpstreamUnavailable(f"{self.name} is busy")
+        recorded = False
+        try:
+            if not self.breaker.allow():
+                recorded = True  # nothing was let through, so there is nothing to settle
+                raise UpstreamUnavailable(f"{self.name} is unavailable (circuit open)")
+            try:
+                response = self.session.request(method, self.base_url + path, headers=self._headers(),
+                                                timeout=self.timeout, **kwargs)
+            except requests.RequestException as e:
+                self.breaker.record_failure()
+                recorded = True
+                raise UpstreamError(f"{self.name} request failed: {e.__class__.__name__}")
+            if response.status_code >= 500 or response.status_code == 429:
+                self.breaker.record_failure()
+                recorded = True
+                raise UpstreamError(f"{self.name} returned {response.status_code}")
+            self.breaker.record_success()
+            recorded = True
+        finally:
+            self._slots.release()
+            if not recorded:
+                self.breaker.abandon()
+        try:
+            data = response.json()
+        except ValueError:
+            raise UpstreamError(f"{self.name} returned a non-JSON response")
+        if response.status_code >= 400:
+            message = data.get("message") or data.get("error") if isinstance(data, dict) else None
+            raise UpstreamError(str(message or f"{self.name} returned {response.status_code}"),
+                                status=response.status_code if response.status_code == 404 else 502)
+        if cache_key is not None:
+            self.cache.set(cache_key, data, ttl=cache_ttl)
+        return data
+
+    def stats(self):
+        return {"state": self.breaker.state, "failures": self.breaker.failures, "cache": self.cache.stats()}
+
+
+def _env_float(name, default):
+    return float(os.getenv(name, default))
+
+
+openai_api = Upstream(
+    "openai",
+    os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+    headers=lambda: {"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY', '')}"},
+    read_timeout=_env_float("OPENAI_TIMEOUT", 20),
+    max_concurrency=int(os.getenv("OPENAI_MAX_CONCURRENCY", "8")),
+    cache_ttl=_env_float("TRANSLATION_CACHE_SECONDS", 86400),
+)
+
+weather_api = Upstream(
+    "weather",
+    os.getenv("WEATHER_BASE_URL", "https://api.openweathermap.org"),
+    read_timeout=_env_float("WEATHER_TIMEOUT", 5),
+    max_concurrency=int(os.getenv("WEATHER_MAX_CONCURRENCY", "8")),
+    cache_ttl=_env_float("WEATHER_CACHE_SECONDS", 600),
+)
+
+
+def chat_completion(messages, max_tokens, cache_key=None, model="gpt-3.5-turbo"):
+    """The assistant's reply text from the chat completions API."""
+    data = openai_api.request("POST", "/chat/completions", cache_key=cache_key,
+                              json={"model": model, "messages": messages, "max_tokens": max_tokens})
+    try:
+        return data["choices"][0]["message"]["content"].strip()
+    except (KeyError, IndexError, TypeError):
+        raise UpstreamError("openai returned an unexpected response")
+
+
+def translate(text, language="French"):
+    """Translation of `text`, cached by language and text."""
+    digest = hashlib.sha256(text.encode()).hexdigest()
+    return chat_completion(
+        [{"role": "system", "content": f"You are a translator. Translate the following text into {language}."},
+         {"role": "user", "content": text}],
+        max_tokens=100,
+        cache_key=f"translate:{language}:{digest}",
+    )
+
+
+def current_weather(city):
+    """{city, description, temperature} for a city, cached per city for WEATHER_CACHE_SECONDS."""
+    city = " ".join(city.split())
+    data = weather_api.request("GET", "/data/2.5/weather", cache_key=f"weather:{city.lower()}",
+                               params={"q": city, "appid": os.getenv("WEATHER_API_KEY", ""), "units": "metric"})
+    try:
+        return {
+            "city": data["name"],
+            "description": data["weather"][0]["description"].capitalize(),
+            "temperature": data["main"]["temp"],
+        }
+    except (KeyError, IndexError, TypeError, AttributeError):
+        raise UpstreamError("weather returned an unexpected response")
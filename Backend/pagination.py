@@ -0,0 +1,111 @@
+import base64
+import json
+from datetime import datetime
+
+from bson.objectid import ObjectId
+
+from money import money_fields_to_json
+
+# Keyset pagination over (date, _id), newest first. A cursor is an opaque,
+# URL-safe token holding the sort key of the last document on the previous
+# page. The next page is a range query from that key, so deep pages cost the
+# same as the first one (unlike skip/limit). Pages can also be streamed as
+# NDJSON straight from a Mongo cursor.
+
+SORT = [("date", -1), ("_id", -1)]
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(document):
+    _id = document["_id"]
+    payload = {
+        "d": document["date"].isoformat(),
+        "i": str(_id),
+        "o": isinstance(_id, ObjectId),
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Return (date, _id) from a cursor token; raises ValueError if it was tampered with."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        date = datetime.fromisoformat(payload["d"])
+        _id = ObjectId(payload["i"]) if payload["o"] else payload["i"]
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return date, _id
+
+
+def keyset_filter(base_filter, cursor=None):
+    """`base_filter` restricted to documents that sort after `cursor` in SORT order."""
+    if not cursor:
+        return base_filter
+    date, _id = decode_cursor(cursor)
+    after = {"$or": [{"date": {"$lt": date}}, {"date": date, "_id": {"$lt": _id}}]}
+    return {"$and": [base_filter, after]} if base_filter else after
+
+
+def projection_for(fields):
+    """Mongo projection for the requested fields; the sort keys are always fetched."""
+    if not fields:
+        return None
+    projection = {field: 1 for field in fields}
+    projection.update({"date": 1, "_id": 1, "currency": 1})
+    return projection
+
+
+def to_json_document(document, fields=None):
+    """Make a stored document JSON-safe (ids and dates as strings, money as exact decimals)."""
+    document = money_fields_to_json(document)
+    if fields:
+        document = {key: value for key, value in document.items() if key in fields or key == "currency"}
+    for key, value in document.items():
+        if isinstance(value, ObjectId):
+            document[key] = str(value)
+        elif isinstance(value, datetime):
+            document[key] = value.isoformat()
+    return document
+
+
+def clamp_limit(limit):
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def split_page(documents, limit, fields=None):
+    """(JSON documents, next_cursor) from the `limit + 1` documents read for one page."""
+    next_cursor = encode_cursor(documents[limit - 1]) if len(documents) > limit else None
+    return [to_json_document(document, fields) for document in documents[:limit]], next_cursor
+
+
+def fetch_page(collection, base_filter, cursor=None, limit=DEFAULT_PAGE_SIZE, fields=None):
+    """Return (documents, next_cursor); next_cursor is None on the last page."""
+    limit = clamp_limit(limit)
+    documents = list(
+        collection.find(keyset_filter(base_filter, cursor), projection_for(fields))
+        .sort(SORT)
+        .limit(limit + 1)
+    )
+    return split_page(documents, limit, fields)
+
+
+def stream_ndjson(collection, base_filter, cursor=None, fields=None, batch_size=500):
+    """Iterator of JSON lines, one per document, reading the Mongo cursor in batches of `batch_size`.
+
+    The query, and with it the cursor token, is checked here rather than on
+    first iteration, so a bad cursor raises ValueError before a response starts.
+    """
+    query = keyset_filter(base_filter, cursor)
+
+    def lines():
+        documents = collection.find(query, projection_for(fields)).sort(SORT).batch_size(batch_size)
+        try:
+            for document in documents:
+                yield json.dumps(to_json_document(document, fields), default=str) + "\n"
+        finally:
+            documents.close()
+
+    return lines()
@@ -0,0 +1,231 @@
+from datetime import datetime, timedelta, timezone
+
+from pymongo import UpdateOne
+
+from money import DEFAULT_CURRENCY, Money
+
+# Daily rollups per account, maintained as transactions are posted. One
+# `account_daily` document per account and day holds the opening and closing
+# balance plus credit/debit sums and counts, all in integer minor units. Past
+# balances and period totals are answered from these documents, plus the
+# individual transactions of at most two partial days (the residual tail), so
+# a statement reads a few dozen small documents instead of scanning the
+# account's whole history.
+#
+# Functions take the database as their first argument, so the same rollups
+# work with any connection. Posting dates are naive UTC (utc_now()), the same
+# form statement bounds are converted to, so day buckets are UTC days on
+# every host.
+
+CREDIT_TYPES = ("deposit", "transfer_in", "interest")
+DEBIT_TYPES = ("withdrawal", "transfer_out", "fee")
+ONE_DAY = timedelta(days=1)
+
+
+def utc_now():
+    """The current time as naive UTC, the form every posting date is stored and compared in."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def day_start(when):
+    return datetime(when.year, when.month, when.day)
+
+
+def rollup_id(account_id, day):
+    return f"{account_id}:{day:%Y-%m-%d}"
+
+
+def posting_spec(account_id, delta, balance_after, when):
+    """(filter, update pipeline) folding one posted transaction (`delta` is signed Money) into its day's rollup.
+
+    Postings may arrive slightly out of order; the opening balance always comes
+    from the earliest posting of the day and the closing one from the latest.
+    """
+    account_id = str(account_id)
+    day = day_start(when)
+    before = balance_after.minor - delta.minor
+    first = {"$or": [{"$eq": [{"$type": "$firstAt"}, "missing"]}, {"$lt": [when, "$firstAt"]}]}
+    last = {"$or": [{"$eq": [{"$type": "$lastAt"}, "missing"]}, {"$gte": [when, "$lastAt"]}]}
+    credit, debit = max(delta.minor, 0), max(-delta.minor, 0)
+    return (
+        {"_id": rollup_id(account_id, day)},
+        [{"$set": {
+            "accountId": account_id,
+            "day": day,
+            "currency": delta.currency,
+            "opening": {"$cond": [first, before, "$opening"]},
+            "closing": {"$cond": [last, balance_after.minor, "$closing"]},
+            "firstAt": {"$min": ["$firstAt", when]},
+            "lastAt": {"$max": ["$lastAt", when]},
+            "credits": {"$add": [{"$ifNull": ["$credits", 0]}, credit]},
+            "debits": {"$add": [{"$ifNull": ["$debits", 0]}, debit]},
+            "creditCount": {"$add": [{"$ifNull": ["$creditCount", 0]}, int(credit > 0)]},
+            "debitCount": {"$add": [{"$ifNull": ["$debitCount", 0]}, int(debit > 0)]},
+        }}],
+    )
+
+
+def record_posting(db, account_id, delta, balance_after, when, session=None):
+    """Fold one posted transaction into its day's rollup."""
+    query, update = posting_spec(account_id, delta, balance_after, when)
+    db.account_daily.update_one(query, update, upsert=True, session=session)
+
+
+def posting_update(account_id, delta, balance_after, when):
+    """record_posting() as an UpdateOne, for batch jobs that bulk_write many postings."""
+    query, update = posting_spec(account_id, delta, balance_after, when)
+    return UpdateOne(query, update, upsert=True)
+
+
+def transaction_update(document):
+    """posting_update() for a stored transaction document, or None if it cannot move a rollup.
+
+    Like rebuild(), only credit/debit types that carry a balanceAfterTransaction count.
+    """
+    kind = document.get("transactionType")
+    if kind not in CREDIT_TYPES + DEBIT_TYPES or document.get("balanceAfterTransaction") is None:
+        return None
+    currency = document.get("currency", DEFAULT_CURRENCY)
+    amount = Money(document["amount"], currency)
+    return posting_update(document["accountId"], amount if kind in CREDIT_TYPES else -amount,
+                          Money(document["balanceAfterTransaction"], currency), document["date"])
+
+
+def balance_as_of(db, account_id, when):
+    """The account balance right after the last transaction at or before `when`, or None if unknown."""
+    account_id = str(account_id)
+    day = day_start(when)
+    # Residual tail: the latest posting earlier the same day already carries the balance.
+    last = db.transactions.find_one(
+        {"accountId": account_id, "date": {"$gte": day, "$lte": when}, "balanceAfterTransaction": {"$exists": True}},
+        {"balanceAfterTransaction": 1, "currency": 1},
+        sort=[("date", -1), ("_id", -1)],
+    )
+    if last is not None:
+        return Money(last["balanceAfterTransaction"], last.get("currency", DEFAULT_CURRENCY))
+    rollup = db.account_daily.find_one({"accountId": account_id, "day": {"$lte": day}}, sort=[("day", -1)])
+    if rollup is None:
+        return None
+    return Money(rollup["opening"] if rollup["day"] == day else rollup["closing"], rollup["currency"])
+
+
+def _signed_amount():
+    return {"$cond": [{"$in": ["$transactionType", list(CREDIT_TYPES)]}, "$amount", {"$multiply": ["$amount", -1]}]}
+
+
+def _residual_totals(db, account_id, ranges):
+    """Credit/debit sums over raw transactions in the given [start, end) ranges."""
+    ranges = [(start, end) for start, end in ranges if start < end]
+    if not ranges:
+        return []
+    return list(db.transactions.aggregate([
+        {"$match": {
+            "accountId": account_id,
+            "transactionType": {"$in": list(CREDIT_TYPES + DEBIT_TYPES)},
+            "$or": [{"date": {"$gte": start, "$lt": end}} for start, end in ranges],
+        }},
+        {"$group": {
+            "_id": None,
+            "credits": {"$sum": {"$cond": [{"$in": ["$transactionType", list(CREDIT_TYPES)]}, "$amount", 0]}},
+            "debits": {"$sum": {"$cond": [{"$in": ["$transactionType", list(DEBIT_TYPES)]}, "$amount", 0]}},
+            "creditCount": {"$sum": {"$cond": [{"$in": ["$transactionType", list(CREDIT_TYPES)]}, 1, 0]}},
+            "debitCount": {"$sum": {"$cond": [{"$in": ["$transactionType", list(DEBIT_TYPES)]}, 1, 0]}},
+            "currency": {"$first": "$currency"},
+        }},
+    ]))
+
+
+def totals_between(db, account_id, start, end):
+    """Credit and debit totals and counts for transactions in [start, end).
+
+    Whole days come from the rollups; the partial days at either edge come
+    from the transactions themselves.
+    """
+    account_id = str(account_id)
+    first_full = day_start(start) if start == day_start(start) else day_start(start) + ONE_DAY
+    last_full = day_start(end)
+    if first_full >= last_full:
+        parts = _residual_totals(db, account_id, [(start, end)])
+    else:
+        parts = list(db.account_daily.aggregate([
+            {"$match": {"accountId": account_id, "day": {"$gte": first_full, "$lt": last_full}}},
+            {"$group": {
+                "_id": None,
+                "credits": {"$sum": "$credits"},
+                "debits": {"$sum": "$debits"},
+                "creditCount": {"$sum": "$creditCount"},
+                "debitCount": {"$sum": "$debitCount"},
+                "currency": {"$first": "$currency"},
+            }},
+        ]))
+        parts += _residual_totals(db, account_id, [(start, first_full), (last_full, end)])
+
+    currency = next((part["currency"] for part in parts if part.get("currency")), DEFAULT_CURRENCY)
+    credits = Money(sum(part["credits"] for part in parts), currency)
+    debits = Money(sum(part["debits"] for part in parts), currency)
+    return {
+        "credits": credits,
+        "debits": debits,
+        "net": credits - debits,
+        "creditCount": sum(part["creditCount"] for part in parts),
+        "debitCount": sum(part["debitCount"] for part in parts),
+        "currency": currency,
+    }
+
+
+def statement(db, account_id, start, end):
+    """Opening and closing balance plus totals for [start, end), as a JSON-ready dict."""
+    totals = totals_between(db, account_id, start, end)
+    opening = balance_as_of(db, account_id, start - timedelta(microseconds=1))
+    closing = balance_as_of(db, account_id, end - timedelta(microseconds=1))
+    return {
+        "accountId": str(account_id),
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "openingBalance": opening.to_json() if opening is not None else None,
+        "closingBalance": closing.to_json() if closing is not None else None,
+        "credits": totals["credits"].to_json(),
+        "debits": totals["debits"].to_json(),
+        "net": totals["net"].to_json(),
+        "creditCount": totals["creditCount"],
+        "debitCount": totals["debitCount"],
+        "currency": totals["currency"],
+    }
+
+
+def rebuild(db, account_id=None):
+    """Recompute rollups from the transactions collection (all accounts, or one).
+
+    Used to backfill history posted before rollups existed, or imported in bulk.
+    Only transactions that carry a balanceAfterTransaction contribute.
+    """
+    match = {"transactionType": {"$in": list(CREDIT_TYPES + DEBIT_TYPES)},
+             "balanceAfterTransaction": {"$exists": True}}
+    if account_id is not None:
+        match["accountId"] = str(account_id)
+    db.transactions.aggregate([
+        {"$match": match},
+        {"$sort": {"accountId": 1, "date": 1, "_id": 1}},
+        {"$set": {"signed": _signed_amount(),
+                  "day": {"$dateTrunc": {"date": "$date", "unit": "day"}}}},
+        {"$group": {
+            "_id": {"accountId": "$accountId", "day": "$day"},
+            "currency": {"$first": {"$ifNull": ["$currency", DEFAULT_CURRENCY]}},
+            "opening": {"$first": {"$subtract": ["$balanceAfterTransaction", "$signed"]}},
+            "closing": {"$last": "$balanceAfterTransaction"},
+            "firstAt": {"$first": "$date"},
+            "lastAt": {"$last": "$date"},
+            "credits": {"$sum": {"$max": ["$signed", 0]}},
+            "debits": {"$sum": {"$max": [{"$multiply": ["$signed", -1]}, 0]}},
+            "creditCount": {"$sum": {"$cond": [{"$gt": ["$signed", 0]}, 1, 0]}},
+            "debitCount": {"$sum": {"$cond": [{"$lt": ["$signed", 0]}, 1, 0]}},
+        }},
+        {"$project": {
+            "_id": {"$concat": ["$_id.accountId", ":", {"$dateToString": {"date": "$_id.day", "format": "%Y-%m-%d"}}]},
+            "accountId": "$_id.accountId",
+            "day": "$_id.day",
+            "currency": 1, "opening": 1, "closing": 1, "firstAt": 1, "lastAt": 1,
+            "credits": 1, "debits": 1, "creditCount": 1, "debitCount": 1,
+        }},
+        {"$merge": {"into": "account_daily", "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ])
@@ -0,0 +1,179 @@
+import argparse
+import hashlib
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import jwt
+
+from lru import LRUCache
+
+# Access tokens, shared by the Flask apps (through auth_middleware.py) and the
+# async app. The layout follows flask_jwt_extended (HS256, type/fresh/jti
+# claims, 15 minute default expiry). Tokens are also compact: `sub` is the
+# customer id, `acc` lists their account ids and `scp` their scopes. Hot routes
+# authorize from the token alone, with no DB round trip.
+#
+# Signing keys live in a KeyRing and are named by the `kid` header. The newest
+# key signs. Older keys only verify, so tokens they signed stay valid until
+# they expire. Tokens without a `kid` (issued before key ids) verify against
+# the DEFAULT_KID key, which is JWT_SECRET_KEY.
+#
+# TokenVerifier caches verified claims by a digest of the whole token until the
+# token expires, so a repeat request skips the HMAC and claim checks. Rotating in
+# a new key leaves the cache alone, so there is no cold cache storm. Only
+# retiring a key drops the tokens it signed.
+
+ACCESS_EXPIRES = timedelta(minutes=15)
+ALGORITHM = "HS256"
+DEFAULT_KID = "default"
+
+SCOPE_READ = "transactions:read"
+SCOPE_WRITE = "transactions:write"
+CUSTOMER_SCOPES = [SCOPE_READ, SCOPE_WRITE]
+# Operator scopes; login never grants them. Tokens carrying them are issued
+# from the command line (see __main__ below).
+SCOPE_INGEST = "transactions:ingest"
+SCOPE_ADMIN = "admin"
+OPERATOR_SCOPES = [SCOPE_INGEST, SCOPE_ADMIN]
+
+
+class TokenError(ValueError):
+    pass
+
+
+class KeyRing:
+    def __init__(self, keys, current=None):
+        """`keys` maps kid -> secret; `current` (default: the last one) signs new tokens."""
+        if not keys:
+            raise ValueError("KeyRing needs at least one key")
+        self._keys = dict(keys)
+        self.current = current or list(self._keys)[-1]
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """JWT_SIGNING_KEYS="kid1:secret1,kid2:secret2" (the last one signs) plus JWT_SECRET_KEY as DEFAULT_KID."""
+        keys = {}
+        if os.getenv("JWT_SECRET_KEY"):
+            keys[DEFAULT_KID] = os.getenv("JWT_SECRET_KEY")
+        for entry in filter(None, os.getenv("JWT_SIGNING_KEYS", "").split(",")):
+            kid, _, secret = entry.strip().partition(":")
+            keys[kid] = secret
+        return cls(keys, os.getenv("JWT_CURRENT_KID") or None)
+
+    @classmethod
+    def coerce(cls, keys):
+        return keys if isinstance(keys, cls) else cls({DEFAULT_KID: keys})
+
+    def signing_key(self):
+        with self._lock:
+            return self.current, self._keys[self.current]
+
+    def verification_key(self, kid):
+        return self._keys.get(kid or DEFAULT_KID)
+
+    def rotate(self, kid, secret):
+        """Sign with a new key from now on; earlier keys keep verifying."""
+        with self._lock:
+            self._keys[kid] = secret
+            self.current = kid
+
+    def retire(self, kid):
+        """Stop accepting tokens signed with `kid`, e.g. once they have all expired."""
+        with self._lock:
+            if kid == self.current:
+                raise ValueError("Cannot retire the signing key; rotate first")
+            self._keys.pop(kid, None)
+
+
+def compact_claims(account_ids, scopes=CUSTOMER_SCOPES, email=None):
+    """Claims that let hot routes authorize without a DB lookup."""
+    claims = {"acc": [str(account_id) for account_id in account_ids], "scp": list(scopes)}
+    if email:
+        claims["email"] = email
+    return claims
+
+
+def create_access_token(identity, keys, expires=ACCESS_EXPIRES, fresh=False, claims=None):
+    """A signed access token for `identity`; `keys` is a KeyRing or a plain secret."""
+    kid, secret = KeyRing.coerce(keys).signing_key()
+    now = datetime.now(timezone.utc)
+    payload = {
+        "fresh": fresh,
+        "iat": now,
+        "jti": str(uuid.uuid4()),
+        "type": "access",
+        "sub": identity,
+        "nbf": now,
+        "exp": now + expires,
+        **(claims or {}),
+    }
+    return jwt.encode(payload, secret, algorithm=ALGORITHM, headers=None if kid == DEFAULT_KID else {"kid": kid})
+
+
+def decode_access_token(token, keys):
+    """Verified claims of an access token; raises TokenError."""
+    ring = KeyRing.coerce(keys)
+    try:
+        kid = jwt.get_unverified_header(token).get("kid")
+    except jwt.PyJWTError as e:
+        raise TokenError(str(e))
+    secret = ring.verification_key(kid)
+    if secret is None:
+        raise TokenError("Unknown signing key")
+    try:
+        # Identities may be dicts in older tokens, which newer PyJWT versions reject in `sub` unless told otherwise
+        claims = jwt.decode(token, secret, algorithms=[ALGORITHM], options={"verify_sub": False})
+    except jwt.PyJWTError as e:
+        raise TokenError(str(e))
+    if claims.get("type") != "access":
+        raise TokenError("Only access tokens are allowed")
+    return claims
+
+
+class TokenVerifier:
+    def __init__(self, keys, cache_size=50000):
+        self.keys = KeyRing.coerce(keys)
+        self.cache = LRUCache(maxsize=cache_size)
+
+    def verify(self, token):
+        """decode_access_token(), answered from the cache while the token is unexpired. Raises TokenError."""
+        # The digest covers header, payload and signature. Keying on the
+        # signature alone would let a forged payload ride on a cached signature.
+        digest = hashlib.sha256(token.encode()).digest()
+        cached = self.cache.get(digest)
+        if cached is not None:
+            kid, claims = cached
+            if self.keys.verification_key(kid) is not None:
+                return claims
+            self.cache.pop(digest)
+            raise TokenError("Unknown signing key")
+
+        claims = decode_access_token(token, self.keys)
+        ttl = claims["exp"] - time.time() if "exp" in claims else None
+        if ttl is None or ttl > 0:
+            self.cache.set(digest, (jwt.get_unverified_header(token).get("kid"), claims), ttl=ttl)
+        return claims
+
+    def stats(self):
+        return {"signingKey": self.keys.current, "cache": self.cache.stats()}
+
+
+def bearer_token(authorization):
+    """The token from an `Authorization: Bearer <token>` header value, or None."""
+    scheme, _, token = (authorization or "").partition(" ")
+    return token.strip() or None if scheme.lower() == "bearer" else None
+
+
+if __name__ == "__main__":
+    # python tokens.py ops-batch --scope transactions:ingest: an operator token signed with the current key
+    parser = argparse.ArgumentParser(description="Issue an operator access token")
+    parser.add_argument("subject")
+    parser.add_argument("--scope", action="append", choices=OPERATOR_SCOPES, required=True)
+    parser.add_argument("--minutes", type=int, default=60)
+    args = parser.parse_args()
+    print(create_access_token(args.subject, KeyRing.from_env(), expires=timedelta(minutes=args.minutes),
+                              claims=compact_claims([], scopes=args.scope)))
@@ -0,0 +1,162 @@
+import threading
+
+from bson.objectid import ObjectId
+from pymongo.errors import DuplicateKeyError
+from pymongo.read_concern import ReadConcern
+from pymongo.write_concern import WriteConcern
+
+import balances
+import connection
+import rollups
+from account_cache import account_cache
+from money import Money
+
+db = connection.database
+
+# Funds transfers: both balance legs, both transaction records and the
+# idempotency marker (and both daily rollups) are written in one multi-document transaction. The
+# driver's with_transaction() retries TransientTransactionError and
+# UnknownTransactionCommitResult. Balance legs are always applied in
+# ascending account-id order. Inside a worker, transfers that touch the same
+# account also queue on per-account lock stripes (taken in the same order),
+# so a hot account sees serialized writers instead of a storm of
+# write-conflict retries. Cached copies of both accounts are dropped after commit.
+
+LOCK_STRIPES = 256
+_stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+
+class TransferError(ValueError):
+    pass
+
+
+class _StripeGuard:
+    def __init__(self, *keys):
+        self.locks = [_stripes[index] for index in sorted({hash(key) % LOCK_STRIPES for key in keys})]
+
+    def __enter__(self):
+        for lock in self.locks:
+            lock.acquire()
+
+    def __exit__(self, *exc):
+        for lock in reversed(self.locks):
+            lock.release()
+
+
+def transfer_result(transfer, duplicate):
+    return {
+        "status": "success",
+        "transferId": transfer["_id"],
+        "fromAccount": transfer["fromAccount"],
+        "toAccount": transfer["toAccount"],
+        "amount": Money(transfer["amount"], transfer["currency"]).to_json(),
+        "fromBalance": Money(transfer["fromBalance"], transfer["currency"]).to_json(),
+        "currency": transfer["currency"],
+        "duplicate": duplicate,
+    }
+
+
+def validate(from_account, to_account, amount, idempotency_key=None, user_id=None):
+    """Normalized (from_account, to_account, transfer_id); raises TransferError.
+
+    The transfer id is the idempotency key scoped to the caller, so two
+    clients that happen to send the same key never collide.
+    """
+    from_account, to_account = str(from_account), str(to_account)
+    if from_account == to_account:
+        raise TransferError("Cannot transfer to the same account")
+    if amount.minor <= 0:
+        raise TransferError("Amount must be positive")
+    if not idempotency_key:
+        return from_account, to_account, str(ObjectId())
+    return from_account, to_account, f"{user_id}:{idempotency_key}" if user_id else str(idempotency_key)
+
+
+def transfer_documents(transfer_id, from_account, to_account, amount, posted, description, user_id, now):
+    """The transfer marker and its two transaction records, given both post-images (`posted` by account id)."""
+    from_balance = Money.from_document(posted[from_account])
+    to_balance = Money.from_document(posted[to_account])
+    record = {
+        "_id": transfer_id,
+        "fromAccount": from_account,
+        "toAccount": to_account,
+        "amount": amount.minor,
+        "currency": amount.currency,
+        "fromBalance": from_balance.minor,
+        "toBalance": to_balance.minor,
+        "description": description,
+        "userId": user_id,
+        "createdAt": now,
+    }
+    legs = [(from_account, "transfer_out", from_balance), (to_account, "transfer_in", to_balance)]
+    transactions = [
+        {"accountId": account_id, "customerId": posted[account_id].get("customerId"),
+         "transactionType": kind, "amount": amount.minor,
+         "balanceAfterTransaction": balance.minor, "currency": amount.currency,
+         "fromAccount": from_account, "toAccount": to_account, "transferId": transfer_id,
+         "description": description, "date": now}
+        for account_id, kind, balance in legs
+    ]
+    return record, transactions
+
+
+def rollup_postings(record):
+    """(filter, update) pairs folding both legs of a transfer marker into the daily rollups."""
+    amount = Money(record["amount"], record["currency"])
+    return [
+        rollups.posting_spec(record["fromAccount"], -amount, Money(record["fromBalance"], record["currency"]),
+                             record["createdAt"]),
+        rollups.posting_spec(record["toAccount"], amount, Money(record["toBalance"], record["currency"]),
+                             record["createdAt"]),
+    ]
+
+
+def transfer(from_account, to_account, amount, user_id=None, idempotency_key=None, description=""):
+    """Move `amount` (Money) between two accounts exactly once per idempotency key.
+
+    Replaying a key that has already committed returns the original result,
+    with duplicate=True, and moves no money. Raises TransferError,
+    balances.AccountNotFound or balances.InsufficientFunds.
+    """
+    from_account, to_account, transfer_id = validate(from_account, to_account, amount, idempotency_key, user_id)
+
+    existing = db.transfers.find_one({"_id": transfer_id})
+    if existing is not None:
+        return check_replay(existing, from_account, to_account, amount)
+
+    def post(session):
+        now = rollups.utc_now()
+        posted = {}
+        # Fixed order across all transfers: lowest account id first
+        for account_id, delta in sorted([(from_account, -amount), (to_account, amount)]):
+            posted[account_id] = balances.apply_delta(account_id, delta, session=session)
+        record, transactions = transfer_documents(transfer_id, from_account, to_account, amount, posted,
+                                                  description, user_id, now)
+        # The marker's unique _id is what makes a concurrent replay of the key fail.
+        db.transfers.insert_one(record, session=session)
+        db.transactions.insert_many(transactions, session=session)
+        for query, update in rollup_postings(record):
+            db.account_daily.update_one(query, update, upsert=True, session=session)
+        return record
+
+    with _StripeGuard(from_account, to_account):
+        try:
+            with connection.get_client().start_session() as session:
+                record = session.with_transaction(
+                    post,
+                    read_concern=ReadConcern("snapshot"),
+                    write_concern=WriteConcern("majority"),
+                )
+        except DuplicateKeyError:
+            # Another request with the same key committed first.
+            return check_replay(db.transfers.find_one({"_id": transfer_id}), from_account, to_account, amount)
+    for account_id in (from_account, to_account):
+        account_cache.invalidate(account_id=account_id)
+    return transfer_result(record, duplicate=False)
+
+
+def check_replay(existing, from_account, to_account, amount):
+    if (existing["fromAccount"], existing["toAccount"], existing["amount"], existing["currency"]) != \
+            (from_account, to_account, amount.minor, amount.currency):
+        raise TransferError("Idempotency key was already used for a different transfer")
+    return transfer_result(existing, duplicate=True)
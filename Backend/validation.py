@@ -0,0 +1,174 @@
+from datetime import datetime, timezone
+
+from bson.objectid import ObjectId
+
+from money import DEFAULT_CURRENCY, Money
+
+# Request validation and document construction shared by the Flask app
+# (app.py) and the async app (asgi.py). Everything here is pure: it takes
+# the parsed JSON body (or query args) and returns clean values, or raises
+# ValidationError with the message and status the routes send back.
+
+# Fields a client may ask for with ?fields=... on the history route
+HISTORY_FIELDS = {'accountId', 'fromAccount', 'toAccount', 'transactionType', 'amount',
+                  'balanceAfterTransaction', 'currency', 'date', 'description', 'reference'}
+
+
+class ValidationError(ValueError):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def json_body(data):
+    if not isinstance(data, dict):
+        raise ValidationError("Request body must be a JSON object")
+    return data
+
+
+def money(value, currency, label="amount"):
+    try:
+        return Money.of(value, currency)
+    except (TypeError, ValueError) as e:
+        raise ValidationError(f"Invalid {label}: {e}")
+
+
+def registration(data):
+    """(email, password, name) for /register."""
+    data = json_body(data)
+    missing_fields = [field for field in ('email', 'password', 'name') if field not in data]
+    if missing_fields:
+        raise ValidationError(f"Missing fields: {', '.join(missing_fields)}")
+    return data['email'], data['password'], data['name']
+
+
+def customer_document(email, name, password_hash):
+    now = datetime.now(timezone.utc)
+    return {
+        "_id": str(ObjectId()),
+        "name": name,
+        "email": email,
+        "password": password_hash,
+        "createdAt": now,
+        "updatedAt": now,
+    }
+
+
+def credentials(data):
+    """(email, password) for /auth/login."""
+    data = json_body(data)
+    if 'email' not in data or 'password' not in data:
+        raise ValidationError("Missing email or password")
+    return data['email'], data['password']
+
+
+def password_change(data):
+    """(current_password, new_password) for /auth/change-password."""
+    data = json_body(data)
+    current, new = data.get('currentPassword'), data.get('newPassword')
+    if not current or not new:
+        raise ValidationError("Missing currentPassword or newPassword")
+    if current == new:
+        raise ValidationError("New password must differ from the current one")
+    return current, new
+
+
+def new_account(data):
+    """(customer_id, account_type, balance, user_id) for /accounts/create; balance is Money."""
+    data = json_body(data)
+    customer_id = data.get('customerId')
+    user_id = data.get('userId')
+    if not customer_id or not user_id:
+        raise ValidationError("Customer ID and User ID are required")
+    balance = money(data.get('balance', 0), data.get('currency', DEFAULT_CURRENCY), "balance")
+    return customer_id, data.get('accountType', 'Savings'), balance, user_id
+
+
+def customer_id(data):
+    """The customerId that /accounts/update and /accounts/delete act on."""
+    customer = json_body(data).get('customerId')
+    if not customer:
+        raise ValidationError("Missing customer ID")
+    return customer
+
+
+def transfer_request(data, claims, idempotency_key=None):
+    """Clean /api/transactions/transfer arguments for the token's `claims`.
+
+    The token must list fromAccount, and the caller is the token's subject,
+    never a userId from the body. The header key wins over idempotencyKey in the body.
+    """
+    data = json_body(data)
+    from_account, to_account = data.get('fromAccount'), data.get('toAccount')
+    try:
+        amount = Money.of(data.get('amount'), data.get('currency', DEFAULT_CURRENCY))
+    except (TypeError, ValueError):
+        raise ValidationError("Invalid transaction details")
+    if not from_account or not to_account or amount.minor <= 0:
+        raise ValidationError("Invalid transaction details")
+    claims_account(claims, str(from_account))
+    return {
+        "from_account": from_account,
+        "to_account": to_account,
+        "amount": amount,
+        "user_id": claims['sub'],
+        "idempotency_key": idempotency_key or data.get('idempotencyKey'),
+        "description": data.get('description', ''),
+    }
+
+
+def claims_account(claims, requested=None):
+    """The account a token may read: `requested` if the token lists it, else the token's only account."""
+    accounts = claims.get('acc') or []
+    if requested:
+        if requested not in accounts:
+            raise ValidationError("Token does not grant access to this account", status=403)
+        return requested
+    if not accounts:
+        raise ValidationError("Account ID not found in token", status=422)
+    if len(accounts) > 1:
+        raise ValidationError("Token grants several accounts; pass ?account=", status=422)
+    return accounts[0]
+
+
+def history_filter(account):
+    # Only the account's own records: each transfer leg is stored under its own accountId,
+    # so matching fromAccount/toAccount would return the counterparty's leg (and balance) too.
+    return {'accountId': account}
+
+
+def history_fields(args):
+    fields = [f for f in args.get('fields', '').split(',') if f]
+    unknown_fields = set(fields) - HISTORY_FIELDS
+    if unknown_fields:
+        raise ValidationError(f"Unknown fields: {', '.join(sorted(unknown_fields))}")
+    return fields
+
+
+def page_limit(args, default):
+    try:
+        return int(args.get('limit', default))
+    except ValueError as e:
+        raise ValidationError(str(e))
+
+
+def naive_utc(value):
+    """An ISO date or datetime as a naive UTC datetime, the form stored dates are compared in."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValidationError(f"Invalid date: {value!r}")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def statement_range(args):
+    """(start, end) from ?from=...&to=... (`to` exclusive, default now), both naive UTC."""
+    if 'from' not in args:
+        raise ValidationError("`from` (and optional `to`) must be ISO dates")
+    start = naive_utc(args['from'])
+    end = naive_utc(args['to']) if 'to' in args else datetime.now(timezone.utc).replace(tzinfo=None)
+    if start >= end:
+        raise ValidationError("`from` must be before `to`")
+    return start, end
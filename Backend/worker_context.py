@@ -0,0 +1,63 @@
+import multiprocessing
+import os
+import sys
+import threading
+from multiprocessing import spawn
+
+# Start method for the helper processes (the bcrypt pool in auth_service.py,
+# the model workers in inference.py).
+#
+# They are not forked from a web worker, which holds Mongo sockets and
+# background threads. Plain spawn is no good either: every spawned child
+# re-imports the parent's __main__, and under `python app.py` that is the
+# whole app (database handle, create_indexes(), blueprints).
+#
+# Instead they come from a fork server whose only preload is this module.
+# Forkserver children would still re-import the main script. They skip it when
+# the fork server's own __main__ already claims that file, so on import in the
+# fork server this module records the parent's main path there (passed in the
+# environment). Children then import only what their task needs, e.g.
+# auth_service for a bcrypt call. Helper tasks must therefore live in
+# importable modules, never in the main script.
+#
+# Platforms without forkserver (Windows) fall back to spawn.
+
+PRELOAD = ["worker_context"]
+_MAIN_PATH_ENV = "WORKER_CONTEXT_PARENT_MAIN"
+
+_context = None
+_context_lock = threading.Lock()
+
+
+def get_context():
+    """The shared multiprocessing context for helper processes."""
+    global _context
+    with _context_lock:
+        if _context is None:
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                main_path = spawn.get_preparation_data("worker").get("init_main_from_path")
+                if main_path:
+                    os.environ[_MAIN_PATH_ENV] = main_path
+                # Older Pythons ignore the parent's sys.path in the fork server; it
+                # must still find this module to preload it.
+                here = os.path.dirname(os.path.abspath(__file__))
+                paths = os.environ.get("PYTHONPATH", "").split(os.pathsep)
+                if here not in paths:
+                    os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [here] + paths))
+                _context = multiprocessing.get_context("forkserver")
+                _context.set_forkserver_preload(PRELOAD)
+            else:
+                _context = multiprocessing.get_context("spawn")
+        return _context
+
+
+def _claim_parent_main():
+    # Runs on import everywhere, but only acts in the fork server, whose
+    # __main__ is a `-c` command with no file of its own.
+    main_path = os.environ.get(_MAIN_PATH_ENV)
+    main = sys.modules.get("__main__")
+    if main_path and main is not None and getattr(main, "__file__", None) is None:
+        main.__file__ = main_path
+
+
+_claim_parent_main()
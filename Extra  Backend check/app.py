@@ -2,6 +2,8 @@ import sys
 import os
 from flask import Flask, jsonify
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+# Shared, database-agnostic helpers (idempotency, caching) live in the main Backend
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Backend'))
 
 from auth import auth_bp  # Authentication blueprint
 from transactions.views import transactions_bp  # Transactions blueprint
@@ -1,17 +1,17 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, JWTManager
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import timedelta
 from bson.objectid import ObjectId
 from pymongo.errors import DuplicateKeyError
 from datetime import datetime
 
+import auth_middleware
+import tokens
+from auth_middleware import require_token
 
-# Initialize auth blueprint and JWTManager
-auth_bp = Blueprint('auth', __name__)
 
-# Set a secure secret key for JWT
-JWTManager.secret_key = "YourSuperSecureSecretKey"
+# Initialize auth blueprint; tokens are signed with JWT_SECRET_KEY / JWT_SIGNING_KEYS (see Backend/tokens.py)
+auth_bp = Blueprint('auth', __name__)
 
 # MongoDB Connection (use centralized logic)
 from db import db
@@ -59,16 +59,17 @@ def login_user():
     if not customer or not check_password_hash(customer['password'], data['password']):
         return jsonify({"message": "Invalid credentials"}), 401
 
-    # Generate token
-    access_token = create_access_token(
-        identity={"id": str(customer['_id']), "email": customer['email']},
-        expires_delta=timedelta(hours=1)
+    # Generate token with compact claims, so transaction routes authorize without a lookup
+    account_ids = [a['_id'] for a in db.accounts.find({"customerId": customer['_id']}, {"_id": 1})]
+    access_token = tokens.create_access_token(
+        str(customer['_id']), auth_middleware.get_verifier().keys, expires=timedelta(hours=1),
+        claims=tokens.compact_claims(account_ids, email=customer['email'])
     )
     return jsonify({"access_token": access_token}), 200
 
 # Example protected route
 @auth_bp.route('/profile', methods=['GET'])
-@jwt_required()
+@require_token()
 def profile():
     return jsonify({"message": "Protected route accessed successfully"})
 
@@ -1,15 +1,16 @@
-from pymongo import MongoClient
 from datetime import datetime
 
+from db import get_client, get_database
+
 # Step 1: Connect to MongoDB
 try:
-    client = MongoClient("mongodb://localhost:27017/")
+    get_client().admin.command("ping")
     print("MongoDB connected successfully!")
 except Exception as e:
     print("Error connecting to MongoDB:", e)
 
 # Step 2: Access/Create the database
-db = client['banking_system']  # Create or access 'banking_system' database
+db = get_database()  # Create or access 'banking_system' database
 print(f"Database '{db.name}' connected.")
 
 # Step 3: Optional - Test a collection
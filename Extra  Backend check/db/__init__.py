@@ -1,10 +1,20 @@
-from pymongo import MongoClient
+import os
+import sys
 
+# MongoDB handles for this app (auth, models, audit, setup scripts). They come
+# from the main Backend's connection.py. That module keeps one lazily created
+# MongoClient per process, rebuilt after a fork, with the pool, wait-queue,
+# concern and read-preference settings from the environment and cached
+# Database handles. The setup scripts import this package without going
+# through app.py, so Backend is put on sys.path here as well.
+_BACKEND = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "Backend")
+if _BACKEND not in sys.path:
+    sys.path.append(_BACKEND)
 
+import connection
 
-def get_database():
-    client = MongoClient("mongodb://localhost:27017/")
-    db = client['banking_system']
-    return db
+get_client = connection.get_client
+get_database = connection.get_database
 
-db = get_database()
+# Module-level `db` that only connects when a collection is first used
+db = connection.database
@@ -1,10 +1,10 @@
-from pymongo import MongoClient
 from datetime import datetime
 from bson.objectid import ObjectId
 
-# Connect to MongoDB
-client = MongoClient("mongodb://localhost:27017/")
-db = client['banking_system']
+from db import get_database
+
+# Connect to MongoDB (run from the app directory: python -m db.database_setup)
+db = get_database()
 
 # Customer Collection
 customer = {
@@ -1,6 +1,24 @@
 from datetime import datetime
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
 from . import db  # Import the database connection
 
+
+def adjust_balance(account_id, amount):
+    """Atomically add `amount` (negative to withdraw) to an account balance in one round trip.
+
+    Withdrawals only match while the balance covers them. Returns the updated
+    account, or None when the account is missing or has insufficient funds.
+    """
+    query = {"_id": ObjectId(account_id)}
+    if amount < 0:
+        query["balance"] = {"$gte": -amount}
+    return db.accounts.find_one_and_update(
+        query,
+        {"$inc": {"balance": amount}, "$set": {"updatedAt": datetime.now()}},
+        return_document=ReturnDocument.AFTER,
+    )
+
 # Insert a customer
 def insert_customer(customer_data):
     customer_data['createdAt'] = datetime.now()
@@ -24,6 +42,7 @@ def insert_transaction(transaction_data):
 def create_indexes():
     db.accounts.create_index("customerId")
     db.transactions.create_index("accountId")
+    db.idempotency_keys.create_index("createdAt", expireAfterSeconds=24 * 3600)
 
 
 from . import db
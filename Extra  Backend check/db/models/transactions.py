@@ -1,5 +1,7 @@
 from datetime import datetime
+from itertools import islice
 from bson.objectid import ObjectId
+from pymongo.errors import BulkWriteError
 
 
 def get_transaction_schema(account_id, customer_id, transaction_type, amount, balance_after):
@@ -31,27 +33,68 @@ def insert_transaction(db, transaction):
     :return: Inserted ID.
     """
     result = db['transactions'].insert_one(transaction)
-    print(f"Transaction inserted with ID: {result.inserted_id}")
     return result.inserted_id
 
 
-def get_transactions_by_account(db, account_id):
+def insert_transactions(db, transactions, ordered=False, chunk_size=1000):
     """
-    Retrieves all transactions associated with a specific account.
+    Inserts transaction documents in insert_many chunks without materializing the input.
+    :param db: MongoDB database object.
+    :param transactions: Iterable of transaction documents.
+    :param ordered: Stop at the first failed document instead of skipping it.
+    :param chunk_size: Number of documents per insert_many round trip.
+    :return: Dictionary with the inserted count and per-document errors (0-based input index).
+    """
+    inserted, errors, offset = 0, [], 0
+    transactions = iter(transactions)
+    while True:
+        chunk = list(islice(transactions, chunk_size))
+        if not chunk:
+            break
+        try:
+            inserted += len(db['transactions'].insert_many(chunk, ordered=ordered).inserted_ids)
+        except BulkWriteError as e:
+            inserted += e.details.get("nInserted", 0)
+            errors.extend({"index": offset + error["index"], "error": error.get("errmsg")}
+                          for error in e.details.get("writeErrors", []))
+            if ordered:
+                break
+        offset += len(chunk)
+    return {"inserted": inserted, "errors": errors}
+
+
+def _date_range(start=None, end=None):
+    date = {}
+    if start is not None:
+        date["$gte"] = start
+    if end is not None:
+        date["$lt"] = end
+    return {"date": date} if date else {}
+
+
+def get_transactions_by_account(db, account_id, start=None, end=None, limit=0):
+    """
+    Retrieves transactions associated with a specific account, newest first.
     :param db: MongoDB database object.
     :param account_id: ObjectId of the account.
-    :return: List of transactions.
+    :param start: Optional inclusive lower bound on the transaction date.
+    :param end: Optional exclusive upper bound on the transaction date.
+    :param limit: Maximum number of transactions to return (0 for no limit).
+    :return: Cursor over the matching transactions.
     """
-    transactions = db['transactions'].find({"accountId": account_id})
-    return list(transactions)
+    query = {"accountId": account_id, **_date_range(start, end)}
+    return db['transactions'].find(query).sort("date", -1).limit(limit)
 
 
-def get_transactions_by_customer(db, customer_id):
+def get_transactions_by_customer(db, customer_id, start=None, end=None, limit=0):
     """
-    Retrieves all transactions associated with a specific customer.
+    Retrieves transactions associated with a specific customer, newest first.
     :param db: MongoDB database object.
     :param customer_id: ObjectId of the customer.
-    :return: List of transactions.
+    :param start: Optional inclusive lower bound on the transaction date.
+    :param end: Optional exclusive upper bound on the transaction date.
+    :param limit: Maximum number of transactions to return (0 for no limit).
+    :return: Cursor over the matching transactions.
     """
-    transactions = db['transactions'].find({"customerId": customer_id})
-    return list(transactions)
+    query = {"customerId": customer_id, **_date_range(start, end)}
+    return db['transactions'].find(query).sort("date", -1).limit(limit)
@@ -1,9 +1,11 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
 from bson.objectid import ObjectId
-from db.models import insert_transaction
+from db.models import adjust_balance, insert_transaction
 from db import db
 from db.audit import log_audit
+from auth_middleware import current_claims, require_token
+from idempotency import IdempotencyStore, idempotent
+import tokens
 
 
 
@@ -11,9 +13,13 @@ from db.audit import log_audit
 # Initialize the transactions blueprint
 transactions_bp = Blueprint('transactions', __name__)
 
+# Mobile clients retry on timeouts; the same Idempotency-Key gets the first response back
+idempotency_store = IdempotencyStore(lambda: db.idempotency_keys)
+
 # Deposit funds
 @transactions_bp.route('/deposit', methods=['POST'])
-@jwt_required()
+@require_token(tokens.SCOPE_WRITE)
+@idempotent(idempotency_store)
 def deposit():
     try:
         data = request.get_json()
@@ -25,29 +31,31 @@ def deposit():
         account_id = data['account_id']
         amount = data['amount']
 
+        # The token lists the caller's accounts; no lookup needed to authorize
+        if account_id not in current_claims().get('acc', ()):
+            return jsonify(message="Token does not grant access to this account"), 403
+        user_email = current_claims().get('email')
+
         # Ensure amount is valid
         if not isinstance(amount, (int, float)) or amount <= 0:
             return jsonify(message="Invalid amount: must be a positive number"), 400
 
-        # Find the account
-        account = db.accounts.find_one({"_id": ObjectId(account_id)})
+        # Update the account balance atomically
+        account = adjust_balance(account_id, amount)
         if not account:
             return jsonify(message="Account not found"), 404
-
-        # Update the account balance
-        new_balance = account['balance'] + amount
-        db.accounts.update_one({"_id": ObjectId(account_id)}, {"$set": {"balance": new_balance}})
+        new_balance = account['balance']
 
         # Record the transaction
         insert_transaction({
             'accountId': account_id,
             'amount': amount,
             'transaction_type': 'deposit',
-            'user_email': get_jwt_identity()['email']
+            'user_email': user_email
         })
 
         # Log the audit
-        log_audit("deposit", "accounts", account_id, get_jwt_identity()['email'])
+        log_audit("deposit", "accounts", account_id, user_email)
 
         return jsonify(message="Deposit successful", balance=new_balance), 200
 
@@ -56,7 +64,8 @@ def deposit():
 
 # Withdraw funds
 @transactions_bp.route('/withdraw', methods=['POST'])
-@jwt_required()
+@require_token(tokens.SCOPE_WRITE)
+@idempotent(idempotency_store)
 def withdraw():
     try:
         data = request.get_json()
@@ -68,33 +77,34 @@ def withdraw():
         account_id = data['account_id']
         amount = data['amount']
 
+        # The token lists the caller's accounts; no lookup needed to authorize
+        if account_id not in current_claims().get('acc', ()):
+            return jsonify(message="Token does not grant access to this account"), 403
+        user_email = current_claims().get('email')
+
         # Ensure amount is valid
         if not isinstance(amount, (int, float)) or amount <= 0:
             return jsonify(message="Invalid amount: must be a positive number"), 400
 
-        # Find the account
-        account = db.accounts.find_one({"_id": ObjectId(account_id)})
+        # Update the account balance atomically, only if funds are sufficient
+        account = adjust_balance(account_id, -amount)
         if not account:
-            return jsonify(message="Account not found"), 404
-
-        # Ensure sufficient funds
-        if account['balance'] < amount:
+            # Only the failure path pays for a second read, to pick the right error
+            if not db.accounts.find_one({"_id": ObjectId(account_id)}, {"_id": 1}):
+                return jsonify(message="Account not found"), 404
             return jsonify(message="Insufficient funds"), 400
-
-        # Update the account balance
-        new_balance = account['balance'] - amount
-        db.accounts.update_one({"_id": ObjectId(account_id)}, {"$set": {"balance": new_balance}})
+        new_balance = account['balance']
 
         # Record the transaction
         insert_transaction({
             'accountId': account_id,
             'amount': amount,
             'transaction_type': 'withdraw',
-            'user_email': get_jwt_identity()['email']
+            'user_email': user_email
         })
 
         # Log the audit
-        log_audit("withdraw", "accounts", account_id, get_jwt_identity()['email'])
+        log_audit("withdraw", "accounts", account_id, user_email)
 
         return jsonify(message="Withdrawal successful", balance=new_balance), 200
 
@@ -1,20 +1,482 @@
 # I'll begin by refactoring the code to implement some of these professional enhancements.
 # Here is an outline of the improved code structure:
 
-from typing import List, Optional, Union
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+from array import array
+from collections import Counter, OrderedDict
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
+from enum import IntEnum
 import os
 import hashlib
+import hmac
+import secrets
+import threading
+import time
+
+from Backend.money import DEFAULT_CURRENCY, Money
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+# In-memory ledger store for the prototype; replace with SQL/NoSQL in production
+class Ledger:
+    """Accounts keyed by account number, each with its own append-only transaction log.
+
+    Every read (history, balance, last-N) only touches the log of the account
+    being queried, so its cost does not grow with the size of the whole bank.
+    """
+
+    def __init__(self):
+        self.accounts: Dict[str, "Account"] = {}
+        self.logs: Dict[str, List[dict]] = {}
+
+    def add_account(self, account: "Account") -> None:
+        if account.account_no in self.accounts:
+            raise ValueError(f"Account {account.account_no} already exists")
+        self.accounts[account.account_no] = account
+        self.logs[account.account_no] = []
+
+    def get_account(self, account_no: str) -> Optional["Account"]:
+        return self.accounts.get(account_no)
+
+    def record(self, account_no: str, amount: Money, trxn_type: str, balance: Money,
+               when: Optional[datetime] = None) -> None:
+        when = when or datetime.today()
+        self.logs.setdefault(account_no, []).append({
+            "date": when.strftime(DATE_FORMAT),
+            "account_no": account_no,
+            "amount": amount,
+            "type": trxn_type,
+            "balance": balance
+        })
+
+    def record_many(self, account_nos: Sequence[str], amounts: Sequence[int], trxn_types: Sequence[str],
+                    balances: Sequence[int], currencies: Dict[str, str],
+                    when: Optional[datetime] = None) -> None:
+        """Append postings given as parallel columns (amounts and balances in minor units).
+
+        All of them share one timestamp; `currencies` maps each account number to its currency.
+        """
+        date = (when or datetime.today()).strftime(DATE_FORMAT)
+        logs = self.logs
+        for account_no, amount, trxn_type, balance in zip(account_nos, amounts, trxn_types, balances):
+            currency = currencies[account_no]
+            log = logs.get(account_no)
+            if log is None:
+                log = logs[account_no] = []
+            log.append({
+                "date": date,
+                "account_no": account_no,
+                "amount": Money(amount, currency),
+                "type": trxn_type,
+                "balance": Money(balance, currency)
+            })
+
+    def history(self, account_no: str, limit: Optional[int] = None) -> List[dict]:
+        log = self.logs.get(account_no, [])
+        if limit is None:
+            return list(log)
+        return log[-limit:] if limit > 0 else []
+
+    def balance(self, account_no: str) -> Optional[Money]:
+        account = self.accounts.get(account_no)
+        return account.bal if account else None
+
+    def transaction_count(self, account_no: Optional[str] = None) -> int:
+        if account_no is not None:
+            return len(self.logs.get(account_no, []))
+        return sum(len(log) for log in self.logs.values())
+
+    def __iter__(self) -> Iterator["Account"]:
+        return iter(self.accounts.values())
+
+    def __len__(self) -> int:
+        return len(self.accounts)
+
+
+class Transaction:
+    """Read-only view of one row of a `ColumnarLedger`; nothing is copied until asked for."""
+
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store: "ColumnarLedger", row: int):
+        self._store = store
+        self._row = row
+
+    @property
+    def account_no(self) -> str:
+        return self._store.account_nos[self._store.account_col[self._row]]
+
+    @property
+    def currency(self) -> str:
+        return self._store.currency_names[self._store.currency_col[self._row]]
+
+    @property
+    def amount(self) -> Money:
+        return Money(self._store.amount_col[self._row], self.currency)
+
+    @property
+    def type(self) -> str:
+        return self._store.type_names[self._store.type_col[self._row]]
+
+    @property
+    def balance(self) -> Money:
+        return Money(self._store.balance_col[self._row], self.currency)
+
+    @property
+    def timestamp(self) -> int:
+        return self._store.time_col[self._row]
+
+    @property
+    def date(self) -> str:
+        return datetime.fromtimestamp(self.timestamp).strftime(DATE_FORMAT)
+
+    def as_dict(self) -> dict:
+        return {
+            "date": self.date,
+            "account_no": self.account_no,
+            "amount": self.amount,
+            "type": self.type,
+            "balance": self.balance
+        }
+
+    def __repr__(self):
+        return f"Transaction({self.as_dict()!r})"
+
+
+class ColumnarLedger(Ledger):
+    """Ledger that keeps transactions in typed columns instead of one dict per posting.
+
+    Amounts and balances are int64 minor units, account numbers, transaction
+    types and currencies are interned to small integer codes and dates are
+    epoch seconds. Each
+    account's log holds only the row numbers of its postings. Dicts in the
+    legacy `save_transaction` shape are built lazily by `history`.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.account_nos: List[str] = []
+        self.account_codes: Dict[str, int] = {}
+        self.type_names: List[str] = []
+        self.type_codes: Dict[str, int] = {}
+        self.currency_names: List[str] = []
+        self.currency_codes: Dict[str, int] = {}
+        self.account_col = array('q')
+        self.amount_col = array('q')
+        self.type_col = array('b')
+        self.balance_col = array('q')
+        self.currency_col = array('b')
+        self.time_col = array('q')
+        # Row numbers must line up across columns, so writers append one row at a time.
+        self._write_lock = threading.Lock()
+
+    def add_account(self, account: "Account") -> None:
+        super().add_account(account)
+        self.logs[account.account_no] = array('q')
+        self._account_code(account.account_no)
+
+    def _account_code(self, account_no: str) -> int:
+        code = self.account_codes.get(account_no)
+        if code is None:
+            code = self.account_codes[account_no] = len(self.account_nos)
+            self.account_nos.append(account_no)
+        return code
+
+    def _type_code(self, trxn_type: str) -> int:
+        code = self.type_codes.get(trxn_type)
+        if code is None:
+            code = self.type_codes[trxn_type] = len(self.type_names)
+            self.type_names.append(trxn_type)
+        return code
+
+    def _currency_code(self, currency: str) -> int:
+        code = self.currency_codes.get(currency)
+        if code is None:
+            code = self.currency_codes[currency] = len(self.currency_names)
+            self.currency_names.append(currency)
+        return code
+
+    def record(self, account_no: str, amount: Money, trxn_type: str, balance: Money,
+               when: Optional[datetime] = None) -> None:
+        with self._write_lock:
+            row = len(self.amount_col)
+            self.account_col.append(self._account_code(account_no))
+            self.amount_col.append(amount.minor)
+            self.type_col.append(self._type_code(trxn_type))
+            self.balance_col.append(balance.minor)
+            self.currency_col.append(self._currency_code(balance.currency))
+            self.time_col.append(int(when.timestamp() if when else time.time()))
+            log = self.logs.get(account_no)
+            if log is None:
+                log = self.logs[account_no] = array('q')
+            log.append(row)
+
+    def record_many(self, account_nos: Sequence[str], amounts: Sequence[int], trxn_types: Sequence[str],
+                    balances: Sequence[int], currencies: Dict[str, str],
+                    when: Optional[datetime] = None) -> None:
+        if not account_nos:
+            return
+        timestamp = int(when.timestamp() if when else time.time())
+        with self._write_lock:
+            first_row = len(self.amount_col)
+            touched = set(account_nos)
+            for account_no in touched.difference(self.account_codes):
+                self._account_code(account_no)
+            for trxn_type in set(trxn_types).difference(self.type_codes):
+                self._type_code(trxn_type)
+            account_codes = array('q', map(self.account_codes.__getitem__, account_nos))
+            currency_codes = {self.account_codes[account_no]: self._currency_code(currencies[account_no])
+                              for account_no in touched}
+            self.account_col.extend(account_codes)
+            self.amount_col.extend(array('q', amounts))
+            self.type_col.extend(array('b', map(self.type_codes.__getitem__, trxn_types)))
+            self.balance_col.extend(array('q', balances))
+            if len(set(currency_codes.values())) == 1:
+                # Single-currency batches (the usual case) skip the per-row lookup
+                self.currency_col.extend(array('b', [currency_codes[account_codes[0]]]) * len(account_codes))
+            else:
+                self.currency_col.extend(array('b', map(currency_codes.__getitem__, account_codes)))
+            self.time_col.extend(array('q', [timestamp]) * len(account_nos))
+            logs = self.logs
+            for account_no in touched.difference(logs):
+                logs[account_no] = array('q')
+            appenders = {account_no: logs[account_no].append for account_no in touched}
+            for row, account_no in enumerate(account_nos, first_row):
+                appenders[account_no](row)
+
+    def records(self, account_no: str, limit: Optional[int] = None) -> List[Transaction]:
+        rows = self.logs.get(account_no, ())
+        if limit is not None:
+            rows = rows[-limit:] if limit > 0 else ()
+        return [Transaction(self, row) for row in rows]
+
+    def history(self, account_no: str, limit: Optional[int] = None) -> List[dict]:
+        return [record.as_dict() for record in self.records(account_no, limit)]
+
+
+database = Ledger()
+
+
+class LockStripes:
+    """A fixed pool of locks shared by all accounts, picked by hashing the account number.
+
+    `hold` takes the stripes of every account involved in ascending stripe
+    order, so two transfers over the same pair of accounts in opposite
+    directions can never deadlock.
+    """
+
+    def __init__(self, stripes: int = 64):
+        if stripes < 1:
+            raise ValueError("stripes must be at least 1")
+        self.locks = [threading.Lock() for _ in range(stripes)]
+
+    def stripe(self, account_no: str) -> int:
+        return hash(account_no) % len(self.locks)
+
+    @contextmanager
+    def hold(self, *account_nos: str):
+        indexes = sorted({self.stripe(account_no) for account_no in account_nos})
+        acquired = []
+        try:
+            for index in indexes:
+                self.locks[index].acquire()
+                acquired.append(self.locks[index])
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+
+
+# None means single-threaded posting with no locking overhead
+posting_locks: Optional[LockStripes] = None
+
+
+def enable_concurrent_posting(stripes: int = 64) -> LockStripes:
+    """Make `Bank` posting safe to call from many threads at once."""
+    global posting_locks
+    posting_locks = LockStripes(stripes)
+    return posting_locks
+
+
+def disable_concurrent_posting() -> None:
+    global posting_locks
+    posting_locks = None
+
+
+def _locked(*account_nos: str):
+    return posting_locks.hold(*account_nos) if posting_locks else nullcontext()
+
+
+def use_ledger(ledger) -> None:
+    """Swap the store behind `Bank`, e.g. a fresh `Ledger()` or a `ColumnarLedger()`."""
+    global database
+    database = ledger
+
+class PostStatus(IntEnum):
+    """Per-operation outcome of `Bank.post_batch`."""
+    OK = 0
+    INVALID_AMOUNT = 1
+    INSUFFICIENT_FUNDS = 2
+    UNKNOWN_ACCOUNT = 3
+    SAME_ACCOUNT = 4
+    INVALID_OPERATION = 5
+    CURRENCY_MISMATCH = 6
+
+
+class BatchResult:
+    """Status code per submitted operation (in order) plus counts by status."""
+
+    def __init__(self, statuses: array):
+        self.statuses = statuses
+
+    def __len__(self) -> int:
+        return len(self.statuses)
+
+    def __getitem__(self, index: int) -> PostStatus:
+        return PostStatus(self.statuses[index])
+
+    @property
+    def summary(self) -> dict:
+        counts = Counter(self.statuses)
+        return {
+            "total": len(self.statuses),
+            "applied": counts.get(PostStatus.OK, 0),
+            "rejected": len(self.statuses) - counts.get(PostStatus.OK, 0),
+            "by_status": {PostStatus(code).name: n for code, n in sorted(counts.items())}
+        }
+
+
+class PinHasher:
+    """Salted PBKDF2-HMAC-SHA256 PIN hashing with a tunable work factor.
+
+    Hashes are encoded as `pbkdf2_sha256$<iterations>$<salt hex>$<digest hex>`.
+    Unsalted SHA-256 hex digests from older accounts still verify, and
+    `needs_rehash` reports them (and hashes with a lower work factor) so they
+    can be upgraded on the next successful check.
+    """
+
+    algorithm = "pbkdf2_sha256"
+
+    def __init__(self, iterations: int = 200_000, salt_bytes: int = 16):
+        self.iterations = iterations
+        self.salt_bytes = salt_bytes
+
+    def _derive(self, pin: str, salt: bytes, iterations: int) -> bytes:
+        return hashlib.pbkdf2_hmac("sha256", pin.encode(), salt, iterations)
+
+    def hash(self, pin: str) -> str:
+        salt = os.urandom(self.salt_bytes)
+        digest = self._derive(pin, salt, self.iterations)
+        return f"{self.algorithm}${self.iterations}${salt.hex()}${digest.hex()}"
+
+    def verify(self, pin: str, encoded: str) -> bool:
+        if "$" not in encoded:
+            # Legacy unsalted SHA-256
+            return hmac.compare_digest(encoded, hashlib.sha256(pin.encode()).hexdigest())
+        algorithm, iterations, salt, digest = encoded.split("$")
+        if algorithm != self.algorithm:
+            raise ValueError(f"Unsupported PIN hash algorithm: {algorithm}")
+        return hmac.compare_digest(bytes.fromhex(digest), self._derive(pin, bytes.fromhex(salt), int(iterations)))
+
+    def needs_rehash(self, encoded: str) -> bool:
+        if "$" not in encoded:
+            return True
+        return int(encoded.split("$")[1]) < self.iterations
+
+
+class PinVerifier:
+    """Verifies PINs through a `PinHasher`, with a cache of recent successes and a lockout counter.
+
+    The cache is a bounded LRU whose entries expire after `cache_ttl` seconds.
+    Keys are an HMAC of account number and PIN under a per-process secret, so
+    the cache never holds a PIN or a cheap-to-attack hash of one. An entry
+    only counts while the account's stored hash is unchanged, so changing a
+    PIN invalidates it. After `max_attempts` consecutive failures an account
+    is locked for `lockout_seconds`, and no checks succeed until then.
+    """
+
+    def __init__(self, hasher: Optional[PinHasher] = None, cache_size: int = 10_000, cache_ttl: float = 300.0,
+                 max_attempts: int = 5, lockout_seconds: float = 900.0):
+        self.hasher = hasher or PinHasher()
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.max_attempts = max_attempts
+        self.lockout_seconds = lockout_seconds
+        self._secret = secrets.token_bytes(32)
+        self._cache: "OrderedDict[bytes, Tuple[str, float]]" = OrderedDict()
+        self._failures: Dict[str, int] = {}
+        self._locked_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, account_no: str, pin: str) -> bytes:
+        return hmac.new(self._secret, f"{account_no}\0{pin}".encode(), hashlib.sha256).digest()
+
+    def is_locked(self, account_no: str) -> bool:
+        with self._lock:
+            until = self._locked_until.get(account_no)
+            if until is None:
+                return False
+            if until <= time.monotonic():
+                del self._locked_until[account_no]
+                return False
+            return True
+
+    def verify(self, account: "Account", pin: str) -> bool:
+        account_no = account.account_no
+        if self.is_locked(account_no):
+            return False
+        key = self._key(account_no, pin)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                if cached[0] == account.pin and cached[1] > now:
+                    self._cache.move_to_end(key)
+                    return True
+                del self._cache[key]
+
+        if not self.hasher.verify(pin, account.pin):
+            with self._lock:
+                failures = self._failures[account_no] = self._failures.get(account_no, 0) + 1
+                if failures >= self.max_attempts:
+                    self._locked_until[account_no] = time.monotonic() + self.lockout_seconds
+                    del self._failures[account_no]
+            return False
+
+        if self.hasher.needs_rehash(account.pin):
+            account.pin = self.hasher.hash(pin)
+        with self._lock:
+            self._failures.pop(account_no, None)
+            self._cache[key] = (account.pin, now + self.cache_ttl)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return True
+
+    def forget(self, account_no: str) -> None:
+        """Drop the lockout state of an account, e.g. after an administrative unlock."""
+        with self._lock:
+            self._failures.pop(account_no, None)
+            self._locked_until.pop(account_no, None)
+
+    def clear_cache(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+pin_verifier = PinVerifier()
+
+
+def use_pin_verifier(verifier: PinVerifier) -> None:
+    """Swap the PIN hashing/verification policy, e.g. a lower work factor for simulations."""
+    global pin_verifier
+    pin_verifier = verifier
 
-# Database simulation as a dictionary for prototype; replace with SQL/NoSQL in production
-database = {
-    "accounts": [],
-    "transactions": [] 
-}
 
 # Hashing helper for secure PIN storage
 def hash_pin(pin: str) -> str:
-    return hashlib.sha256(pin.encode()).hexdigest()
+    return pin_verifier.hasher.hash(pin)
 
 # Class Definitions
 class Customer:
@@ -33,19 +495,30 @@ class Customer:
 
 
 class Account:
-    def __init__(self, customer: Customer, account_no: str, account_type: str, bal: float = 0, pin: str = '0000'):
+    def __init__(self, customer: Customer, account_no: str, account_type: str,
+                 bal: Union[Money, int, float, str] = 0, pin: str = '0000', currency: str = DEFAULT_CURRENCY):
         self.customer = customer
         self.__account_no = account_no
         self.account_type = account_type
-        self.bal = bal
+        self.bal = Money.coerce(bal, currency)  # Exact minor units, never a float
         self.pin = hash_pin(pin)  # Store hashed pin
 
     @property
     def account_no(self):
         return self.__account_no
 
+    @property
+    def currency(self) -> str:
+        return self.bal.currency
+
     def verify_pin(self, input_pin: str) -> bool:
-        return self.pin == hash_pin(input_pin)
+        return pin_verifier.verify(self, input_pin)
+
+    def change_pin(self, old_pin: str, new_pin: str) -> bool:
+        if not self.verify_pin(old_pin):
+            return False
+        self.pin = hash_pin(new_pin)  # Cached verifications of the old PIN no longer match
+        return True
 
 
 class Bank:
@@ -54,67 +527,223 @@ class Bank:
         return Customer(cust_id, firstname, lastname, contact_info)
 
     @staticmethod
-    def create_account(customer: Customer, account_no: str, account_type: str, bal: float = 0, pin: str = '0000') -> Account:
-        account = Account(customer, account_no, account_type, bal, pin)
-        database["accounts"].append(account)
+    def create_account(customer: Customer, account_no: str, account_type: str,
+                       bal: Union[Money, int, float, str] = 0, pin: str = '0000',
+                       currency: str = DEFAULT_CURRENCY) -> Account:
+        account = Account(customer, account_no, account_type, bal, pin, currency)
+        database.add_account(account)
         return account
 
     @staticmethod
-    def save_transaction(account: Account, amount: float, trxn_type: str):
-        today = datetime.today()
-        transaction = {
-            "date": today.strftime('%Y-%m-%d %H:%M:%S'),
-            "account_no": account.account_no,
-            "amount": amount,
-            "type": trxn_type,
-            "balance": account.bal
-        }
-        database["transactions"].append(transaction)
+    def save_transaction(account: Account, amount: Money, trxn_type: str):
+        database.record(account.account_no, amount, trxn_type, account.bal)
+
+    @staticmethod
+    def get_account(account_no: str) -> Optional[Account]:
+        return database.get_account(account_no)
 
     @staticmethod
-    def account_balance(account: Account) -> float:
+    def account_balance(account: Account) -> Money:
         return account.bal
 
     @staticmethod
-    def deposit(account: Account, amount: float) -> str:
-        if amount > 0:
-            account.bal += amount
-            Bank.save_transaction(account, amount, 'credit')
+    def _amount(account: Account, amount) -> Optional[Money]:
+        """Amount in the account's currency, or None if it is not a valid positive amount."""
+        try:
+            amount = Money.coerce(amount, account.currency)
+        except (TypeError, ValueError):
+            return None
+        return amount if amount.minor > 0 else None
+
+    @staticmethod
+    def deposit(account: Account, amount: Union[Money, int, float, str]) -> str:
+        amount = Bank._amount(account, amount)
+        if amount:
+            with _locked(account.account_no):
+                account.bal += amount
+                Bank.save_transaction(account, amount, 'credit')
             return "Deposit successful."
         return "Invalid deposit amount."
 
     @staticmethod
-    def withdrawal(account: Account, amount: float) -> str:
-        if amount > 0 and account.bal >= amount:
-            account.bal -= amount
-            Bank.save_transaction(account, -amount, 'debit')
-            return "Withdrawal successful."
+    def withdrawal(account: Account, amount: Union[Money, int, float, str]) -> str:
+        amount = Bank._amount(account, amount)
+        if amount:
+            with _locked(account.account_no):
+                if account.bal >= amount:
+                    account.bal -= amount
+                    Bank.save_transaction(account, -amount, 'debit')
+                    return "Withdrawal successful."
         return "Insufficient funds or invalid amount."
 
     @staticmethod
-    def transfer(from_account: Account, to_account: Account, amount: float) -> str:
-        if from_account.account_no != to_account.account_no and amount > 0 and from_account.bal >= amount:
-            from_account.bal -= amount
-            to_account.bal += amount
-            Bank.save_transaction(from_account, -amount, 'transfer_out')
-            Bank.save_transaction(to_account, amount, 'transfer_in')
-            return "Transfer successful."
+    def transfer(from_account: Account, to_account: Account, amount: Union[Money, int, float, str]) -> str:
+        amount = Bank._amount(from_account, amount)
+        if (amount and from_account.account_no != to_account.account_no
+                and from_account.currency == to_account.currency):
+            with _locked(from_account.account_no, to_account.account_no):
+                if from_account.bal >= amount:
+                    from_account.bal -= amount
+                    to_account.bal += amount
+                    Bank.save_transaction(from_account, -amount, 'transfer_out')
+                    Bank.save_transaction(to_account, amount, 'transfer_in')
+                    return "Transfer successful."
         return "Transfer failed due to insufficient funds or invalid accounts."
 
+    @staticmethod
+    def post_batch(ops: Iterable[Sequence]) -> BatchResult:
+        """Validate and apply a stream of operations in one pass.
+
+        Each op is `("deposit", account, amount)`, `("withdrawal", account, amount)`
+        or `("transfer", from_account, to_account, amount)`, where accounts are
+        `Account` objects or account numbers and amounts are anything `Money.coerce`
+        accepts (plain ints are whole major units). Ops are applied in order against
+        running balances, so a rejected op never affects the ones after it.
+        Balances are written back and transactions recorded once, at the end.
+        With concurrent posting enabled the stripes of every account in the
+        batch are held for its whole duration, so the ops are read up front.
+
+        Each op is still checked in order in Python, because whether it goes
+        through depends on the running balances left by the ops before it. So
+        the gain over the per-call loop is about 3x on `Ledger`, which still
+        builds a dict per posting, and about 5x on `ColumnarLedger` (see
+        benchmarks/bench_batch_posting.py).
+        """
+        if posting_locks is None:
+            return Bank._apply_batch(ops)
+        ops = list(ops)
+        account_nos = {ref.account_no if isinstance(ref, Account) else ref
+                       for op in ops if op and op[0] in ('deposit', 'withdrawal', 'transfer')
+                       for ref in op[1:-1] if isinstance(ref, (Account, str))}
+        with posting_locks.hold(*account_nos):
+            return Bank._apply_batch(ops)
+
+    @staticmethod
+    def _apply_batch(ops: Iterable[Sequence]) -> BatchResult:
+        (OK, INVALID_AMOUNT, INSUFFICIENT_FUNDS, UNKNOWN_ACCOUNT, SAME_ACCOUNT,
+         INVALID_OPERATION, CURRENCY_MISMATCH) = PostStatus
+        lookup = database.get_account
+        accounts: Dict[str, Account] = {}
+        # Account number for every reference (number or Account) already seen in this batch
+        refs: Dict[object, str] = {}
+        # Running balances in minor units plus each account's currency and major-unit factor
+        balances: Dict[str, int] = {}
+        currencies: Dict[str, str] = {}
+        factors: Dict[str, int] = {}
+        # Postings as parallel columns, recorded with one `record_many` call at the end
+        row_accounts: List[str] = []
+        row_amounts: List[int] = []
+        row_types: List[str] = []
+        row_balances: List[int] = []
+        statuses = array('b')
+
+        def resolve(ref):
+            account_no = ref.account_no if isinstance(ref, Account) else ref
+            if account_no not in balances:
+                account = ref if isinstance(ref, Account) else lookup(account_no)
+                if account is None:
+                    return None
+                accounts[account_no] = account
+                balances[account_no] = account.bal.minor
+                currencies[account_no] = account.currency
+                factors[account_no] = 10 ** account.bal.exponent
+            refs[ref] = account_no
+            return account_no
+
+        def minor_units(amount, account_no):
+            try:
+                return Money.coerce(amount, currencies[account_no]).minor
+            except (TypeError, ValueError):
+                return 0
+
+        # The loop runs once per op, so everything it calls is bound to a local first.
+        known, push = refs.get, statuses.append
+        add_account, add_amount = row_accounts.append, row_amounts.append
+        add_type, add_balance = row_types.append, row_balances.append
+        for op in ops:
+            kind = op[0] if op else None
+            if kind == 'deposit' or kind == 'withdrawal':
+                if len(op) != 3:
+                    push(INVALID_OPERATION)
+                    continue
+                ref = op[1]
+                account_no = known(ref) or resolve(ref)
+                if account_no is None:
+                    push(UNKNOWN_ACCOUNT)
+                    continue
+                amount = op[2]
+                amount = amount * factors[account_no] if type(amount) is int else minor_units(amount, account_no)
+                if amount <= 0:
+                    push(INVALID_AMOUNT)
+                    continue
+                if kind == 'deposit':
+                    balance = balances[account_no] = balances[account_no] + amount
+                    add_type('credit')
+                else:
+                    balance = balances[account_no] - amount
+                    if balance < 0:
+                        push(INSUFFICIENT_FUNDS)
+                        continue
+                    balances[account_no] = balance
+                    amount = -amount
+                    add_type('debit')
+                add_account(account_no)
+                add_amount(amount)
+                add_balance(balance)
+                push(OK)
+            elif kind == 'transfer' and len(op) == 4:
+                _, from_ref, to_ref, amount = op
+                from_no = known(from_ref) or resolve(from_ref)
+                to_no = known(to_ref) or resolve(to_ref)
+                if from_no is None or to_no is None:
+                    push(UNKNOWN_ACCOUNT)
+                    continue
+                amount = amount * factors[from_no] if type(amount) is int else minor_units(amount, from_no)
+                if from_no == to_no:
+                    push(SAME_ACCOUNT)
+                elif currencies[from_no] != currencies[to_no]:
+                    push(CURRENCY_MISMATCH)
+                elif amount <= 0:
+                    push(INVALID_AMOUNT)
+                else:
+                    from_balance = balances[from_no] - amount
+                    if from_balance < 0:
+                        push(INSUFFICIENT_FUNDS)
+                        continue
+                    balances[from_no] = from_balance
+                    to_balance = balances[to_no] = balances[to_no] + amount
+                    add_account(from_no)
+                    add_amount(-amount)
+                    add_type('transfer_out')
+                    add_balance(from_balance)
+                    add_account(to_no)
+                    add_amount(amount)
+                    add_type('transfer_in')
+                    add_balance(to_balance)
+                    push(OK)
+            else:
+                push(INVALID_OPERATION)
+
+        for account_no, balance in balances.items():
+            accounts[account_no].bal = Money(balance, currencies[account_no])
+        database.record_many(row_accounts, row_amounts, row_types, row_balances, currencies)
+        return BatchResult(statuses)
+
     @staticmethod
     def view_transaction_history(account_no: str, limit: int = 5) -> List[dict]:
-        return [t for t in database["transactions"] if t["account_no"] == account_no][-limit:]
+        return database.history(account_no, limit)
 
 
 # Sample Usage with Improvements
-customer1 = Bank.register_customer("01", "John", "Doe", "john.doe@example.com")
-account1 = Bank.create_account(customer1, "1001", "savings", 1000.0, "1234")
+if __name__ == "__main__":
+    customer1 = Bank.register_customer("01", "John", "Doe", "john.doe@example.com")
+    account1 = Bank.create_account(customer1, "1001", "savings", 1000.0, "1234")
 
-customer2 = Bank.register_customer("02", "Jane", "Smith", "jane.smith@example.com")
-account2 = Bank.create_account(customer2, "1002", "checking", 500.0, "5678")
+    customer2 = Bank.register_customer("02", "Jane", "Smith", "jane.smith@example.com")
+    account2 = Bank.create_account(customer2, "1002", "checking", 500.0, "5678")
 
-# Perform Transactions
-print(Bank.deposit(account1, 200.0))    # Deposit into account1
-print(Bank.withdrawal(account2, 50.0))  # Withdraw from account2
-print(Bank.transfer(account1, account2, 100.0))  # Transfer from account1 to account2
-print(Bank.view_transaction_history("1001", 5))  # View last 5 transactions of account1
+    # Perform Transactions
+    print(Bank.deposit(account1, 200.0))    # Deposit into account1
+    print(Bank.withdrawal(account2, 50.0))  # Withdraw from account2
+    print(Bank.transfer(account1, account2, 100.0))  # Transfer from account1 to account2
+    print(Bank.view_transaction_history("1001", 5))  # View last 5 transactions of account1
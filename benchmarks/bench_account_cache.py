@@ -0,0 +1,77 @@
+"""Account reads: find_one on every request vs. the read-through account cache.
+
+Seeds ACCOUNTS accounts and reads them by customerId with a skewed, Zipf-like
+access pattern, the way balance and profile reads arrive. Each read runs once
+with find_one and once through account_cache. The script prints reads/s and
+the cache's hit, miss and eviction counters. It then checks coherence. An
+update made through db.update_account is visible on the next read. An update
+written straight to the collection (as another worker would) is dropped by
+the change stream within a second, where change streams are available. Needs
+pymongo and a reachable mongod; it writes to the MONGO_DB_NAME database
+(default banking_bench). Set ACCOUNT_CACHE_REDIS_URL to include the shared
+tier.
+
+Usage: python benchmarks/bench_account_cache.py [reads] [accounts]
+"""
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("MONGO_DB_NAME", "banking_bench")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Backend"))
+
+import connection
+import db as data_layer
+from account_cache import account_cache
+
+READS = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+ACCOUNTS = int(sys.argv[2]) if len(sys.argv) > 2 else 5_000
+
+
+def seed(db):
+    db.accounts.delete_many({"customerId": {"$regex": "^bench-cache-"}})
+    db.accounts.insert_many([data_layer.get_account_schema(f"bench-cache-{n}", "Savings", 1000 + n, "bench")
+                             for n in range(ACCOUNTS)])
+
+
+def rate(read, customers):
+    started = time.perf_counter()
+    for customer_id in customers:
+        assert read(customer_id) is not None
+    return len(customers) / (time.perf_counter() - started)
+
+
+def main():
+    db = connection.get_database()
+    data_layer.create_indexes()
+    seed(db)
+    random.seed(7)
+    customers = [f"bench-cache-{min(int(random.paretovariate(1.2)) - 1, ACCOUNTS - 1)}" for _ in range(READS)]
+
+    direct = rate(lambda customer_id: db.accounts.find_one({"customerId": customer_id}), customers)
+    account_cache.clear()
+    cached = rate(account_cache.get_by_customer, customers)
+    print(f"{READS:,} reads over {ACCOUNTS:,} accounts ({len(set(customers)):,} distinct)")
+    print(f"  find_one:      {direct:>10,.0f} reads/s")
+    print(f"  account cache: {cached:>10,.0f} reads/s  (x{cached / direct:,.1f})")
+    print(f"  {account_cache.stats()}")
+
+    customer_id = customers[0]
+    data_layer.update_account(customer_id, {"accountType": "Checking"}, "bench")
+    assert account_cache.get_by_customer(customer_id)["accountType"] == "Checking"
+    print("  write through db.update_account: visible on the next read")
+
+    db.accounts.update_one({"customerId": customer_id}, {"$set": {"accountType": "Loan"}})
+    deadline = time.monotonic() + 1
+    while time.monotonic() < deadline and account_cache.get_by_customer(customer_id)["accountType"] != "Loan":
+        time.sleep(0.01)
+    seen = account_cache.get_by_customer(customer_id)["accountType"] == "Loan"
+    print(f"  direct write, change stream {account_cache.watcher_state}: "
+          f"{'invalidated within 1s' if seen else 'still cached (expires after the TTL)'}")
+    if account_cache.watcher_state == "watching":
+        assert seen, "change stream did not invalidate the entry"
+
+
+if __name__ == "__main__":
+    main()
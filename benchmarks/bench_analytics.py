@@ -0,0 +1,115 @@
+"""Vectorized analytics (analytics.py) vs. per-document Python loops.
+
+Generates synthetic transaction documents in the shape of
+db.get_transaction_schema. It computes per-account totals, monthly totals,
+interest accrual and spend percentiles both ways, checks that the results
+agree, and reports the timings. The columnar load (TransactionFrame.from_documents)
+is timed separately, because a saved snapshot skips it. Needs numpy; no database.
+
+Usage: python benchmarks/bench_analytics.py [transactions] [accounts]
+"""
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Backend"))
+
+import numpy as np
+
+import analytics
+
+START, END = datetime(2024, 1, 1), datetime(2024, 2, 1)
+
+
+def make_documents(count, accounts):
+    rng = random.Random(11)
+    base = datetime(2023, 12, 1)
+    for _ in range(count):
+        kind = rng.choice(("deposit", "withdrawal", "withdrawal", "fee", "transfer_in"))
+        yield {
+            "accountId": f"acct{rng.randrange(accounts)}",
+            "transactionType": kind,
+            "amount": rng.randint(100, 200000),
+            "currency": "USD",
+            "date": base + timedelta(seconds=rng.randrange(90 * 86400)),
+        }
+
+
+def python_loops(documents, rates):
+    rows = defaultdict(list)
+    for document in documents:
+        sign = 1 if document["transactionType"] in analytics.CREDIT_TYPES else -1
+        rows[document["accountId"]].append((document["date"], sign * document["amount"]))
+
+    totals, monthly, interest, percentiles = {}, defaultdict(int), {}, {}
+    for account_id, items in rows.items():
+        items.sort(key=lambda item: item[0])
+        credits = sum(amount for _, amount in items if amount > 0)
+        debits = -sum(amount for _, amount in items if amount < 0)
+        totals[account_id] = (credits, debits, len(items))
+        for when, amount in items:
+            monthly[(account_id, when.strftime("%Y-%m"))] += amount
+
+        balance, weighted, previous = 0, 0.0, START
+        for when, amount in items:
+            if when > START:
+                held = (min(when, END) - previous).total_seconds()
+                weighted += max(balance, 0) * max(held, 0)
+                previous = min(max(when, START), END)
+            balance += amount
+        weighted += max(balance, 0) * (END - previous).total_seconds()
+        interest[account_id] = round(weighted * rates.get(account_id, 0) / analytics.SECONDS_PER_YEAR)
+
+        spend = sorted(-amount for _, amount in items if amount < 0)
+        if spend:
+            percentiles[account_id] = float(np.percentile(spend, 90))
+    return totals, monthly, interest, percentiles
+
+
+def vectorized(frame, rates):
+    totals = analytics.account_totals(frame)
+    monthly = analytics.monthly_totals(frame)
+    interest = analytics.accrue_interest(frame, frame.per_account(rates, 0.0), START, END)
+    percentiles = analytics.spend_percentiles(frame, (90,))
+    return totals, monthly, interest, percentiles
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    accounts = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    documents = list(make_documents(count, accounts))
+    rates = {f"acct{n}": 0.01 + (n % 5) / 100 for n in range(accounts)}
+
+    started = time.perf_counter()
+    expected = python_loops(documents, rates)
+    loop_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    frame = analytics.TransactionFrame.from_documents(documents)
+    load_time = time.perf_counter() - started
+    started = time.perf_counter()
+    totals, monthly, interest, percentiles = vectorized(frame, rates)
+    vector_time = time.perf_counter() - started
+
+    for index, account_id in enumerate(totals["accountId"]):
+        credits, debits, n = expected[0][account_id]
+        assert (totals["credits"][index], totals["debits"][index], totals["count"][index]) == (credits, debits, n)
+    for index, account_id in enumerate(monthly["accountId"]):
+        key = (account_id, str(monthly["month"][index]))
+        assert monthly["credits"][index] - monthly["debits"][index] == expected[1][key]
+    for index, account_id in enumerate(interest["accountId"]):
+        assert abs(interest["interest"][index] - expected[2][account_id]) <= 1
+    for index, account_id in enumerate(percentiles["accountId"]):
+        assert abs(percentiles["p90"][index] - expected[3][account_id]) < 1e-6
+
+    print(f"{count} transactions over {accounts} accounts")
+    print(f"  python loops:        {loop_time:8.3f} s")
+    print(f"  columnar load:       {load_time:8.3f} s")
+    print(f"  vectorized analytics:{vector_time:8.3f} s  ({loop_time / vector_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
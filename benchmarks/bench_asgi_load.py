@@ -0,0 +1,165 @@
+"""Sync (gunicorn + app.py) vs. async (hypercorn + asgi.py) under the same load.
+
+Seeds one account with a page of transactions, starts each server in turn on
+a local port, and drives /api/transactions/history with the same number of
+concurrent keep-alive clients for a fixed time. A second phase mixes in
+/auth/login, which spends most of its time in bcrypt. For each server it
+reports requests/s, p50/p95 latency, and peak RSS summed over the server's
+process tree (master plus workers, read from /proc). Both servers get the same
+worker count; the sync app also gets --threads so it is not capped at one
+request per worker. Needs gunicorn, hypercorn, quart, PyJWT, pymongo >= 4.10
+and a reachable mongod (MONGO_URI); Linux only, because of /proc.
+
+Usage: python benchmarks/bench_asgi_load.py [concurrency] [seconds] [workers]
+"""
+import http.client
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+BACKEND = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Backend")
+sys.path.insert(0, BACKEND)
+os.environ.setdefault("MONGO_DB_NAME", "banking_bench")
+os.environ.setdefault("JWT_SECRET_KEY", "bench-secret")
+
+import bcrypt
+
+import tokens
+from connection import get_database
+
+CONCURRENCY = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+SECONDS = float(sys.argv[2]) if len(sys.argv) > 2 else 15
+WORKERS = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+PORT = 5057
+ACCOUNT = "BENCH-ASGI-1"
+EMAIL, PASSWORD = "bench-asgi@example.com", "bench-password"
+
+SERVERS = {
+    "sync (gunicorn)": ["gunicorn", "app:app", "-w", str(WORKERS), "--threads", "8", "-b", f"127.0.0.1:{PORT}"],
+    "async (hypercorn)": ["hypercorn", "asgi:app", "-w", str(WORKERS), "-b", f"127.0.0.1:{PORT}"],
+}
+
+
+def seed():
+    db = get_database()
+    db.transactions.delete_many({"accountId": ACCOUNT})
+    db.transactions.insert_many([
+        {"accountId": ACCOUNT, "fromAccount": ACCOUNT, "toAccount": "BENCH-ASGI-2", "transactionType": "debit",
+         "amount": 100 + i, "currency": "LKR", "date": f"2024-01-{1 + i % 28:02d}", "description": "bench"}
+        for i in range(200)
+    ])
+    db.customers.delete_many({"email": EMAIL})
+    db.customers.insert_one({"_id": "bench-asgi", "email": EMAIL, "name": "Bench",
+                             "password": bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt()).decode()})
+
+
+def tree_rss(pid):
+    """Resident memory in MB of `pid` and all of its descendants."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        stack.extend(children.get(current, []))
+        try:
+            with open(f"/proc/{current}/status") as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+        except (OSError, StopIteration):
+            pass
+    return total / 1024
+
+
+def wait_ready(deadline=30):
+    started = time.monotonic()
+    while time.monotonic() - started < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", PORT, timeout=1)
+            conn.request("GET", "/api/transactions/history")
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def client(requests_for, stop, latencies, errors):
+    conn = http.client.HTTPConnection("127.0.0.1", PORT, timeout=30)
+    n = 0
+    while not stop.is_set():
+        method, path, body, headers = requests_for(n)
+        n += 1
+        started = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors.append(response.status)
+            else:
+                latencies.append(time.perf_counter() - started)
+        except OSError:
+            errors.append("conn")
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", PORT, timeout=30)
+
+
+def run_load(pid, requests_for):
+    stop, latencies, errors = threading.Event(), [], []
+    threads = [threading.Thread(target=client, args=(requests_for, stop, latencies, errors), daemon=True)
+               for _ in range(CONCURRENCY)]
+    peak = tree_rss(pid)
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    while time.perf_counter() - started < SECONDS:
+        time.sleep(0.5)
+        peak = max(peak, tree_rss(pid))
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    pct = lambda p: latencies[int(p * (len(latencies) - 1))] * 1e3 if latencies else float("nan")
+    return len(latencies) / elapsed, pct(0.5), pct(0.95), len(errors), peak
+
+
+def main():
+    seed()
+    token = tokens.create_access_token("bench-asgi", os.environ["JWT_SECRET_KEY"],
+                                       claims=tokens.compact_claims([ACCOUNT]))
+    history = ("GET", "/api/transactions/history?limit=50", None, {"Authorization": f"Bearer {token}"})
+    login = ("POST", "/auth/login", json.dumps({"email": EMAIL, "password": PASSWORD}),
+             {"Content-Type": "application/json"})
+    workloads = {
+        "history": lambda n: history,
+        "history + 10% login": lambda n: login if n % 10 == 0 else history,
+    }
+
+    print(f"{CONCURRENCY} concurrent clients, {SECONDS:.0f}s per run, {WORKERS} workers per server")
+    print(f"{'server':<20} {'workload':<22} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7} {'RSS MB':>8}")
+    for name, command in SERVERS.items():
+        server = subprocess.Popen(command, cwd=BACKEND, env=os.environ.copy(),
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+        try:
+            wait_ready()
+            for workload, requests_for in workloads.items():
+                rate, p50, p95, errors, rss = run_load(server.pid, requests_for)
+                print(f"{name:<20} {workload:<22} {rate:8.0f} {p50:8.1f} {p95:8.1f} {errors:7d} {rss:8.0f}")
+        finally:
+            os.killpg(server.pid, signal.SIGTERM)
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Concurrent balance updates: read-modify-write ($set) vs. one guarded $inc round trip.
+
+Threads hammer a handful of accounts with deposits. The read-modify-write
+variant is the old find_one + update_one($set) path. The atomic variant is
+balances.apply_delta. The script reports per-op latency percentiles and lost
+updates, i.e. the expected final balance minus the actual one. Needs pymongo
+and a reachable mongod; it writes to the MONGO_DB_NAME database (default
+banking_bench).
+
+Usage: python benchmarks/bench_balance_updates.py [threads] [ops_per_thread]
+"""
+import os
+import statistics
+import sys
+import threading
+import time
+
+os.environ.setdefault("MONGO_DB_NAME", "banking_bench")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Backend"))
+
+import balances
+import connection
+from money import Money
+
+ACCOUNTS = 4
+
+
+def read_modify_write(db, account_id, amount):
+    account = db.accounts.find_one({"_id": account_id})
+    db.accounts.update_one({"_id": account_id}, {"$set": {"balance": account["balance"] + amount.minor}})
+
+
+def atomic_inc(db, account_id, amount):
+    balances.apply_delta(account_id, amount)
+
+
+def run(variant, threads, ops_per_thread):
+    db = connection.get_database()
+    db.accounts.delete_many({"bench": True})
+    account_ids = db.accounts.insert_many(
+        [{"bench": True, "balance": 0, "currency": "USD"} for _ in range(ACCOUNTS)]).inserted_ids
+    amount = Money(100)
+    latencies = []
+    gate = threading.Barrier(threads + 1)
+
+    def worker(index):
+        local = []
+        gate.wait()
+        for n in range(ops_per_thread):
+            account_id = account_ids[(index + n) % ACCOUNTS]
+            start = time.perf_counter()
+            variant(db, account_id, amount)
+            local.append(time.perf_counter() - start)
+        latencies.extend(local)
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    gate.wait()
+    start = time.perf_counter()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    actual = sum(doc["balance"] for doc in db.accounts.find({"bench": True}))
+    expected = threads * ops_per_thread * amount.minor
+    db.accounts.delete_many({"bench": True})
+    latencies.sort()
+    return {
+        "ops/s": len(latencies) / elapsed,
+        "p50 ms": statistics.median(latencies) * 1e3,
+        "p99 ms": latencies[int(len(latencies) * 0.99) - 1] * 1e3,
+        "lost updates": (expected - actual) // amount.minor,
+    }
+
+
+def main(threads, ops_per_thread):
+    print(f"{threads} threads x {ops_per_thread} deposits over {ACCOUNTS} accounts")
+    for name, variant in (("find+$set", read_modify_write), ("$inc", atomic_inc)):
+        stats = run(variant, threads, ops_per_thread)
+        print(f"{name:>10}: " + "  ".join(f"{key} {value:,.2f}" for key, value in stats.items()))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 16,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 500)
@@ -0,0 +1,50 @@
+"""Cold-start guard for Backend/app.py.
+
+Imports the app in fresh interpreters and reports the best wall time out of a
+few runs. It fails (exit 1) when the import takes longer than the budget, or
+when any of the heavy AI modules are loaded at import time. Those modules must
+only load on first use; see Backend/assistant.py. The app's dependencies have
+to be installed, and a reachable mongod is needed because the app migrates
+indexes at import.
+
+Usage: python benchmarks/bench_cold_start.py [budget_seconds] [runs]
+"""
+import json
+import os
+import subprocess
+import sys
+
+BACKEND = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Backend")
+HEAVY_MODULES = ("transformers", "torch", "sympy", "openai", "tensorflow")
+
+PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import app
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "heavy": sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)}}))
+"""
+
+
+def import_once():
+    output = subprocess.run([sys.executable, "-c", PROBE], cwd=BACKEND, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    results = [import_once() for _ in range(runs)]
+    best = min(result["seconds"] for result in results)
+    heavy = sorted({module for result in results for module in result["heavy"]})
+    print(f"import app: best {best:.3f} s of {runs} runs (budget {budget:.3f} s)")
+    if heavy:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(heavy)}")
+    if best > budget:
+        print("FAIL: cold start over budget")
+    sys.exit(1 if heavy or best > budget else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Memory per transaction: dict-per-posting Ledger vs. ColumnarLedger.
+
+Usage: python benchmarks/bench_columnar_memory.py [transactions]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from banking_system import (
+    Bank, ColumnarLedger, Ledger, Money, PinHasher, PinVerifier, use_ledger, use_pin_verifier
+)
+
+# Accounts are created in bulk here; PIN hashing cost is not what is being measured.
+use_pin_verifier(PinVerifier(PinHasher(iterations=1)))
+
+ACCOUNTS = 1000
+
+
+def measure(ledger, total):
+    use_ledger(ledger)
+    customer = Bank.register_customer("bench", "Bench", "Mark")
+    accounts = [Bank.create_account(customer, str(n), "savings") for n in range(ACCOUNTS)]
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    start = time.perf_counter()
+    amount = Money(1234)
+    for i in range(total):
+        account = accounts[i % ACCOUNTS]
+        account.bal += amount
+        Bank.save_transaction(account, amount, "credit" if i % 3 else "debit")
+    elapsed = time.perf_counter() - start
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    used = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return used, elapsed
+
+
+def main(total):
+    print(f"{total:,} transactions over {ACCOUNTS} accounts")
+    print(f"{'backend':>10} {'MiB':>9} {'bytes/txn':>10} {'write s':>8}")
+    for name, ledger in (("dict", Ledger()), ("columnar", ColumnarLedger())):
+        used, elapsed = measure(ledger, total)
+        print(f"{name:>10} {used / 2**20:>9.1f} {used / total:>10.1f} {elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,83 @@
+"""Multi-threaded posting stress test and throughput vs. thread count.
+
+Every thread runs random transfers, deposits and withdrawals against a shared
+set of accounts. After each run the total balance must equal the opening
+total plus deposits minus withdrawals, and no account may go negative.
+
+Usage: python benchmarks/bench_concurrency.py [ops_per_thread]
+"""
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from banking_system import (
+    Bank, ColumnarLedger, Ledger, Money, PinHasher, PinVerifier,
+    enable_concurrent_posting, use_ledger, use_pin_verifier
+)
+
+# Accounts are created in bulk here; PIN hashing cost is not what is being measured.
+use_pin_verifier(PinVerifier(PinHasher(iterations=1)))
+
+ACCOUNTS = 200
+OPENING = 1000
+THREAD_COUNTS = [1, 2, 4, 8, 16]
+
+
+def run(threads, ops_per_thread, stripes, ledger_factory):
+    use_ledger(ledger_factory())
+    enable_concurrent_posting(stripes)
+    customer = Bank.register_customer("bench", "Bench", "Mark")
+    accounts = [Bank.create_account(customer, str(n), "savings", OPENING) for n in range(ACCOUNTS)]
+    net = [0] * threads
+    start_gate = threading.Barrier(threads + 1)
+
+    def worker(index):
+        rng = random.Random(index)
+        start_gate.wait()
+        for _ in range(ops_per_thread):
+            a, b = rng.choice(accounts), rng.choice(accounts)
+            amount = rng.randrange(1, 50)
+            roll = rng.random()
+            if roll < 0.8:
+                Bank.transfer(a, b, amount)
+            elif roll < 0.9:
+                Bank.deposit(a, amount)
+                net[index] += amount
+            elif Bank.withdrawal(a, amount) == "Withdrawal successful.":
+                net[index] -= amount
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    start_gate.wait()
+    start = time.perf_counter()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    total = Money.sum(account.bal for account in accounts)
+    expected = Money.of(ACCOUNTS * OPENING + sum(net))
+    assert total == expected, f"balance not conserved: {total} != {expected}"
+    assert all(account.bal.minor >= 0 for account in accounts), "account overdrawn"
+    return threads * ops_per_thread / elapsed
+
+
+def main(ops_per_thread):
+    # Let threads switch often so races would actually surface. Under the GIL
+    # the striped numbers show lock overhead, not parallel speed-up.
+    sys.setswitchinterval(1e-5)
+    print(f"{ops_per_thread:,} ops per thread over {ACCOUNTS} accounts (ops/s, balance checked)")
+    print(f"{'threads':>8} {'1 lock':>10} {'64 stripes':>11} {'64 stripes, columnar':>21}")
+    for threads in THREAD_COUNTS:
+        single = run(threads, ops_per_thread, 1, Ledger)
+        striped = run(threads, ops_per_thread, 64, Ledger)
+        columnar = run(threads, ops_per_thread, 64, ColumnarLedger)
+        print(f"{threads:>8} {single:>10,.0f} {striped:>11,.0f} {columnar:>21,.0f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
@@ -0,0 +1,93 @@
+"""Chat generation: inline per-request calls vs. the batching worker pool.
+
+A stand-in model simulates a batched forward pass. Each call costs a fixed
+overhead plus a small amount per prompt, and it holds the CPU, so inline calls
+from concurrent request threads serialize. Concurrent clients send prompts
+through both paths. The script reports throughput and p50/p95 latency. Set
+MODEL=real to use the DialoGPT pipeline instead (needs transformers).
+
+Usage: python benchmarks/bench_inference.py [clients] [requests_per_client] [workers]
+"""
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Backend"))
+
+import inference
+
+CALL_OVERHEAD = 0.08
+PER_PROMPT = 0.01
+
+
+def fake_model():
+    def generate(prompts, max_new_tokens=128, **kwargs):
+        prompts = [prompts] if isinstance(prompts, str) else prompts
+        time.sleep(CALL_OVERHEAD + PER_PROMPT * len(prompts))
+        return [[{"generated_text": f"{prompt} ... reply"}] for prompt in prompts]
+    return generate
+
+
+FACTORY = inference.DEFAULT_FACTORY if os.getenv("MODEL") == "real" else "bench_inference:fake_model"
+
+
+def run_clients(clients, per_client, call):
+    latencies, gate = [], threading.Barrier(clients + 1)
+
+    def client(index):
+        local = []
+        gate.wait()
+        for n in range(per_client):
+            started = time.perf_counter()
+            call(f"client {index} message {n}")
+            local.append(time.perf_counter() - started)
+        latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    gate.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, sorted(latencies)
+
+
+def report(label, elapsed, latencies):
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"  {label:22s} {len(latencies) / elapsed:7.1f} req/s   "
+          f"p50 {statistics.median(latencies) * 1000:7.1f} ms   p95 {p95 * 1000:7.1f} ms")
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    per_client = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    print(f"{clients} clients x {per_client} requests")
+
+    # Inline: one model in the web process, one prompt per call, calls serialized on the CPU.
+    model, model_lock = inference._resolve(FACTORY)(), threading.Lock()
+
+    def inline(prompt):
+        with model_lock:
+            return model(prompt, max_new_tokens=64)
+
+    report("inline", *run_clients(clients, per_client, inline))
+
+    service = inference.InferenceService(factory=FACTORY, workers=workers, max_batch=16,
+                                         batch_window=0.01, max_new_tokens=64).start()
+    assert service.generate("warm up")["status"] == inference.DONE
+
+    def pooled(prompt):
+        result = service.generate(prompt)
+        assert result["status"] == inference.DONE, result
+        return result
+
+    report(f"pool ({workers} worker{'s' if workers > 1 else ''})", *run_clients(clients, per_client, pooled))
+    service.close()
+
+
+if __name__ == "__main__":
+    main()
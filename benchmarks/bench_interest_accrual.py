@@ -0,0 +1,86 @@
+"""Interest accrual throughput vs. worker count, and idempotency on re-run.
+
+Seeds the accounts collection with N interest-bearing accounts (default 1M)
+and runs interest.run_accrual for successive days, with 1, 2, 4, ... workers
+up to the CPU count, reporting accounts per second. It then re-runs the last
+day and asserts that nothing is credited twice: balances must equal the
+seeded balances plus the sum of the interest transactions. Needs pymongo and a
+reachable mongod. It drops the accounts, transactions, rollup and checkpoint
+collections of the MONGO_DB_NAME database (default banking_bench), so it
+refuses any database whose name does not start with banking_bench.
+
+Usage: python benchmarks/bench_interest_accrual.py [accounts]
+"""
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+os.environ.setdefault("MONGO_DB_NAME", "banking_bench")
+if not os.environ["MONGO_DB_NAME"].startswith("banking_bench"):
+    # seed() drops whole collections.
+    sys.exit(f"Refusing to run against MONGO_DB_NAME={os.environ['MONGO_DB_NAME']!r}; "
+             "use a database whose name starts with banking_bench")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Backend"))
+
+import connection
+import interest
+from indexes import ensure_indexes
+
+FIRST_DAY = datetime(2024, 1, 1)
+
+
+def seed(db, count, chunk=10000):
+    for name in ("accounts", "transactions", "account_daily", interest.CHECKPOINTS):
+        db[name].drop()
+    ensure_indexes(db, log=lambda message: None)
+    rng = random.Random(3)
+    for offset in range(0, count, chunk):
+        db.accounts.insert_many([
+            {"customerId": f"bench{n}", "accountType": "Savings", "balance": rng.randint(0, 10_000_000),
+             "currency": "USD", "interestRate": rng.choice((0.01, 0.02, 0.035))}
+            for n in range(offset, min(offset + chunk, count))
+        ], ordered=False)
+    return balance_total(db)
+
+
+def balance_total(db):
+    result = list(db.accounts.aggregate([{"$group": {"_id": None, "total": {"$sum": "$balance"}}}]))
+    return result[0]["total"] if result else 0
+
+
+def interest_total(db):
+    result = list(db.transactions.aggregate([
+        {"$match": {"transactionType": "interest"}},
+        {"$group": {"_id": None, "total": {"$sum": "$amount"}}},
+    ]))
+    return result[0]["total"] if result else 0
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    db = connection.get_database()
+    seeded = seed(db, count)
+    print(f"{count} accounts, {os.cpu_count()} CPUs")
+
+    workers, day = 1, FIRST_DAY
+    while workers <= (os.cpu_count() or 1):
+        stats = interest.run_accrual(day, workers=workers)
+        print(f"  {workers:3d} workers: {stats['seconds']:8.2f} s  "
+              f"{stats['credited'] / stats['seconds']:10.0f} accounts/s  ({stats['credited']} credited)")
+        workers, day = workers * 2, day + timedelta(days=1)
+
+    # Same day again, as after a crash: nothing may be credited twice.
+    again = interest.run_accrual(day - timedelta(days=1), workers=2)
+    db = connection.get_database()
+    db[interest.CHECKPOINTS].delete_many({"job": again["job"]})
+    replanned = interest.run_accrual(day - timedelta(days=1), workers=2)
+    db = connection.get_database()
+    assert again["credited"] == 0 and replanned["credited"] == 0, (again, replanned)
+    assert balance_total(db) == seeded + interest_total(db)
+    print("  re-run of the last day credited nothing; balances match the interest records")
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
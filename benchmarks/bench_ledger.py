@@ -0,0 +1,59 @@
+"""History-query scaling: flat transaction list vs. the per-account Ledger.
+
+Usage: python benchmarks/bench_ledger.py [sizes...]
+Default sizes run from 10k to 10M transactions spread over 1,000 accounts.
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from banking_system import Bank, Ledger, Money, PinHasher, PinVerifier, use_ledger, use_pin_verifier
+
+# Accounts are created in bulk here; PIN hashing cost is not what is being measured.
+use_pin_verifier(PinVerifier(PinHasher(iterations=1)))
+
+ACCOUNTS = 1000
+QUERIES = 200
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+
+
+def build(total):
+    ledger = Ledger()
+    use_ledger(ledger)
+    customer = Bank.register_customer("bench", "Bench", "Mark")
+    accounts = [Bank.create_account(customer, str(n), "savings") for n in range(ACCOUNTS)]
+    flat = []
+    for i in range(total):
+        account = accounts[i % ACCOUNTS]
+        ledger.record(account.account_no, Money(100), "credit", Money(0))
+        flat.append(ledger.logs[account.account_no][-1])
+    return ledger, flat
+
+
+def timed(fn, account_nos):
+    start = time.perf_counter()
+    for account_no in account_nos:
+        fn(account_no)
+    return (time.perf_counter() - start) / len(account_nos)
+
+
+def main(sizes):
+    rng = random.Random(42)
+    print(f"{'transactions':>12} {'flat scan (us)':>15} {'ledger (us)':>12} {'balance (us)':>13}")
+    for total in sizes:
+        ledger, flat = build(total)
+        account_nos = [str(rng.randrange(ACCOUNTS)) for _ in range(QUERIES)]
+        # The flat scan is O(total); sample fewer queries so large sizes still finish.
+        scan_sample = account_nos[: max(1, QUERIES // max(1, total // 100_000))]
+        scan = timed(lambda no: [t for t in flat if t["account_no"] == no][-5:], scan_sample)
+        history = timed(lambda no: Bank.view_transaction_history(no, 5), account_nos)
+        balance = timed(ledger.balance, account_nos)
+        print(f"{total:>12,} {scan * 1e6:>15.1f} {history * 1e6:>12.2f} {balance * 1e6:>13.2f}")
+        del ledger, flat
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,79 @@
+"""Login spike: bcrypt inline on request threads vs. the auth_service pool.
+
+Simulates one web worker with THREADS request threads (gunicorn --threads).
+A burst of logins arrives together with a steady trickle of cheap requests,
+such as balance lookups. With "inline", every login runs bcrypt.checkpw on a
+request thread. With "pool", logins go through auth_service.check_password:
+bcrypt runs in the subprocess pool, and logins beyond BCRYPT_MAX_PENDING are
+shed with AuthBusy (429) instead of queueing. For each mode it reports login
+throughput, how many logins were shed, and the p50/p95 latency of the cheap
+requests. That latency is what other customers see during the spike. Needs
+bcrypt; no database.
+
+Usage: python benchmarks/bench_login_spike.py [logins] [threads] [bcrypt_workers]
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+LOGINS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+THREADS = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+os.environ.setdefault("BCRYPT_WORKERS", sys.argv[3] if len(sys.argv) > 3 else str(os.cpu_count() or 1))
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Backend"))
+
+import bcrypt
+
+import auth_service
+
+PASSWORD = "correct horse battery staple"
+HASHED = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt()).decode()
+CHEAP_EVERY = 0.01  # one cheap request every 10 ms
+
+
+def inline_login():
+    assert bcrypt.checkpw(PASSWORD.encode(), HASHED.encode())
+    return True
+
+
+def pool_login():
+    try:
+        assert auth_service.check_password(PASSWORD, HASHED)
+        return True
+    except auth_service.AuthBusy:
+        return False
+
+
+def cheap_request(queued_at):
+    sum(range(2000))
+    return time.perf_counter() - queued_at
+
+
+def run(login):
+    with ThreadPoolExecutor(THREADS) as request_threads:
+        started = time.perf_counter()
+        logins = [request_threads.submit(login) for _ in range(LOGINS)]
+        cheap = []
+        while not all(f.done() for f in logins):
+            cheap.append(request_threads.submit(cheap_request, time.perf_counter()))
+            time.sleep(CHEAP_EVERY)
+        elapsed = time.perf_counter() - started
+        accepted = sum(f.result() for f in logins)
+        latencies = sorted(f.result() for f in cheap)
+    pct = lambda p: latencies[int(p * (len(latencies) - 1))] * 1e3 if latencies else float("nan")
+    return accepted / elapsed, LOGINS - accepted, pct(0.5), pct(0.95)
+
+
+def main():
+    auth_service.check_password(PASSWORD, HASHED)  # start the pool outside the measurement
+    print(f"{LOGINS} logins, {THREADS} request threads, {auth_service.WORKERS} bcrypt workers, "
+          f"max {auth_service.MAX_PENDING} pending")
+    print(f"{'mode':<8} {'logins/s':>9} {'shed':>6} {'cheap p50 ms':>13} {'cheap p95 ms':>13}")
+    for name, login in (("inline", inline_login), ("pool", pool_login)):
+        rate, shed, p50, p95 = run(login)
+        print(f"{name:<8} {rate:9.1f} {shed:6d} {p50:13.1f} {p95:13.1f}")
+
+
+if __name__ == "__main__":
+    main()
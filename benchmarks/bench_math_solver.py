@@ -0,0 +1,55 @@
+"""Math solver: sandboxed sympy, result cache and the financial fast path.
+
+Times the following:
+- a loan payment formula through sympy, cold and then from the cache;
+- the same payment through the Decimal annuity fast path;
+- an expression built to exhaust the CPU.
+The hostile expression must come back as a SolverTimeout within the wall-clock
+budget, and the solver must keep working afterwards. Needs sympy; no database.
+
+Usage: python benchmarks/bench_math_solver.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Backend"))
+
+import math_solver
+
+LOAN = "250000 * (0.05/12) / (1 - (1 + 0.05/12)^(-360))"
+HOSTILE = "factorint(2^521 * 3^401 + 12345678901234567890123456789 ^ 7)"
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def main():
+    math_solver.simplify("1 + 1")  # start the pool outside the measurements
+
+    cold, cold_time = timed(lambda: math_solver.simplify(LOAN))
+    warm, warm_time = timed(lambda: math_solver.simplify(" ".join(LOAN)))  # same expression, other spacing
+    fast, fast_time = timed(lambda: math_solver.solve_formula(
+        "annuity", {"principal": 250000, "rate": 0.05, "periods": 360}))
+    assert cold == warm and abs(float(cold) - float(fast)) < 0.01, (cold, warm, fast)
+    print(f"  sympy, cold:          {cold_time * 1000:9.2f} ms  -> {cold}")
+    print(f"  sympy, cached:        {warm_time * 1000:9.2f} ms")
+    print(f"  annuity fast path:    {fast_time * 1000:9.2f} ms  -> {fast}")
+
+    started = time.perf_counter()
+    try:
+        math_solver.simplify(HOSTILE)
+        raise AssertionError("hostile expression was not cut off")
+    except math_solver.SolverTimeout as e:
+        elapsed = time.perf_counter() - started
+        print(f"  hostile expression:   {elapsed * 1000:9.2f} ms  -> {e}")
+        assert elapsed < math_solver.CPU_SECONDS * 2 + 2
+    assert math_solver.simplify("x + x") == "2*x"
+    print("  solver still healthy after the timeout")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Per-worker socket count and cold-start time: one client per module vs. the shared client.
+
+Each variant runs in a fresh interpreter that imports the data layer, runs
+one query and then reports how long that took and how many sockets it holds.
+The "per-module" variant rebuilds the old layout, where five modules each
+created a MongoClient at import. Needs pymongo and a reachable mongod
+(MONGO_URI, default mongodb://localhost:27017/).
+
+Usage: python benchmarks/bench_mongo_connections.py
+"""
+import json
+import os
+import subprocess
+import sys
+
+BACKEND = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Backend")
+
+PROBE = """
+import json, os, sys, time
+start = time.perf_counter()
+{setup}
+imported = time.perf_counter()
+{query}
+queried = time.perf_counter()
+sockets = sum(1 for fd in os.listdir('/proc/self/fd')
+              if os.readlink('/proc/self/fd/' + fd).startswith('socket:'))
+print(json.dumps({{"import_ms": (imported - start) * 1e3, "first_query_ms": (queried - imported) * 1e3,
+                  "sockets": sockets}}))
+"""
+
+VARIANTS = {
+    "per-module clients": (
+        "from pymongo import MongoClient\n"
+        "uri = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')\n"
+        "clients = [MongoClient(uri) for _ in range(5)]\n"
+        "db = clients[0]['banking_system']",
+        "db.accounts.find_one()\ntime.sleep(0.5)",
+    ),
+    "shared lazy client": (
+        f"sys.path.insert(0, {BACKEND!r})\nimport db as data\ndb = data.db",
+        "db.accounts.find_one()\ntime.sleep(0.5)",
+    ),
+}
+
+
+def main():
+    print(f"{'variant':>20} {'import ms':>10} {'first query ms':>15} {'sockets':>8}")
+    for name, (setup, query) in VARIANTS.items():
+        result = subprocess.run([sys.executable, "-c", PROBE.format(setup=setup, query=query)],
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"{name:>20} failed: {result.stderr.strip().splitlines()[-1]}")
+            continue
+        stats = json.loads(result.stdout.strip().splitlines()[-1])
+        print(f"{name:>20} {stats['import_ms']:>10.1f} {stats['first_query_ms']:>15.1f} {stats['sockets']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Outbound-call layer against a local stub upstream.
+
+Starts a threaded stub HTTP server on localhost and points outbound.Upstream
+clients at it. The stub's /weather replies after a configurable delay, and
+/broken always returns 500. The script shows each of these in turn:
+- the TTL cache: repeat calls for a city never reach the stub;
+- the concurrency cap: callers beyond it are rejected in about
+  acquire_timeout instead of queueing behind the slow upstream;
+- the circuit breaker: after N failures it fails fast without sending
+  anything, then closes again after one successful probe.
+Needs requests; no network access.
+
+Usage: python benchmarks/bench_outbound.py [upstream_delay_seconds]
+"""
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Backend"))
+
+import outbound
+
+DELAY = float(sys.argv[1]) if len(sys.argv) > 1 else 0.5
+hits = {"weather": 0, "broken": 0}
+
+
+class Stub(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/broken"):
+            hits["broken"] += 1
+            self.send_response(500)
+            self.end_headers()
+            return
+        hits["weather"] += 1
+        time.sleep(DELAY)
+        body = json.dumps({"name": "Colombo", "weather": [{"description": "light rain"}], "main": {"temp": 29.5}})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Stub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    # Cache: 100 lookups for one city, one upstream call
+    api = outbound.Upstream("stub", base_url, cache_ttl=60)
+    started = time.perf_counter()
+    for _ in range(100):
+        api.request("GET", "/weather", cache_key="weather:colombo")
+    print(f"  cache: 100 lookups in {time.perf_counter() - started:.3f} s, {hits['weather']} upstream call(s)")
+    assert hits["weather"] == 1
+
+    # Concurrency cap: 20 callers, 4 slots; the rest are shed after acquire_timeout
+    api = outbound.Upstream("stub", base_url, max_concurrency=4, acquire_timeout=0.05, cache_ttl=60)
+    outcomes, lock = [], threading.Lock()
+
+    def caller():
+        started = time.perf_counter()
+        try:
+            api.request("GET", "/weather")
+            result = "ok"
+        except outbound.UpstreamUnavailable:
+            result = "shed"
+        with lock:
+            outcomes.append((result, time.perf_counter() - started))
+
+    threads = [threading.Thread(target=caller) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    shed = [elapsed for result, elapsed in outcomes if result == "shed"]
+    served = [elapsed for result, elapsed in outcomes if result == "ok"]
+    print(f"  cap: {len(served)} served (~{max(served):.2f} s), {len(shed)} shed (max {max(shed) * 1000:.0f} ms)")
+    assert len(served) == 4 and max(shed) < DELAY
+
+    # Circuit breaker: 3 failures open it; further calls never reach the stub
+    api = outbound.Upstream("stub", base_url, failure_threshold=3, reset_after=0.5)
+    for _ in range(10):
+        try:
+            api.request("GET", "/broken")
+        except outbound.UpstreamError:
+            pass
+    print(f"  breaker: 10 calls, {hits['broken']} reached the upstream, state={api.breaker.state}")
+    assert hits["broken"] == 3 and api.breaker.state == "open"
+    time.sleep(0.5)
+    api.request("GET", "/weather")
+    print(f"  breaker: after the cool-down one probe succeeded, state={api.breaker.state}")
+    assert api.breaker.state == "closed"
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
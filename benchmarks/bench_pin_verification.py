@@ -0,0 +1,39 @@
+"""PIN verifications per second with a cold and a warm verification cache.
+
+Usage: python benchmarks/bench_pin_verification.py [iterations] [accounts]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from banking_system import Bank, Ledger, PinHasher, PinVerifier, use_ledger, use_pin_verifier
+
+
+def rate(accounts, pins, rounds=1):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for account, pin in zip(accounts, pins):
+            assert account.verify_pin(pin)
+    return rounds * len(accounts) / (time.perf_counter() - start)
+
+
+def main(iterations, count):
+    verifier = PinVerifier(PinHasher(iterations=iterations), cache_size=count)
+    use_pin_verifier(verifier)
+    use_ledger(Ledger())
+    customer = Bank.register_customer("bench", "Bench", "Mark")
+    pins = [f"{n % 10000:04d}" for n in range(count)]
+    accounts = [Bank.create_account(customer, str(n), "savings", 0, pin) for n, pin in enumerate(pins)]
+
+    cold = rate(accounts, pins)
+    warm = rate(accounts, pins, rounds=50)
+    print(f"PBKDF2 iterations={iterations:,}, {count:,} accounts")
+    print(f"  cold cache: {cold:>12,.0f} verifications/s")
+    print(f"  warm cache: {warm:>12,.0f} verifications/s  (x{warm / cold:,.0f})")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 200)
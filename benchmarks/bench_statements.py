@@ -0,0 +1,96 @@
+"""Monthly statement from daily rollups vs. a scan of the transactions.
+
+Seeds one account with a year of postings, written through
+rollups.record_posting exactly as the app does. It then times the same
+statement (opening/closing balance plus totals for a month) two ways: by
+aggregating the raw transactions, and with rollups.statement. The results must
+agree. Needs pymongo and a reachable mongod; it writes to the MONGO_DB_NAME
+database (default banking_bench).
+
+Usage: python benchmarks/bench_statements.py [postings_per_day]
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("MONGO_DB_NAME", "banking_bench")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Backend"))
+
+import connection
+import rollups
+from indexes import ensure_indexes
+from money import Money
+
+ACCOUNT = "bench-statement"
+DAYS = 365
+
+
+def seed(db, postings_per_day):
+    db.transactions.delete_many({"accountId": ACCOUNT})
+    db.account_daily.delete_many({"accountId": ACCOUNT})
+    rng = random.Random(7)
+    balance = Money(0)
+    start = datetime(2024, 1, 1)
+    batch = []
+    for day in range(DAYS):
+        for n in range(postings_per_day):
+            when = start + timedelta(days=day, seconds=n * 86400 // postings_per_day)
+            delta = Money(rng.randint(1, 50000))
+            if rng.random() < 0.4 and balance >= delta:
+                delta = -delta
+            balance = balance + delta
+            batch.append({"accountId": ACCOUNT, "transactionType": "deposit" if delta.minor > 0 else "withdrawal",
+                          "amount": abs(delta.minor), "balanceAfterTransaction": balance.minor,
+                          "currency": balance.currency, "date": when})
+            rollups.record_posting(db, ACCOUNT, delta, balance, when)
+        if len(batch) >= 5000:
+            db.transactions.insert_many(batch)
+            batch = []
+    if batch:
+        db.transactions.insert_many(batch)
+
+
+def scan_statement(db, start, end):
+    before = db.transactions.find_one({"accountId": ACCOUNT, "date": {"$lt": start}}, sort=[("date", -1), ("_id", -1)])
+    last = db.transactions.find_one({"accountId": ACCOUNT, "date": {"$lt": end}}, sort=[("date", -1), ("_id", -1)])
+    credits = debits = 0
+    for document in db.transactions.find({"accountId": ACCOUNT, "date": {"$gte": start, "$lt": end}}):
+        if document["transactionType"] == "deposit":
+            credits += document["amount"]
+        else:
+            debits += document["amount"]
+    return (before["balanceAfterTransaction"] if before else None, last["balanceAfterTransaction"], credits, debits)
+
+
+def timed(fn, repeat=20):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+
+def main():
+    postings_per_day = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    db = connection.get_database()
+    ensure_indexes(db, log=lambda message: None)
+    seed(db, postings_per_day)
+
+    start, end = datetime(2024, 6, 10, 12, 30), datetime(2024, 7, 10, 9, 15)
+    scanned, scan_time = timed(lambda: scan_statement(db, start, end))
+    rolled, rollup_time = timed(lambda: rollups.statement(db, ACCOUNT, start, end))
+
+    assert Money.of(rolled["openingBalance"]).minor == scanned[0]
+    assert Money.of(rolled["closingBalance"]).minor == scanned[1]
+    assert (Money.of(rolled["credits"]).minor, Money.of(rolled["debits"]).minor) == scanned[2:]
+    print(f"{postings_per_day * DAYS} postings, statement for {end - start}")
+    print(f"  transaction scan: {scan_time * 1000:8.2f} ms")
+    print(f"  daily rollups:    {rollup_time * 1000:8.2f} ms  ({scan_time / rollup_time:.1f}x)")
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
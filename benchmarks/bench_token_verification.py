@@ -0,0 +1,62 @@
+"""Token checks per second: full decode on every request vs. tokens.TokenVerifier.
+
+Issues TOKENS compact access tokens and verifies them round-robin. Each check
+runs once with a full decode (signature, header and claims, what
+@jwt_required did on every request) and once through the verifier's cache.
+It then rotates in a new signing key and confirms the cache is still warm,
+so tokens signed before the rotation are hits, not a storm of re-decodes.
+Finally it retires the old key and confirms its tokens are rejected. Needs
+PyJWT; no database.
+
+Usage: python benchmarks/bench_token_verification.py [checks] [tokens]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Backend"))
+
+import tokens
+
+CHECKS = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+TOKENS = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+
+
+def rate(check, issued):
+    started = time.perf_counter()
+    for n in range(CHECKS):
+        check(issued[n % len(issued)])
+    return CHECKS / (time.perf_counter() - started)
+
+
+def main():
+    keys = tokens.KeyRing({"k1": "bench-secret-one-" + "x" * 32})
+    issued = [tokens.create_access_token(f"customer-{n}", keys, claims=tokens.compact_claims([f"acc-{n}"]))
+              for n in range(TOKENS)]
+    verifier = tokens.TokenVerifier(keys)
+
+    full = rate(lambda token: tokens.decode_access_token(token, keys), issued)
+    cached = rate(verifier.verify, issued)
+    print(f"{CHECKS:,} checks over {TOKENS:,} tokens")
+    print(f"  full decode: {full:>12,.0f} checks/s")
+    print(f"  verifier:    {cached:>12,.0f} checks/s  (x{cached / full:,.1f})")
+
+    misses = verifier.cache.misses
+    keys.rotate("k2", "bench-secret-two-" + "x" * 32)
+    rate(verifier.verify, issued)
+    assert verifier.cache.misses == misses, "rotation must not cold the cache"
+    rotated = tokens.create_access_token("customer-new", keys, claims=tokens.compact_claims(["acc-new"]))
+    assert verifier.verify(rotated)["sub"] == "customer-new"
+    print("  after rotate: old tokens still cache hits, new tokens signed with k2")
+
+    keys.retire("k1")
+    try:
+        verifier.verify(issued[0])
+    except tokens.TokenError:
+        print("  after retire: tokens signed with k1 rejected")
+    else:
+        raise AssertionError("retired key still accepted")
+
+
+if __name__ == "__main__":
+    main()
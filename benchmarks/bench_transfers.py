@@ -0,0 +1,87 @@
+"""Sustained transfers per second under contention on a few hot accounts.
+
+Threads move money between HOT accounts at random through transfers.transfer.
+Every transfer is a multi-document Mongo transaction, so mongod must run as a
+replica set (a single-node one is enough). After the run the script checks
+that the total balance is unchanged and that one transfer record exists per
+success. It also replays a sample of idempotency keys and checks that no
+money moves again. It deletes every transfer in the MONGO_DB_NAME database
+(default banking_bench), so it refuses any database whose name does not
+start with banking_bench.
+
+Usage: python benchmarks/bench_transfers.py [threads] [seconds] [hot_accounts]
+"""
+import os
+import random
+import sys
+import threading
+import time
+
+os.environ.setdefault("MONGO_DB_NAME", "banking_bench")
+if not os.environ["MONGO_DB_NAME"].startswith("banking_bench"):
+    # main() deletes every transfer and transfer leg.
+    sys.exit(f"Refusing to run against MONGO_DB_NAME={os.environ['MONGO_DB_NAME']!r}; "
+             "use a database whose name starts with banking_bench")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Backend"))
+
+import connection
+from balances import InsufficientFunds
+from money import Money
+from transfers import transfer
+
+OPENING = Money.of(1_000_000)
+
+
+def main(threads, seconds, hot):
+    db = connection.get_database()
+    db.accounts.delete_many({"bench": True})
+    db.transfers.delete_many({})
+    db.transactions.delete_many({"transferId": {"$exists": True}})
+    accounts = [str(i) for i in db.accounts.insert_many(
+        [{"bench": True, "customerId": f"bench-{n}", "balance": OPENING.minor, "currency": "USD"}
+         for n in range(hot)]).inserted_ids]
+
+    done, rejected, keys = [0] * threads, [0] * threads, [[] for _ in range(threads)]
+    stop = time.monotonic() + seconds
+
+    def worker(index):
+        rng = random.Random(index)
+        while time.monotonic() < stop:
+            a, b = rng.sample(accounts, 2)
+            key = f"bench-{index}-{done[index] + rejected[index]}"
+            try:
+                transfer(a, b, Money(rng.randrange(1, 10_000)), idempotency_key=key)
+                done[index] += 1
+                keys[index].append((key, a, b))
+            except InsufficientFunds:
+                rejected[index] += 1
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    total = Money.sum(Money.from_document(doc) for doc in db.accounts.find({"bench": True}))
+    assert total == Money(OPENING.minor * hot), f"money not conserved: {total}"
+    assert db.transfers.count_documents({}) == sum(done), "transfer records do not match successes"
+
+    replayed = [entry for bucket in keys for entry in bucket[:5]]
+    before = Money.sum(Money.from_document(doc) for doc in db.accounts.find({"bench": True}))
+    for key, a, b in replayed:
+        original = db.transfers.find_one({"_id": key})
+        assert transfer(a, b, Money(original["amount"]), idempotency_key=key)["duplicate"]
+    assert db.transfers.count_documents({}) == sum(done), "a replayed key posted twice"
+    assert before == total
+
+    print(f"{threads} threads, {hot} hot accounts, {elapsed:.1f}s: "
+          f"{sum(done) / elapsed:,.0f} transfers/s, {sum(rejected)} rejected for funds, "
+          f"{len(replayed)} replays deduplicated, balance conserved")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 16,
+         float(sys.argv[2]) if len(sys.argv) > 2 else 10,
+         int(sys.argv[3]) if len(sys.argv) > 3 else 8)
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# Tests import the Backend modules flat, as the apps and benchmarks do, and the
+# prototype (banking_system.py) from the repository root. Anything that
+# touches Mongo uses its own database.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "Backend"))
+os.environ.setdefault("MONGO_DB_NAME", "banking_test")
@@ -0,0 +1,128 @@
+"""Posting from many threads at once must conserve money (banking_system.LockStripes)."""
+import random
+import sys
+import threading
+
+import pytest
+
+import banking_system
+from banking_system import (
+    Bank, ColumnarLedger, Ledger, LockStripes, Money, PinHasher, PinVerifier, PostStatus
+)
+
+ACCOUNTS = 50
+OPENING = 1000
+THREADS = 8
+OPS_PER_THREAD = 400
+
+
+@pytest.fixture(autouse=True)
+def fast_switching():
+    # Switch threads often so that races would actually surface.
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    yield
+    sys.setswitchinterval(interval)
+
+
+@pytest.fixture(params=[Ledger, ColumnarLedger], ids=["ledger", "columnar"])
+def accounts(request):
+    previous = banking_system.database, banking_system.pin_verifier, banking_system.posting_locks
+    banking_system.use_ledger(request.param())
+    banking_system.use_pin_verifier(PinVerifier(PinHasher(iterations=1)))
+    banking_system.enable_concurrent_posting(64)
+    customer = Bank.register_customer("test", "Test", "Customer")
+    yield [Bank.create_account(customer, str(n), "savings", OPENING) for n in range(ACCOUNTS)]
+    banking_system.database, banking_system.pin_verifier, banking_system.posting_locks = previous
+
+
+def run_threads(worker):
+    gate = threading.Barrier(THREADS)
+    errors = []
+
+    def run(index):
+        gate.wait()
+        try:
+            worker(index)
+        except BaseException as e:
+            errors.append(e)
+
+    pool = [threading.Thread(target=run, args=(index,)) for index in range(THREADS)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join(timeout=60)
+    assert not any(thread.is_alive() for thread in pool), "posting threads deadlocked"
+    assert not errors, errors
+
+
+def assert_conserved(accounts, net):
+    total = Money.sum(account.bal for account in accounts)
+    assert total == Money.of(ACCOUNTS * OPENING + sum(net))
+    assert all(account.bal.minor >= 0 for account in accounts)
+
+
+def test_single_operations_conserve_balances(accounts):
+    net = [0] * THREADS
+
+    def worker(index):
+        rng = random.Random(index)
+        for _ in range(OPS_PER_THREAD):
+            a, b = rng.sample(accounts, 2)
+            amount = rng.randrange(1, 50)
+            roll = rng.random()
+            if roll < 0.8:
+                Bank.transfer(a, b, amount)
+            elif roll < 0.9:
+                Bank.deposit(a, amount)
+                net[index] += amount
+            elif Bank.withdrawal(a, amount) == "Withdrawal successful.":
+                net[index] -= amount
+
+    run_threads(worker)
+    assert_conserved(accounts, net)
+
+
+def test_post_batch_conserves_balances(accounts):
+    net = [0] * THREADS
+
+    def worker(index):
+        rng = random.Random(1000 + index)
+        for _ in range(OPS_PER_THREAD // 20):
+            ops = []
+            for _ in range(20):
+                a, b = rng.sample(accounts, 2)
+                amount = rng.randrange(1, 200)
+                roll = rng.random()
+                if roll < 0.8:
+                    ops.append(("transfer", a, b.account_no, amount))
+                elif roll < 0.9:
+                    ops.append(("deposit", a.account_no, amount))
+                else:
+                    ops.append(("withdrawal", a, amount))
+            result = Bank.post_batch(ops)
+            for op, status in zip(ops, result):
+                if status == PostStatus.OK and op[0] == "deposit":
+                    net[index] += op[2]
+                elif status == PostStatus.OK and op[0] == "withdrawal":
+                    net[index] -= op[2]
+
+    run_threads(worker)
+    assert_conserved(accounts, net)
+
+
+def test_lock_stripes_exclude_and_never_deadlock():
+    stripes = LockStripes(4)
+    counter = {"a": 0, "b": 0}
+
+    def worker(index):
+        # Half the threads name the accounts in the opposite order.
+        pair = ("a", "b") if index % 2 else ("b", "a")
+        for _ in range(2000):
+            with stripes.hold(*pair):
+                for key in pair:
+                    value = counter[key]
+                    counter[key] = value + 1
+
+    run_threads(worker)
+    assert counter == {"a": THREADS * 2000, "b": THREADS * 2000}
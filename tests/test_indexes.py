@@ -0,0 +1,53 @@
+"""Hot queries must be served by an index once the migration has run (see indexes.py)."""
+import pytest
+
+pytest.importorskip("pymongo")
+
+from pymongo.errors import PyMongoError
+
+import connection
+import indexes
+
+
+@pytest.fixture(scope="module")
+def database():
+    connection.configure(serverSelectionTimeoutMS=1000, connectTimeoutMS=1000)
+    try:
+        connection.get_client().admin.command("ping")
+    except PyMongoError as e:
+        pytest.skip(f"no reachable mongod: {e}")
+    database = connection.get_database()
+    indexes.ensure_indexes(database, log=lambda *args: None)
+    yield database
+    connection.close()
+
+
+def test_hot_queries_use_indexes(database):
+    indexes.assert_no_collscans(database, indexes.HOT_QUERIES)
+
+
+
+class RacedCollection:
+    """A collection whose indexes another worker drops between our snapshot and our drop."""
+
+    def __init__(self, info):
+        self.info = info
+        self.created = []
+
+    def index_information(self):
+        return dict(self.info)
+
+    def drop_index(self, name):
+        raise indexes.OperationFailure("index not found", code=indexes.INDEX_NOT_FOUND)
+
+    def create_index(self, keys, name, **options):
+        self.created.append(name)
+
+
+def test_concurrent_workers_tolerate_dropped_indexes():
+    transactions = RacedCollection({"accountId_1": {"key": [("accountId", 1)]},
+                                    "accountId_1_date_-1__id_-1": {"key": [("accountId", 1)]}})
+    database = {"transactions": transactions}
+    spec = indexes.index("transactions", ("accountId", 1), ("date", -1), ("_id", -1))
+    indexes.ensure_indexes(database, [spec], log=lambda *args: None)
+    assert transactions.created == ["accountId_1_date_-1__id_-1"]
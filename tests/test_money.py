@@ -0,0 +1,89 @@
+"""Exact money arithmetic and amount parsing (Backend/money.py)."""
+from decimal import Decimal
+
+import pytest
+
+from money import Money, format_minor, parse_minor
+
+
+@pytest.mark.parametrize("text, minor", [
+    ("12.34", 1234),
+    ("-12.3", -1230),
+    ("+7", 700),
+    (".5", 50),
+    ("5.", 500),
+    ("  42.10  ", 4210),
+    ("1.500", 150),
+    ("1e2", 10000),
+    ("-1.5E1", -1500),
+])
+def test_parse_minor(text, minor):
+    assert parse_minor(text) == minor
+
+
+@pytest.mark.parametrize("text", ["", "-", ".", "abc", "1.2.3", "1.234", "+-1", "--5", "-+5", "- 5",
+                                  "1e-3", "NaN", "Infinity", "-inf"])
+def test_parse_minor_rejects(text):
+    with pytest.raises(ValueError):
+        parse_minor(text)
+
+
+@pytest.mark.parametrize("currency, value, minor, text", [
+    ("JPY", "1500", 1500, "1500"),
+    ("USD", "15.25", 1525, "15.25"),
+    ("KWD", "1.234", 1234, "1.234"),
+    ("KWD", 2, 2000, "2.000"),
+])
+def test_currency_exponents(currency, value, minor, text):
+    amount = Money.of(value, currency)
+    assert amount.minor == minor
+    assert amount.to_json() == text
+
+
+def test_currency_exponent_limits_places():
+    with pytest.raises(ValueError):
+        Money.of("1.5", "JPY")
+    with pytest.raises(ValueError):
+        Money.of("1.2345", "KWD")
+
+
+def test_of_accepts_each_numeric_type():
+    assert Money.of(0.1) == Money.of("0.10") == Money.of(Decimal("0.1")) == Money(10)
+    assert Money.of(-3) == Money(-300)
+    with pytest.raises(TypeError):
+        Money.of(True)
+    with pytest.raises(TypeError):
+        Money(1.5)
+
+
+@pytest.mark.parametrize("stored, minor", [
+    (0.30000000000000004, 30),
+    (0.125, 12),   # ties go to even
+    (0.135, 14),
+    (-0.125, -12),
+    (1e-9, 0),
+])
+def test_legacy_float_documents_round_half_even(stored, minor):
+    assert Money.from_document({"balance": stored}) == Money(minor)
+
+
+def test_from_document_reads_minor_units_with_currency():
+    assert Money.from_document({"balance": 1234, "currency": "JPY"}) == Money(1234, "JPY")
+    assert Money.from_document({}) == Money(0)
+
+
+def test_arithmetic_and_currency_mismatch():
+    assert Money(150) + Money(250) - Money(100) == Money(300)
+    assert sum([Money(1), Money(2)]) == Money(3)
+    assert -Money(5) < Money(0) <= abs(Money(-5))
+    with pytest.raises(ValueError):
+        Money(1, "USD") + Money(1, "EUR")
+    with pytest.raises(ValueError):
+        Money.sum([Money(1, "EUR")])
+
+
+@pytest.mark.parametrize("minor, exponent, text", [(0, 2, "0.00"), (-5, 2, "-0.05"), (123456, 2, "1234.56"),
+                                                   (-7, 0, "-7"), (1, 3, "0.001")])
+def test_format_minor(minor, exponent, text):
+    assert format_minor(minor, exponent) == text
+    assert parse_minor(text, exponent) == minor